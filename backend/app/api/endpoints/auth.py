@@ -2,7 +2,7 @@
 Endpoints de autenticação
 """
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer
 
 from app.models.schemas import (
@@ -19,7 +19,9 @@ from app.models.schemas import (
     UserListResponse
 )
 from app.services.user_service import UserService
+from app.core.rate_limit import client_ip, login_rate_limiter
 from app.core.security import create_access_token, create_refresh_token
+from app.core.token_claims import token_claims
 from app.core.dependencies import (
     get_current_active_user,
     verify_refresh_token,
@@ -73,6 +75,7 @@ async def register(
 )
 async def login(
     credentials: LoginRequest,
+    request: Request,
     user_service: UserService = Depends(get_user_service)
 ):
     """
@@ -86,7 +89,13 @@ async def login(
     - **refresh_token**: Token para renovação
     - **token_type**: Tipo do token (bearer)
     - **expires_in**: Tempo de expiração em segundos
+
+    Tentativas em excesso por IP ou email recebem 429 (com ``Retry-After``).
     """
+    # Limite de tentativas antes de gastar CPU com bcrypt
+    ip = client_ip(request)
+    await login_rate_limiter.check(ip, credentials.email)
+
     # Autentica o usuário
     user = await user_service.authenticate_user(
         credentials.email,
@@ -106,6 +115,8 @@ async def login(
             detail="Usuário inativo"
         )
 
+    await login_rate_limiter.login_bem_sucedido(ip, credentials.email)
+
     # Cria tokens
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
@@ -114,7 +125,8 @@ async def login(
         subject=user.id,
         secret_key=settings.SECRET_KEY,
         algorithm=settings.ALGORITHM,
-        expires_delta=access_token_expires
+        expires_delta=access_token_expires,
+        extra_claims=token_claims(user)
     )
 
     refresh_token = create_refresh_token(
@@ -173,7 +185,8 @@ async def refresh_token(
         subject=user.id,
         secret_key=settings.SECRET_KEY,
         algorithm=settings.ALGORITHM,
-        expires_delta=access_token_expires
+        expires_delta=access_token_expires,
+        extra_claims=token_claims(user)
     )
 
     new_refresh_token = create_refresh_token(
@@ -1,15 +1,27 @@
 """
 Endpoints para gerenciar edições de municípios
 """
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query as QueryParam
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query as QueryParam, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.services.edicoes_service import EdicoesService
-from app.core.dependencies import get_edicoes_service
+from app.models.schemas import ALLOWED_UFS, User
+from app.services.edicoes_service import (
+    CursorInvalido,
+    EdicoesService,
+    EdicaoLoteInvalida,
+    validar_edicao_lote,
+)
+from app.core.dependencies import get_current_authorized_user, get_edicoes_service
+from app.core.json_response import FastJSONResponse
 
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 
 class EdicaoCreate(BaseModel):
@@ -41,10 +53,21 @@ class EdicaoResponse(BaseModel):
     updated_at: str
 
 
+class EdicoesAgregadosResponse(BaseModel):
+    """Schema de resposta para os totais de perdas das edições"""
+    uf: Optional[str] = None
+    competencia: Optional[str] = None
+    total_edicoes: int
+    total_municipios: int
+    perda_total: float
+    perda_mensal: List[float]
+
+
 class EdicoesListResponse(BaseModel):
     """Schema de resposta para lista de edições"""
     success: bool
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
     documents: List[EdicaoResponse]
 
 
@@ -58,14 +81,25 @@ class MessageResponse(BaseModel):
 async def listar_edicoes(
     codigo_municipio: Optional[str] = QueryParam(None, description="Filtrar por código do município"),
     limit: int = QueryParam(100, ge=1, le=1000, description="Número máximo de resultados"),
-    offset: int = QueryParam(0, ge=0, description="Offset para paginação"),
+    offset: int = QueryParam(0, ge=0, description="Offset para paginação (modo legado)"),
+    after: Optional[str] = QueryParam(
+        None, description="Cursor <updated_at>,<id> (next_cursor da página anterior); ignora offset"
+    ),
+    incluir_total: bool = QueryParam(
+        True, description="No modo cursor, incluir o total (aproximado, cacheado por alguns segundos)"
+    ),
     service: EdicoesService = Depends(get_edicoes_service)
 ):
-    result = await service.listar_edicoes(
-        codigo_municipio=codigo_municipio,
-        limit=limit,
-        offset=offset
-    )
+    try:
+        result = await service.listar_edicoes(
+            codigo_municipio=codigo_municipio,
+            limit=limit,
+            offset=offset,
+            after=after,
+            incluir_total=incluir_total,
+        )
+    except CursorInvalido as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
     if not result['success']:
         raise HTTPException(status_code=500, detail=result.get('error', 'Erro ao listar edições'))
@@ -73,6 +107,207 @@ async def listar_edicoes(
     return result
 
 
+class EdicoesLoteResponse(BaseModel):
+    """Schema de resposta da importação em lote"""
+    success: bool
+    total: int
+    alteradas: int = 0
+    message: str
+
+
+class EdicaoVersaoResponse(BaseModel):
+    """Uma versão do histórico: só as posições alteradas, ou a lista inteira (snapshot)"""
+    versao: int
+    usuario_id: Optional[str] = None
+    alterado_em: str
+    excluida: bool
+    tamanho: int
+    alteracoes: Optional[Dict[str, float]] = None
+    snapshot: Optional[List[float]] = None
+
+
+class EdicaoHistoricoResponse(BaseModel):
+    """Estado da edição em um instante e as versões até ele"""
+    codigo_municipio: str
+    competencia: str
+    em: Optional[str] = None
+    versao: int
+    usuario_id: Optional[str] = None
+    alterado_em: str
+    excluida: bool
+    perda_recurso_mensal: Optional[List[float]] = None
+    versoes: List[EdicaoVersaoResponse]
+
+
+# Colunas do CSV exportado; a importação lê as colunas pelo cabeçalho e ignora as demais.
+# perda_recurso_mensal: array JSON ("[0.0, 1500.5]") ou valores separados por "|"
+# ("0|1500.5"), com ponto decimal.
+_CSV_COLUNAS_EXPORT = [
+    "id", "codigo_municipio", "competencia", "perda_recurso_mensal", "usuario_id",
+    "created_at", "updated_at",
+]
+
+
+async def _linhas(request: Request) -> AsyncIterator[str]:
+    """Linhas do corpo da requisição, lidas em partes (sem carregar o arquivo inteiro)."""
+    pendente = b""
+    async for parte in request.stream():
+        pendente += parte
+        *linhas, pendente = pendente.split(b"\n")
+        for linha in linhas:
+            yield linha.decode("utf-8-sig").rstrip("\r")
+    if pendente:
+        yield pendente.decode("utf-8-sig").rstrip("\r")
+
+
+async def _itens_ndjson(request: Request) -> AsyncIterator[Dict[str, Any]]:
+    numero = 0
+    async for linha in _linhas(request):
+        numero += 1
+        if not linha.strip():
+            continue
+        try:
+            item = json.loads(linha)
+        except json.JSONDecodeError as exc:
+            raise EdicaoLoteInvalida(numero, f"JSON inválido ({exc.msg})")
+        if not isinstance(item, dict):
+            raise EdicaoLoteInvalida(numero, "cada linha deve ser um objeto JSON")
+        yield validar_edicao_lote(numero, item)
+
+
+def _parse_perdas_csv(valor: str) -> Any:
+    valor = valor.strip()
+    if valor.startswith("["):
+        return json.loads(valor)
+    return [v for v in valor.split("|") if v.strip()] if valor else []
+
+
+async def _itens_csv(request: Request) -> AsyncIterator[Dict[str, Any]]:
+    colunas: Optional[List[str]] = None
+    delimitador = ","
+    numero = 0
+    async for linha in _linhas(request):
+        numero += 1
+        if not linha.strip():
+            continue
+        if colunas is None:
+            # Planilhas em pt-BR costumam exportar CSV com ";"
+            delimitador = ";" if linha.count(";") > linha.count(",") else ","
+            colunas = [c.strip().lower() for c in next(csv.reader([linha], delimiter=delimitador))]
+            faltando = {"codigo_municipio", "competencia", "perda_recurso_mensal"} - set(colunas)
+            if faltando:
+                raise EdicaoLoteInvalida(numero, f"cabeçalho sem as colunas: {', '.join(sorted(faltando))}")
+            continue
+
+        item = dict(zip(colunas, next(csv.reader([linha], delimiter=delimitador))))
+        try:
+            item["perda_recurso_mensal"] = _parse_perdas_csv(item.get("perda_recurso_mensal") or "")
+        except json.JSONDecodeError:
+            raise EdicaoLoteInvalida(numero, "perda_recurso_mensal com JSON inválido")
+        yield validar_edicao_lote(numero, item)
+
+
+@router.post("/edicoes/lote", response_model=EdicoesLoteResponse, tags=["Edições"])
+async def importar_edicoes_lote(
+    request: Request,
+    service: EdicoesService = Depends(get_edicoes_service),
+    current_user: User = Depends(get_current_authorized_user),
+):
+    """
+    Importa (upsert) várias edições em uma única transação.
+
+    Corpo em NDJSON (``application/x-ndjson``, um objeto por linha) ou CSV (``text/csv``,
+    com cabeçalho ``codigo_municipio,competencia,perda_recurso_mensal[,usuario_id]``).
+    Qualquer linha inválida cancela a importação inteira (400, com o número da linha).
+    Linhas sem ``usuario_id`` ficam com o usuário autenticado.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        itens = _itens_csv(request)
+    elif content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        itens = _itens_ndjson(request)
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Use Content-Type application/x-ndjson ou text/csv"
+        )
+
+    result = await service.importar_lote(itens, usuario_id=current_user.id)
+
+    if not result['success']:
+        raise HTTPException(
+            status_code=400 if 'linha' in result else 500,
+            detail=result.get('message', 'Erro ao importar edições')
+        )
+
+    return result
+
+
+async def _export_ndjson(service: EdicoesService, codigo_municipio: Optional[str]) -> AsyncIterator[bytes]:
+    async for bloco in service.exportar_edicoes(codigo_municipio=codigo_municipio):
+        yield "".join(json.dumps(doc, ensure_ascii=False) + "\n" for doc in bloco).encode("utf-8")
+
+
+async def _export_csv(service: EdicoesService, codigo_municipio: Optional[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_CSV_COLUNAS_EXPORT)
+    async for bloco in service.exportar_edicoes(codigo_municipio=codigo_municipio):
+        for doc in bloco:
+            writer.writerow([
+                doc['id'],
+                doc['codigo_municipio'],
+                doc['competencia'],
+                json.dumps(doc['perda_recurso_mensal']),
+                doc['usuario_id'] or "",
+                doc['created_at'] or "",
+                doc['updated_at'] or "",
+            ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+@router.get("/edicoes/export", tags=["Edições"])
+async def exportar_edicoes(
+    formato: Literal["ndjson", "csv"] = QueryParam("ndjson", description="Formato de saída"),
+    codigo_municipio: Optional[str] = QueryParam(None, description="Filtrar por código do município"),
+    service: EdicoesService = Depends(get_edicoes_service)
+):
+    """Exporta todas as edições (NDJSON ou CSV) em streaming, lendo o banco em blocos."""
+    if formato == "csv":
+        return StreamingResponse(
+            _export_csv(service, codigo_municipio),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": "attachment; filename=edicoes.csv"},
+        )
+    return StreamingResponse(
+        _export_ndjson(service, codigo_municipio),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=edicoes.ndjson"},
+    )
+
+
+@router.get("/edicoes/agregados", response_model=EdicoesAgregadosResponse, tags=["Edições"])
+async def agregar_edicoes(
+    uf: Optional[str] = QueryParam(None, description="Sigla da UF (ex: BA)"),
+    competencia: Optional[str] = QueryParam(
+        None, min_length=6, max_length=6, description="Competência no formato AAAAMM"
+    ),
+    service: EdicoesService = Depends(get_edicoes_service)
+):
+    """Totais de perdas das edições (soma por posição da lista), calculados no banco."""
+    if uf and uf.upper() not in ALLOWED_UFS:
+        raise HTTPException(status_code=400, detail=f"UF inválida: {uf}")
+
+    result = await service.agregar_perdas(uf=uf, competencia=competencia)
+    if not result['success']:
+        raise HTTPException(status_code=500, detail=result.get('message', 'Erro ao agregar edições'))
+    return EdicoesAgregadosResponse(**{k: v for k, v in result.items() if k != 'success'})
+
+
 @router.get("/edicoes/{codigo_municipio}/{competencia}", response_model=EdicaoResponse, tags=["Edições"])
 async def get_edicao(
     codigo_municipio: str,
@@ -90,16 +325,43 @@ async def get_edicao(
     return edicao
 
 
+@router.get(
+    "/edicoes/{codigo_municipio}/{competencia}/historico",
+    response_model=EdicaoHistoricoResponse,
+    tags=["Edições"],
+)
+async def historico_edicao(
+    codigo_municipio: str,
+    competencia: str,
+    em: Optional[datetime] = QueryParam(
+        None, description="Instante (ISO 8601, UTC) a reconstruir; padrão: agora"
+    ),
+    service: EdicoesService = Depends(get_edicoes_service)
+):
+    """Quem alterou o quê, e os valores da edição em qualquer ponto do tempo."""
+    if em is not None and em.tzinfo is not None:
+        em = em.astimezone(timezone.utc).replace(tzinfo=None)
+
+    historico = await service.historico_edicao(codigo_municipio, competencia, em)
+    if not historico:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Sem histórico para município {codigo_municipio} e competência {competencia}"
+        )
+    return historico
+
+
 @router.post("/edicoes", tags=["Edições"])
 async def salvar_edicao(
     edicao: EdicaoCreate,
-    service: EdicoesService = Depends(get_edicoes_service)
+    service: EdicoesService = Depends(get_edicoes_service),
+    current_user: User = Depends(get_current_authorized_user),
 ):
     result = await service.salvar_edicao(
         codigo_municipio=edicao.codigo_municipio,
         competencia=edicao.competencia,
         perda_recurso_mensal=edicao.perda_recurso_mensal,
-        usuario_id=edicao.usuario_id
+        usuario_id=edicao.usuario_id or current_user.id
     )
 
     if not result['success']:
@@ -115,9 +377,10 @@ async def salvar_edicao(
 async def deletar_edicao(
     codigo_municipio: str,
     competencia: str,
-    service: EdicoesService = Depends(get_edicoes_service)
+    service: EdicoesService = Depends(get_edicoes_service),
+    current_user: User = Depends(get_current_authorized_user),
 ):
-    result = await service.deletar_edicao(codigo_municipio, competencia)
+    result = await service.deletar_edicao(codigo_municipio, competencia, usuario_id=current_user.id)
 
     if not result['success']:
         raise HTTPException(
@@ -2,9 +2,13 @@
 Endpoints para consulta de dados de financiamento
 """
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
 from datetime import datetime
 
+from app.core.config import settings
+from app.core.http_cache import cached_response, reference_cache
+from app.core.json_response import FastJSONResponse, RawJSONResponse
+
 from app.models.schemas import (
     FinanciamentoParams,
     ResponseBase,
@@ -14,24 +18,35 @@ from app.services.api_client import saude_api_client
 from app.services.municipios import municipio_service
 from app.utils.logger import logger
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 @router.get("/competencia/latest")
-async def obter_ultima_competencia():
+async def obter_ultima_competencia(if_none_match: Optional[str] = Header(None)):
     """
     Retorna a última competência disponível no sistema
 
     Returns:
-        dict: Competência no formato AAAAMM
+        dict: Competência no formato AAAAMM (``timestamp``: quando ela passou a ser a última)
     """
+    max_age = settings.COMPETENCIA_CACHE_MAX_AGE_SECONDS
+    cached = reference_cache.get("competencia:latest")
+    if cached is not None:
+        return cached_response(cached, if_none_match, max_age)
+
     try:
         competencia = saude_api_client.get_latest_competencia()
-        return {
-            "competencia": competencia,
-            "ano": competencia[:4],
-            "mes": competencia[4:],
-            "timestamp": datetime.now().isoformat()
-        }
+        cached = reference_cache.put(
+            "competencia:latest",
+            {
+                "competencia": competencia,
+                "ano": competencia[:4],
+                "mes": competencia[4:],
+                "timestamp": datetime.now().isoformat()
+            },
+            ttl=max_age,
+            versao=competencia,
+        )
+        return cached_response(cached, if_none_match, max_age)
     except Exception as e:
         logger.error(f"Erro ao obter última competência: {str(e)}")
         raise HTTPException(
@@ -39,7 +54,12 @@ async def obter_ultima_competencia():
             detail="Erro interno do servidor ao obter competência"
         )
 
-@router.get("/dados/{codigo_ibge}/{competencia}")
+def _resposta_bruta(resposta) -> RawJSONResponse:
+    # Sem transformação: repassa o corpo recebido da API em vez de serializar o dict
+    return RawJSONResponse(resposta.conteudo if resposta.conteudo is not None else resposta.dados)
+
+
+@router.get("/dados/{codigo_ibge}/{competencia}", response_class=RawJSONResponse)
 async def consultar_dados_financiamento(
     codigo_ibge: str,
     competencia: str,
@@ -54,7 +74,7 @@ async def consultar_dados_financiamento(
         force_refresh: Se True, força nova consulta ignorando cache
 
     Returns:
-        dict: JSON bruto da API de financiamento
+        JSON bruto da API de financiamento (corpo recebido, sem reserializar)
     """
     try:
         # Validar parâmetros
@@ -94,10 +114,10 @@ async def consultar_dados_financiamento(
             )
 
         # Consultar dados
-        logger.info(f"Consultando financiamento para {codigo_ibge}/{competencia}")
-        dados = await saude_api_client.consultar_financiamento(codigo_ibge, competencia)
+        logger.debug("Consultando financiamento para %s/%s", codigo_ibge, competencia)
+        resposta = await saude_api_client.consultar_financiamento_bruto(codigo_ibge, competencia)
 
-        if not dados:
+        if resposta is None:
             # Sugerir competência anterior quando não houver dados
             try:
                 ano_int = int(competencia[:4])
@@ -120,7 +140,7 @@ async def consultar_dados_financiamento(
                 detail=detalhe
             )
 
-        return dados
+        return _resposta_bruta(resposta)
 
     except HTTPException:
         raise
@@ -131,7 +151,7 @@ async def consultar_dados_financiamento(
             detail="Erro interno do servidor ao consultar dados de financiamento"
         )
 
-@router.post("/dados/consultar")
+@router.post("/dados/consultar", response_class=RawJSONResponse)
 async def consultar_dados_post(params: FinanciamentoParams):
     """
     Consulta dados de financiamento via POST
@@ -140,21 +160,21 @@ async def consultar_dados_post(params: FinanciamentoParams):
         params: Parâmetros de consulta (código IBGE e competência)
 
     Returns:
-        dict: JSON bruto da API de financiamento
+        JSON bruto da API de financiamento (corpo recebido, sem reserializar)
     """
     try:
-        dados = await saude_api_client.consultar_financiamento(
+        resposta = await saude_api_client.consultar_financiamento_bruto(
             params.codigo_ibge,
             params.competencia
         )
 
-        if not dados:
+        if resposta is None:
             raise HTTPException(
                 status_code=404,
                 detail="Nenhum dado encontrado para os parâmetros informados"
             )
 
-        return dados
+        return _resposta_bruta(resposta)
 
     except HTTPException:
         raise
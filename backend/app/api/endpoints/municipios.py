@@ -1,26 +1,32 @@
 """
 Endpoints para consulta de municípios e UFs
 """
-from typing import List
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
 from fastapi.responses import JSONResponse
 
-from app.models.schemas import UF, Municipio, ResponseBase, ErrorResponse
+from app.core.config import settings
+from app.core.http_cache import cached_response, reference_cache
+
+from app.models.schemas import UF, Municipio, MunicipioBuscaItem, ResponseBase, ErrorResponse
 from app.services.municipios import municipio_service
 from app.utils.logger import logger
 
 router = APIRouter()
 
 @router.get("/ufs", response_model=List[UF])
-async def listar_ufs():
+async def listar_ufs(if_none_match: Optional[str] = Header(None)):
     """
     Lista todas as Unidades Federativas (UFs) do Brasil
 
     Returns:
         List[UF]: Lista de UFs com código, nome e sigla
     """
+    cached = reference_cache.get("ufs")
+    if cached is not None:
+        return cached_response(cached, if_none_match, settings.REFERENCE_CACHE_MAX_AGE_SECONDS)
+
     try:
-        logger.info("Iniciando consulta de UFs...")
         ufs = municipio_service.get_ufs()
 
         if not ufs:
@@ -30,8 +36,8 @@ async def listar_ufs():
                 detail="Erro interno: não foi possível carregar a lista de UFs"
             )
 
-        logger.info(f"Retornando {len(ufs)} UFs com sucesso")
-        return ufs
+        cached = reference_cache.put("ufs", ufs)
+        return cached_response(cached, if_none_match, settings.REFERENCE_CACHE_MAX_AGE_SECONDS)
 
     except HTTPException:
         # Re-lançar exceções HTTP específicas
@@ -43,8 +49,27 @@ async def listar_ufs():
             detail=f"Erro interno do servidor ao consultar UFs: {str(e)}"
         )
 
+@router.get("/busca", response_model=List[MunicipioBuscaItem])
+async def buscar_municipios(
+    q: str = Query(..., min_length=2, max_length=100, description="Nome (ou início do nome) do município"),
+    limit: int = Query(10, ge=1, le=50),
+    uf: Optional[str] = Query(None, min_length=2, max_length=2, description="Restringe a uma UF"),
+):
+    """
+    Autocomplete de municípios em todo o país
+
+    Aceita o nome sem acentos, o início do nome ou de uma palavra do nome e
+    pequenos erros de digitação. A UF pode ser informada no termo ("Santana/AP").
+
+    Returns:
+        List[MunicipioBuscaItem]: Municípios do mais ao menos relevante
+    """
+    if uf and not municipio_service.validate_uf(uf):
+        raise HTTPException(status_code=400, detail=f"UF inválida: {uf}")
+    return municipio_service.buscar(q, limit=limit, uf_sigla=uf)
+
 @router.get("/municipios/{uf}", response_model=List[Municipio])
-async def listar_municipios_por_uf(uf: str):
+async def listar_municipios_por_uf(uf: str, if_none_match: Optional[str] = Header(None)):
     """
     Lista municípios de uma UF específica
 
@@ -54,6 +79,11 @@ async def listar_municipios_por_uf(uf: str):
     Returns:
         List[Municipio]: Lista de municípios da UF
     """
+    # Só UFs válidas entram no cache: no máximo 27 entradas
+    cached = reference_cache.get(f"municipios:{uf.upper()}")
+    if cached is not None:
+        return cached_response(cached, if_none_match, settings.REFERENCE_CACHE_MAX_AGE_SECONDS)
+
     try:
         # Validar UF
         uf = uf.upper()
@@ -70,7 +100,8 @@ async def listar_municipios_por_uf(uf: str):
                 detail=f"Nenhum município encontrado para a UF {uf}"
             )
 
-        return municipios
+        cached = reference_cache.put(f"municipios:{uf}", municipios)
+        return cached_response(cached, if_none_match, settings.REFERENCE_CACHE_MAX_AGE_SECONDS)
 
     except HTTPException:
         raise
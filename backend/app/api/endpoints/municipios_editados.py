@@ -4,6 +4,7 @@ Endpoints para gerenciamento de dados editados de municípios
 from typing import List
 from fastapi import APIRouter, HTTPException, status
 
+from app.core.json_response import FastJSONResponse
 from app.models.schemas import (
     MunicipioEditado,
     MunicipioEditadoCreate,
@@ -15,7 +16,7 @@ from app.services.municipios_editados import municipio_editado_service
 from app.services.municipios import municipio_service
 from app.utils.logger import logger
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 @router.get("/", response_model=List[MunicipioEditado])
 async def listar_municipios_editados():
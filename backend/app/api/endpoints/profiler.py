@@ -0,0 +1,100 @@
+"""
+Endpoints de profiling sob demanda (apenas superusuários)
+
+Fluxo: POST /iniciar → aguardar (GET / mostra o andamento) → baixar os resultados.
+O perfil é do worker que atendeu o POST; com vários workers, repetir até cobrir o desejado.
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse, Response
+
+from app.core.dependencies import get_current_superuser
+from app.core.profiler import ProfilerOcupado, SessaoPerfil, profiler
+from app.models.schemas import ProfilerIniciarRequest, ProfilerStatusResponse, User
+from app.utils.logger import logger
+
+router = APIRouter()
+
+
+def _sessao():
+    if profiler.sessao is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nenhuma sessão de profiling")
+    return profiler.sessao
+
+
+def _resultado(chave: str):
+    sessao = _sessao()
+    if not sessao.concluida:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Sessão de profiling em andamento")
+    conteudo = sessao.resultado.get(chave)
+    if conteudo is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Resultado indisponível (cProfile desligado ou sem execuções)",
+        )
+    return sessao, conteudo
+
+
+def _nome_arquivo(sessao: SessaoPerfil, extensao: str) -> str:
+    return f"perfil_{sessao.iniciado_em:%Y%m%d_%H%M%S}.{extensao}"
+
+
+@router.post("/iniciar", response_model=ProfilerStatusResponse, status_code=status.HTTP_202_ACCEPTED)
+async def iniciar_profiling(
+    dados: ProfilerIniciarRequest,
+    current_user: User = Depends(get_current_superuser),
+):
+    """Inicia uma sessão por tempo ou pelas próximas N requisições de uma rota."""
+    try:
+        sessao = profiler.iniciar(SessaoPerfil(
+            segundos=dados.segundos,
+            requisicoes=dados.requisicoes,
+            rota=dados.rota,
+            intervalo_ms=dados.intervalo_ms,
+            usar_cprofile=dados.cprofile,
+            timeout=dados.timeout_segundos,
+        ))
+    except ProfilerOcupado as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    logger.info("Admin %s iniciou profiling", current_user.email)
+    return sessao.status()
+
+
+@router.get("", response_model=ProfilerStatusResponse)
+async def status_profiling(current_user: User = Depends(get_current_superuser)):
+    """Sessão atual ou a última concluída."""
+    return _sessao().status()
+
+
+@router.post("/parar", response_model=ProfilerStatusResponse)
+async def parar_profiling(current_user: User = Depends(get_current_superuser)):
+    """Encerra a sessão antes do prazo (os resultados ficam disponíveis)."""
+    _sessao()
+    return profiler.parar().status()
+
+
+@router.get("/resultado/collapsed", response_class=PlainTextResponse)
+async def resultado_collapsed(current_user: User = Depends(get_current_superuser)):
+    """Pilhas amostradas no formato collapsed (``flamegraph.pl``, speedscope)."""
+    sessao, conteudo = _resultado("collapsed")
+    return PlainTextResponse(
+        conteudo,
+        headers={"Content-Disposition": f'attachment; filename="{_nome_arquivo(sessao, "collapsed.txt")}"'},
+    )
+
+
+@router.get("/resultado/pstats", response_class=PlainTextResponse)
+async def resultado_pstats(current_user: User = Depends(get_current_superuser)):
+    """Resumo do cProfile (ordenado por tempo cumulativo e por tempo próprio)."""
+    _, conteudo = _resultado("pstats")
+    return PlainTextResponse(conteudo)
+
+
+@router.get("/resultado/prof")
+async def resultado_prof(current_user: User = Depends(get_current_superuser)):
+    """Arquivo ``.prof`` do cProfile (``python -m pstats``, snakeviz)."""
+    sessao, conteudo = _resultado("prof")
+    return Response(
+        content=conteudo,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{_nome_arquivo(sessao, "prof")}"'},
+    )
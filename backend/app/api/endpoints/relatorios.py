@@ -1,66 +1,109 @@
 """Endpoints para geração de relatórios em PDF."""
 from io import BytesIO
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 
-from app.models.schemas import RelatorioPDFRequest
-from app.services.api_client import saude_api_client
-from app.services.municipios_editados import municipio_editado_service
-from app.services.relatorio_pdf import compute_financial_summary, create_pdf_report, create_detailed_pdf_report
+from app.core.config import settings
+from app.core.dependencies import get_current_authorized_user
+from app.core.http_cache import etag_matches
+from app.core.server_timing import fase
+from app.models.schemas import (
+    RelatorioJobRequest,
+    RelatorioJobStatus,
+    MunicipiosRelatorioRequest,
+    RelatorioLoteRequest,
+    RelatorioPDFRequest,
+    RelatorioRegionalRequest,
+    User,
+)
+from app.services.municipios import municipio_service
+from app.services.pdf_cache import etag_for
+from app.services.pdf_render_pool import PdfRenderPoolSaturated
+from app.services.relatorio_dados import (
+    DadosRelatorioIndisponiveis,
+    montar_parametros_regional,
+    montar_parametros_relatorio,
+)
+from app.services.relatorio_jobs import (
+    STATUS_CONCLUIDO,
+    FilaRelatoriosCheia,
+    RelatorioJob,
+    relatorio_job_queue,
+)
+from app.services.relatorio_lote import ItemLote, gerar_lote_zip
+from app.services.relatorio_pdf import render_report, report_cache_key
 from app.utils.logger import logger
 
 
 router = APIRouter()
 
 
+def _render_pool_busy(exc: PdfRenderPoolSaturated) -> HTTPException:
+    """503 com Retry-After quando a fila de renderização de PDF está cheia."""
+    logger.warning("Geração de PDF recusada: %s", exc)
+    return HTTPException(
+        status_code=503,
+        detail="Servidor ocupado gerando relatórios. Tente novamente em instantes.",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def _pdf_response(pdf_bytes: bytes, file_name: str, etag: str, cache_hit: bool) -> StreamingResponse:
+    return StreamingResponse(
+        BytesIO(pdf_bytes),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename={file_name}",
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+            "X-Cache": "HIT" if cache_hit else "MISS",
+        }
+    )
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+def _sem_dados(exc: DadosRelatorioIndisponiveis) -> HTTPException:
+    return HTTPException(status_code=404, detail=str(exc))
+
+
 @router.post("/pdf")
-async def gerar_relatorio_pdf(request: RelatorioPDFRequest):
+async def gerar_relatorio_pdf(
+    request: RelatorioPDFRequest,
+    if_none_match: Optional[str] = Header(None),
+):
     """Gera e retorna o relatório financeiro em PDF para download."""
     try:
-        dados = await saude_api_client.consultar_financiamento(
+        render_kwargs = await montar_parametros_relatorio(
+            "padrao",
             request.codigo_ibge,
-            request.competencia
+            request.competencia,
+            request.municipio_nome,
+            request.uf,
         )
+        key = report_cache_key("padrao", request.codigo_ibge, render_kwargs)
+        etag = etag_for(key)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
 
-        if not dados or not dados.get('resumosPlanosOrcamentarios'):
-            raise HTTPException(
-                status_code=404,
-                detail="Não foi possível localizar dados de financiamento para gerar o relatório"
-            )
-
-        resumos = dados.get('resumosPlanosOrcamentarios', [])
-        editado = municipio_editado_service.get_editado(
-            request.codigo_ibge,
-            request.competencia
-        )
-        perdas = editado.perda_recurso_mensal if editado else [0.0] * len(resumos)
-
-        resumo = compute_financial_summary(resumos, perdas)
-
-        # Passar também os resumos de planos orçamentários para a página 4
-        pdf_bytes = create_pdf_report(
-            municipio_nome=request.municipio_nome,
-            uf=request.uf,
-            competencia=request.competencia,
-            resumo=resumo,
-            resumos_planos=resumos
-        )
+        pdf_bytes, cache_hit = await render_report("padrao", key, render_kwargs)
 
         file_name = f"relatorio_{request.codigo_ibge}_{request.competencia}.pdf"
 
-        return StreamingResponse(
-            BytesIO(pdf_bytes),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={file_name}"
-            }
-        )
+        return _pdf_response(pdf_bytes, file_name, etag, cache_hit)
 
     except HTTPException:
         raise
+    except DadosRelatorioIndisponiveis as exc:
+        raise _sem_dados(exc)
+    except PdfRenderPoolSaturated as exc:
+        raise _render_pool_busy(exc)
     except Exception as exc:
-        logger.error(f"Erro ao gerar relatório PDF: {exc}")
+        logger.error("Erro ao gerar relatório PDF: %s", exc)
         raise HTTPException(
             status_code=500,
             detail="Erro interno ao gerar o relatório PDF"
@@ -68,89 +111,51 @@ async def gerar_relatorio_pdf(request: RelatorioPDFRequest):
 
 
 @router.post("/pdf-detalhado")
-async def gerar_relatorio_detalhado_pdf(request: RelatorioPDFRequest):
+async def gerar_relatorio_detalhado_pdf(
+    request: RelatorioPDFRequest,
+    if_none_match: Optional[str] = Header(None),
+):
     """Gera e retorna o relatório financeiro DETALHADO em PDF para download."""
     try:
-        logger.info(
-            f"Iniciando geração de relatório detalhado - "
-            f"Município: {request.municipio_nome}/{request.uf}, "
-            f"Código IBGE: {request.codigo_ibge}, Competência: {request.competencia}"
+        logger.debug(
+            "Iniciando geração de relatório detalhado - Município: %s/%s, Código IBGE: %s, Competência: %s",
+            request.municipio_nome, request.uf, request.codigo_ibge, request.competencia,
         )
 
-        dados = await saude_api_client.consultar_financiamento(
-            request.codigo_ibge,
-            request.competencia
-        )
-
-        if not dados or not dados.get('resumosPlanosOrcamentarios'):
-            logger.warning(
-                f"Dados de financiamento não encontrados - "
-                f"Código IBGE: {request.codigo_ibge}, Competência: {request.competencia}"
-            )
-            raise HTTPException(
-                status_code=404,
-                detail="Não foi possível localizar dados de financiamento para gerar o relatório"
+        with fase("dados", "Montagem dos dados"):
+            render_kwargs = await montar_parametros_relatorio(
+                "detalhado",
+                request.codigo_ibge,
+                request.competencia,
+                request.municipio_nome,
+                request.uf,
             )
+        key = report_cache_key("detalhado", request.codigo_ibge, render_kwargs)
+        etag = etag_for(key)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
 
-        resumos_completos = dados.get('resumosPlanosOrcamentarios', [])
-        # Considerar apenas recursos MUNICIPAIS — mesmo filtro do frontend (processarDados).
-        # Garante que o total do PDF bata com a tela e que os ganhos por componente (indexados
-        # pela lista municipal) caiam na linha correta.
-        resumos = [
-            r for r in resumos_completos
-            if not r.get('dsEsferaAdministrativa') or r.get('dsEsferaAdministrativa') == 'MUNICIPAL'
-        ]
-        pagamentos = dados.get('pagamentos', [])
-
-        if not pagamentos:
-            logger.warning(
-                f"Nenhum dado de pagamento encontrado nos dados da API - "
-                f"Código IBGE: {request.codigo_ibge}, Competência: {request.competencia}"
-            )
-
-        editado = municipio_editado_service.get_editado(
-            request.codigo_ibge,
-            request.competencia
-        )
-        perdas = editado.perda_recurso_mensal if editado else [0.0] * len(resumos)
-        perdas_vinculo = editado.perda_vinculo_mensal if editado else None
-        perdas_qualidade = editado.perda_qualidade_mensal if editado else None
-
-        resumo = compute_financial_summary(resumos, perdas)
-
-        # Gerar PDF detalhado com dados de pagamento + simulação por componente (SIAPS)
-        pdf_bytes = create_detailed_pdf_report(
-            municipio_nome=request.municipio_nome,
-            uf=request.uf,
-            competencia=request.competencia,
-            resumo=resumo,
-            pagamentos=pagamentos,
-            resumos=resumos,
-            perdas_vinculo=perdas_vinculo,
-            perdas_qualidade=perdas_qualidade,
-        )
+        pdf_bytes, cache_hit = await render_report("detalhado", key, render_kwargs)
 
         file_name = f"relatorio_detalhado_{request.codigo_ibge}_{request.competencia}.pdf"
 
         logger.info(
-            f"Relatório detalhado gerado com sucesso - "
-            f"Código IBGE: {request.codigo_ibge}, Arquivo: {file_name}"
+            "Relatório detalhado %s - Código IBGE: %s, Arquivo: %s",
+            "servido do cache" if cache_hit else "gerado com sucesso", request.codigo_ibge, file_name,
         )
 
-        return StreamingResponse(
-            BytesIO(pdf_bytes),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={file_name}"
-            }
-        )
+        return _pdf_response(pdf_bytes, file_name, etag, cache_hit)
 
     except HTTPException:
         raise
+    except DadosRelatorioIndisponiveis as exc:
+        raise _sem_dados(exc)
+    except PdfRenderPoolSaturated as exc:
+        raise _render_pool_busy(exc)
     except ValueError as exc:
         logger.error(
-            f"Erro de validação ao gerar relatório detalhado - "
-            f"Código IBGE: {request.codigo_ibge}: {exc}"
+            "Erro de validação ao gerar relatório detalhado - Código IBGE: %s: %s",
+            request.codigo_ibge, exc,
         )
         raise HTTPException(
             status_code=400,
@@ -158,11 +163,190 @@ async def gerar_relatorio_detalhado_pdf(request: RelatorioPDFRequest):
         )
     except Exception as exc:
         logger.error(
-            f"Erro inesperado ao gerar relatório PDF detalhado - "
-            f"Código IBGE: {request.codigo_ibge}, Competência: {request.competencia}: {exc}",
+            "Erro inesperado ao gerar relatório PDF detalhado - Código IBGE: %s, Competência: %s: %s",
+            request.codigo_ibge, request.competencia, exc,
             exc_info=True
         )
         raise HTTPException(
             status_code=500,
             detail="Erro interno ao gerar o relatório PDF detalhado. Verifique os logs para mais detalhes."
         )
+
+
+def _job_status(job: RelatorioJob, request: Request) -> RelatorioJobStatus:
+    arquivo_url = None
+    if job.status == STATUS_CONCLUIDO:
+        arquivo_url = str(request.url_for("baixar_relatorio_job", job_id=job.id))
+    return RelatorioJobStatus(
+        id=job.id,
+        tipo=job.tipo,
+        codigo_ibge=job.codigo_ibge,
+        competencia=job.competencia,
+        status=job.status,
+        progresso=job.progresso,
+        etapa=job.etapa,
+        tentativas=job.tentativas,
+        erro=job.erro,
+        criado_em=job.criado_em,
+        concluido_em=job.concluido_em,
+        expira_em=job.expira_em(relatorio_job_queue.ttl),
+        tamanho_bytes=job.tamanho_bytes,
+        status_url=str(request.url_for("status_relatorio_job", job_id=job.id)),
+        arquivo_url=arquivo_url,
+    )
+
+
+def _get_job_do_usuario(job_id: str, current_user: User) -> RelatorioJob:
+    """Job visível apenas para quem o criou (ou superusuário); senão 404."""
+    job = relatorio_job_queue.get(job_id)
+    if job is None or (job.usuario_id != current_user.id and not current_user.is_superuser):
+        raise HTTPException(status_code=404, detail="Job de relatório não encontrado ou expirado")
+    return job
+
+
+@router.post("/jobs", response_model=RelatorioJobStatus, status_code=202)
+async def criar_relatorio_job(
+    payload: RelatorioJobRequest,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_authorized_user),
+):
+    """Enfileira a geração do relatório e devolve o id do job imediatamente."""
+    try:
+        job = relatorio_job_queue.submit(
+            tipo=payload.tipo,
+            codigo_ibge=payload.codigo_ibge,
+            competencia=payload.competencia,
+            municipio_nome=payload.municipio_nome,
+            uf=payload.uf,
+            usuario_id=current_user.id,
+        )
+    except FilaRelatoriosCheia as exc:
+        logger.warning("Job de relatório recusado: %s", exc)
+        raise HTTPException(
+            status_code=503,
+            detail="Fila de relatórios cheia. Tente novamente em instantes.",
+            headers={"Retry-After": "30"},
+        )
+
+    logger.info(
+        "Job de relatório %s enfileirado - Tipo: %s, Código IBGE: %s, Competência: %s",
+        job.id, job.tipo, job.codigo_ibge, job.competencia,
+    )
+    job_status = _job_status(job, request)
+    response.headers["Location"] = job_status.status_url
+    return job_status
+
+
+@router.get("/jobs/{job_id}", response_model=RelatorioJobStatus, name="status_relatorio_job")
+async def status_relatorio_job(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_authorized_user),
+):
+    """Status e progresso de um job de relatório."""
+    return _job_status(_get_job_do_usuario(job_id, current_user), request)
+
+
+@router.get("/jobs/{job_id}/arquivo", name="baixar_relatorio_job")
+async def baixar_relatorio_job(
+    job_id: str,
+    current_user: User = Depends(get_current_authorized_user),
+):
+    """PDF gerado pelo job (409 enquanto não estiver concluído)."""
+    job = _get_job_do_usuario(job_id, current_user)
+    if job.status != STATUS_CONCLUIDO:
+        raise HTTPException(
+            status_code=409,
+            detail=job.erro if job.erro and job.finalizado else f"Relatório ainda não concluído ({job.status})",
+        )
+    if job.arquivo is None or not job.arquivo.exists():
+        raise HTTPException(status_code=404, detail="Arquivo do relatório expirado")
+    return FileResponse(job.arquivo, media_type="application/pdf", filename=job.nome_arquivo)
+
+
+def _resolver_municipios(request: MunicipiosRelatorioRequest) -> List[ItemLote]:
+    """Municípios selecionados por lista de códigos ou por UF (validados e limitados)."""
+    if request.uf:
+        if not municipio_service.validate_uf(request.uf):
+            raise HTTPException(status_code=400, detail=f"UF '{request.uf}' é inválida")
+        itens = [
+            ItemLote(codigo_ibge=m.codigo_ibge, municipio_nome=m.nome, uf=m.uf)
+            for m in municipio_service.get_municipios_por_uf(request.uf)
+        ]
+    elif request.codigos_ibge:
+        itens = [ItemLote(codigo_ibge=codigo) for codigo in request.codigos_ibge]
+    else:
+        raise HTTPException(status_code=400, detail="Informe codigos_ibge ou uf")
+
+    if not itens:
+        raise HTTPException(status_code=404, detail="Nenhum município encontrado")
+    if len(itens) > settings.REPORT_BATCH_MAX_MUNICIPIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Seleção excede o limite de {settings.REPORT_BATCH_MAX_MUNICIPIOS} municípios",
+        )
+    return itens
+
+
+@router.post("/lote")
+async def gerar_relatorios_lote(request: RelatorioLoteRequest):
+    """Gera os relatórios de vários municípios (lista de códigos ou UF inteira) em um ZIP.
+
+    O ZIP é transmitido conforme os PDFs ficam prontos; falhas constam em ``manifesto.json``.
+    """
+    itens = _resolver_municipios(request)
+
+    logger.info(
+        "Iniciando lote de relatórios - %d município(s), Tipo: %s, Competência: %s",
+        len(itens), request.tipo, request.competencia,
+    )
+    file_name = f"relatorios_{request.uf or 'municipios'}_{request.competencia}.zip"
+    return StreamingResponse(
+        gerar_lote_zip(itens, request.competencia, request.tipo),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={file_name}"},
+    )
+
+
+@router.post("/regional")
+async def gerar_relatorio_regional_pdf(
+    request: RelatorioRegionalRequest,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Gera um único PDF comparando os municípios da região (ranking + página por município)."""
+    itens = _resolver_municipios(request)
+    regiao_nome = request.regiao_nome or (f"UF {request.uf}" if request.uf else "Região")
+    try:
+        render_kwargs = await montar_parametros_regional(
+            regiao_nome,
+            request.competencia,
+            [(item.codigo_ibge, item.municipio_nome, item.uf) for item in itens],
+            concurrency=settings.REPORT_BATCH_CONCURRENCY,
+        )
+        key = report_cache_key("regional", request.uf or "municipios", render_kwargs)
+        etag = etag_for(key)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
+        pdf_bytes, cache_hit = await render_report("regional", key, render_kwargs)
+
+        file_name = f"relatorio_regional_{request.uf or 'municipios'}_{request.competencia}.pdf"
+        return _pdf_response(pdf_bytes, file_name, etag, cache_hit)
+
+    except HTTPException:
+        raise
+    except DadosRelatorioIndisponiveis as exc:
+        raise _sem_dados(exc)
+    except PdfRenderPoolSaturated as exc:
+        raise _render_pool_busy(exc)
+    except Exception as exc:
+        logger.error(
+            "Erro ao gerar relatório regional - Região: %s, Competência: %s: %s",
+            regiao_nome, request.competencia, exc,
+            exc_info=True
+        )
+        raise HTTPException(
+            status_code=500,
+            detail="Erro interno ao gerar o relatório regional"
+        )
@@ -6,6 +6,8 @@ from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Query
 
+from app.core.json_response import FastJSONResponse
+from app.core.server_timing import fase
 from app.core.siaps_reference import (
     SIAPS_VALORES_VALIDADOS,
     quadrimestre_aplicavel,
@@ -17,7 +19,7 @@ from app.services.siaps_client import siaps_api_client
 from app.services.siaps_gap import calcular_gaps
 from app.utils.logger import logger
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 
 def _validar_parametros(codigo_ibge: str, competencia: str) -> None:
@@ -73,16 +75,18 @@ async def consultar_gap(
     """
     _validar_parametros(codigo_ibge, competencia)
 
-    dados_fin = await saude_api_client.consultar_financiamento(codigo_ibge, competencia)
+    with fase("fin", "Consulta de financiamento"):
+        dados_fin = await saude_api_client.consultar_financiamento(codigo_ibge, competencia)
     if not dados_fin:
         raise HTTPException(
             status_code=404,
             detail="Sem dados de financiamento para a competência informada.",
         )
 
-    envelope = await siaps_api_client.consultar_para_competencia(
-        codigo_ibge, competencia, quadrimestre=quadrimestre, force_refresh=force_refresh
-    )
+    with fase("siaps", "Consulta SIAPS"):
+        envelope = await siaps_api_client.consultar_para_competencia(
+            codigo_ibge, competencia, quadrimestre=quadrimestre, force_refresh=force_refresh
+        )
     quad = quadrimestre or quadrimestre_aplicavel(competencia)
     if not envelope:
         raise HTTPException(
@@ -90,7 +94,8 @@ async def consultar_gap(
             detail=f"Sem dados SIAPS para {codigo_ibge}/{quad}.",
         )
 
-    resultado = calcular_gaps(envelope, dados_fin)
+    with fase("gap", "Cálculo do gap"):
+        resultado = calcular_gaps(envelope, dados_fin)
     logger.info(
         "SIAPS gap %s/%s (quad %s): vigente=%.2f potencial=%.2f",
         codigo_ibge, competencia, quad,
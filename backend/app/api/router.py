@@ -3,7 +3,8 @@ Router principal da API que inclui todos os endpoints
 """
 from fastapi import APIRouter, Depends
 
-from app.api.endpoints import municipios, financiamento, municipios_editados, relatorios, edicoes, auth, users, siaps
+from app.api.endpoints import municipios, financiamento, municipios_editados, relatorios, edicoes, auth, users, siaps, profiler
+from app.core.config import settings
 from app.core.dependencies import get_current_authorized_user
 
 # Router principal
@@ -68,3 +69,11 @@ api_router.include_router(
     prefix="/users",
     tags=["Gestão de Usuários"]
 )
+
+# Profiling sob demanda (superusuários)
+if settings.PROFILER_ENABLED:
+    api_router.include_router(
+        profiler.router,
+        prefix="/admin/profiler",
+        tags=["Administração"]
+    )
@@ -41,26 +41,114 @@ class Settings(BaseSettings):
     SIAPS_CACHE_DIR: str = "data/SIAPS"
     SIAPS_CACHE_TTL_DAYS: int = 30  # dado quadrimestral muda raramente
 
+    # Renderização de PDF (WeasyPrint) fora do event loop
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_MAX_QUEUE: int = 8  # além dos workers ocupados; acima disso → 503
+    PDF_RENDER_USE_PROCESSES: bool = True  # False = threads (dev/testes)
+
+    # Cache de PDFs gerados (endereçado pelo conteúdo; LRU limitado por tamanho)
+    PDF_CACHE_ENABLED: bool = True
+    PDF_CACHE_DIR: str = "data/pdf_cache"
+    PDF_CACHE_MAX_MB: int = 256
+
+    # Fila de jobs de relatório (POST /relatorios/jobs)
+    REPORT_JOBS_DIR: str = "data/relatorio_jobs"
+    REPORT_JOBS_CONCURRENCY: int = 2
+    REPORT_JOBS_MAX_PENDING: int = 100
+    REPORT_JOBS_MAX_ATTEMPTS: int = 3
+    REPORT_JOBS_TTL_MINUTES: int = 60  # após concluir, arquivo e status expiram
+
+    # Relatórios em lote (POST /relatorios/lote → ZIP)
+    REPORT_BATCH_CONCURRENCY: int = 4
+    REPORT_BATCH_MAX_MUNICIPIOS: int = 900  # cobre a maior UF (MG, 853)
+    # Espera máxima por vaga no pool de PDF saturado, por município; depois vira falha
+    REPORT_BATCH_SATURATED_MAX_WAIT_SECONDS: int = 300
+
     # Cache Configuration
     REDIS_URL: str = "redis://localhost:6379"
     CACHE_TTL: int = 3600  # 1 hora
 
+    # Logging (fila + thread de escrita; ver app/utils/logger.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "text": formato legível, uma linha por registro
+    LOG_MODULE_LEVELS: str = ""  # ex.: "relatorio_pdf=WARNING,siaps_client=DEBUG"
+    LOG_QUEUE_SIZE: int = 10000  # cheia: descarta (stdout parado não trava a aplicação)
+    LOG_SAMPLING_ENABLED: bool = True
+    LOG_SAMPLING_BURST: int = 20  # INFO/DEBUG por linha de código e janela, sem amostragem
+    LOG_SAMPLING_WINDOW_SECONDS: float = 60
+    LOG_SAMPLING_RATE: int = 50  # acima do burst: 1 a cada N
+
+    # Métricas Prometheus em GET /metrics (sem autenticação: restringir na rede/proxy)
+    METRICS_ENABLED: bool = True
+
+    # Profiling sob demanda em /api/admin/profiler (superusuários)
+    PROFILER_ENABLED: bool = True
+
+    # Header Server-Timing com as fases da requisição (auth, fin, siaps, html, pdf...)
+    SERVER_TIMING_ENABLED: bool = True
+    SERVER_TIMING_LOG_SPANS: bool = False  # loga a árvore de fases de cada requisição
+
+    # Cache HTTP (ETag + Cache-Control) dos endpoints de referência
+    REFERENCE_CACHE_MAX_AGE_SECONDS: int = 86400  # /municipios/ufs e /municipios/municipios/{uf}
+    COMPETENCIA_CACHE_MAX_AGE_SECONDS: int = 3600  # /financiamento/competencia/latest
+
     # Database Configuration
     SQLITE_URL: str = "sqlite+aiosqlite:///papprefeito.db"
+    # Perfil aplicado a cada conexão nova (PRAGMA); vazio/0 mantém o padrão do SQLite
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # seguro com WAL; FULL só para durabilidade a cada commit
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # espera o lock em vez de "database is locked"
+    SQLITE_CACHE_SIZE_KB: int = 16384  # por conexão
+    SQLITE_MMAP_SIZE_MB: int = 128
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    # Pool de conexões reaproveitadas (o padrão do aiosqlite abre uma por sessão)
+    SQLITE_POOL_SIZE: int = 5
+    SQLITE_POOL_MAX_OVERFLOW: int = 5
+    SQLITE_POOL_TIMEOUT: int = 30
 
     # JSON Data Files (compatibilidade com sistema atual)
     DATA_CACHE_FILE: str = "data_cache_papprefeito.json"
-    EDITED_DATA_FILE: str = "municipios_editados.json"
+    EDITED_DATA_FILE: str = "municipios_editados.json"  # legado: migrado para EDITED_DATA_DB
+
+    # Dados editados de municípios (SQLite)
+    EDITED_DATA_DB: str = "municipios_editados.db"
+    EDITED_CACHE_MAX_ENTRIES: int = 5000  # cache de get_editado; 0 desativa
 
     # Paginação
     DEFAULT_PAGE_SIZE: int = 50
     MAX_PAGE_SIZE: int = 100
+    EDICOES_COUNT_CACHE_SECONDS: int = 30  # total da listagem por cursor (aproximado)
+
+    # Histórico de edições (diffs esparsos)
+    EDICOES_HISTORICO_SNAPSHOT_A_CADA: int = 20  # lista completa a cada N versões
+    EDICOES_HISTORICO_MAX_VERSOES: int = 100  # mais antigas são descartadas (até N + snapshot)
 
     # Authentication / Security
     SECRET_KEY: str = INSECURE_SECRET_KEY
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Access token com os dados do usuário: dispensa a consulta ao banco por requisição
+    AUTH_STATELESS_TOKENS: bool = False
+    AUTH_USER_VERSION_REFRESH_SECONDS: int = 5  # prazo para revogações de outros processos
+    # Cache de User por id em get_current_user (fora do modo stateless); 0 desativa
+    AUTH_USER_CACHE_SECONDS: int = 10  # prazo para alterações de outros processos
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 1000
+
+    # Limite de tentativas de login (janela deslizante, antes do bcrypt)
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_IP: int = 20
+    LOGIN_RATE_LIMIT_IP_WINDOW_SECONDS: int = 60
+    LOGIN_RATE_LIMIT_EMAIL: int = 5  # zerado a cada login bem-sucedido
+    LOGIN_RATE_LIMIT_EMAIL_WINDOW_SECONDS: int = 300
+    LOGIN_RATE_LIMIT_BACKEND: str = "memory"  # "redis": compartilhado via REDIS_URL
+    # Proxies reversos (IPs/CIDRs, separados por vírgula) cujo X-Forwarded-For é aceito
+    # para identificar o cliente; ex. com nginx em container: "127.0.0.1,::1,172.16.0.0/12"
+    TRUSTED_PROXIES: str = "127.0.0.1,::1"
+
+    # Hash de senhas (bcrypt) fora do event loop
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # além dos workers ocupados; acima disso → 503
 
     @field_validator("SECRET_KEY")
     @classmethod
@@ -1,12 +1,72 @@
 """
 Configuração do banco de dados SQLite com SQLAlchemy async
 """
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.utils.logger import logger
+
+_SYNCHRONOUS = {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3}
+_TEMP_STORE = {"DEFAULT": 0, "FILE": 1, "MEMORY": 2}
+
+
+def sqlite_pragmas() -> List[Tuple[str, Any]]:
+    """PRAGMAs do perfil configurado, na ordem em que são aplicados."""
+    pragmas: List[Tuple[str, Any]] = []
+    if settings.SQLITE_BUSY_TIMEOUT_MS:
+        # Primeiro: trocar o journal_mode também pode esperar por lock
+        pragmas.append(("busy_timeout", settings.SQLITE_BUSY_TIMEOUT_MS))
+    if settings.SQLITE_JOURNAL_MODE:
+        pragmas.append(("journal_mode", settings.SQLITE_JOURNAL_MODE.upper()))
+    if settings.SQLITE_SYNCHRONOUS:
+        pragmas.append(("synchronous", settings.SQLITE_SYNCHRONOUS.upper()))
+    if settings.SQLITE_CACHE_SIZE_KB:
+        pragmas.append(("cache_size", -settings.SQLITE_CACHE_SIZE_KB))  # negativo = KiB
+    if settings.SQLITE_MMAP_SIZE_MB:
+        pragmas.append(("mmap_size", settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024))
+    if settings.SQLITE_TEMP_STORE:
+        pragmas.append(("temp_store", settings.SQLITE_TEMP_STORE.upper()))
+    pragmas.append(("foreign_keys", "ON"))
+    return pragmas
+
 
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
 
-engine = create_async_engine(settings.SQLITE_URL, echo=False)
+
+def create_sqlite_engine(url: str, **kwargs) -> AsyncEngine:
+    """Engine aiosqlite com o perfil de PRAGMAs e um pool de conexões persistentes.
+
+    Arquivos usam ``AsyncAdaptedQueuePool`` (as PRAGMAs e o cache de páginas de cada
+    conexão sobrevivem entre requisições); ``:memory:`` usa ``StaticPool``, já que cada
+    conexão nova seria um banco vazio.
+    """
+    if make_url(url).database in (None, "", ":memory:"):
+        kwargs.setdefault("poolclass", StaticPool)
+    else:
+        kwargs.setdefault("poolclass", AsyncAdaptedQueuePool)
+        kwargs.setdefault("pool_size", settings.SQLITE_POOL_SIZE)
+        kwargs.setdefault("max_overflow", settings.SQLITE_POOL_MAX_OVERFLOW)
+        kwargs.setdefault("pool_timeout", settings.SQLITE_POOL_TIMEOUT)
+        kwargs.setdefault("pool_pre_ping", False)
+    new_engine = create_async_engine(url, echo=False, **kwargs)
+    event.listen(new_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    instrument_engine(new_engine.sync_engine, "app")
+    return new_engine
+
+
+engine = create_sqlite_engine(settings.SQLITE_URL)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -20,8 +80,59 @@ async def get_session() -> AsyncSession:
         yield session
 
 
+def _create_missing_indexes(sync_conn) -> None:
+    """``create_all`` não adiciona índices novos a tabelas já existentes."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _normalize_pragma(name: str, value: Any) -> Any:
+    if name == "synchronous" and isinstance(value, str):
+        return _SYNCHRONOUS.get(value, value)
+    if name == "temp_store" and isinstance(value, str):
+        return _TEMP_STORE.get(value, value)
+    if name == "foreign_keys" and isinstance(value, str):
+        return 1 if value == "ON" else 0
+    if name == "journal_mode":
+        return str(value).lower()
+    return value
+
+
+async def check_sqlite_pragmas(db_engine: Optional[AsyncEngine] = None) -> Dict[str, Any]:
+    """Lê as PRAGMAs efetivas de uma conexão do pool e registra divergências.
+
+    O SQLite ignora silenciosamente valores que não consegue aplicar (ex.: WAL em
+    ``:memory:`` ou em sistema de arquivos de rede, mmap desativado na compilação).
+    """
+    db_engine = db_engine or engine
+    efetivas: Dict[str, Any] = {}
+    async with db_engine.connect() as conn:
+        for name, _ in sqlite_pragmas():
+            efetivas[name] = (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+
+    divergentes = {
+        name: (valor, efetivas[name])
+        for name, valor in sqlite_pragmas()
+        if _normalize_pragma(name, valor) != _normalize_pragma(name, efetivas[name])
+    }
+    logger.info(
+        "SQLite pragmas efetivas: %s", ", ".join(f"{name}={value}" for name, value in efetivas.items())
+    )
+    for name, (pedido, efetivo) in divergentes.items():
+        logger.warning("SQLite PRAGMA %s: configurado %s, efetivo %s", name, pedido, efetivo)
+    return efetivas
+
+
 async def init_db():
-    """Cria todas as tabelas no startup."""
-    from app.models.db_models import UserDB, EdicaoDB  # noqa: F401
+    """Cria todas as tabelas (e índices que faltarem) no startup."""
+    from app.models.db_models import UserDB, EdicaoDB, EdicaoHistoricoDB  # noqa: F401
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+    await check_sqlite_pragmas()
+
+
+async def close_db():
+    """Fecha as conexões do pool no shutdown."""
+    await engine.dispose()
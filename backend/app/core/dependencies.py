@@ -1,20 +1,66 @@
 """
 Dependências do FastAPI para autenticação e autorização
 """
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.core.metrics import cache_lookup
 from app.core.security import decode_token, verify_token_type
+from app.core.server_timing import fase
+from app.core.token_claims import user_from_claims, user_version_cache
 from app.core.database import get_session
 from app.models.schemas import User
-from app.services.user_service import UserService
+from app.services.user_service import UserService, on_user_changed
 from app.services.edicoes_service import EdicoesService
 
 security = HTTPBearer()
 
 
+class UserCache:
+    """LRU com TTL de ``User`` por id, consultado por ``get_current_user``.
+
+    Alterações feitas por este processo (``UserService``) removem a entrada na hora;
+    as de outros processos valem quando ela expira.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[User, float]]" = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[0]
+
+    def put(self, user: User) -> None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        self._entries[user.id] = (user, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SECONDS, settings.AUTH_USER_CACHE_MAX_ENTRIES)
+on_user_changed(user_cache.invalidate)
+
+
 def get_user_service(session: AsyncSession = Depends(get_session)) -> UserService:
     return UserService(session)
 
@@ -27,7 +73,11 @@ async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     user_service: UserService = Depends(get_user_service)
 ) -> User:
-    token = credentials.credentials
+    with fase("auth", "Autenticação"):
+        return await _resolver_usuario(credentials.credentials, user_service)
+
+
+async def _resolver_usuario(token: str, user_service: UserService) -> User:
     payload = decode_token(token, settings.SECRET_KEY, settings.ALGORITHM)
 
     if not verify_token_type(payload, "access"):
@@ -45,6 +95,19 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if settings.AUTH_STATELESS_TOKENS:
+        # Token com os dados do usuário e versão ainda atual: dispensa o banco
+        claims_user = user_from_claims(payload)
+        if claims_user is not None:
+            versao = await user_version_cache.versao(user_id, user_service.get_user_versions)
+            if versao == payload["ver"]:
+                return claims_user
+
+    user = user_cache.get(user_id)
+    cache_lookup("user", hit=user is not None)
+    if user is not None:
+        return user
+
     user = await user_service.get_user_by_id(user_id)
     if user is None:
         raise HTTPException(
@@ -52,6 +115,7 @@ async def get_current_user(
             detail="Usuário não encontrado"
         )
 
+    user_cache.put(user)
     return user
 
 
@@ -0,0 +1,92 @@
+"""Respostas pré-serializadas com ETag forte para endpoints de dados de referência.
+
+UFs, municípios por UF e a competência mais recente quase nunca mudam. O corpo JSON
+é serializado uma vez e guardado com o ETag (SHA-256 do corpo); requisições com
+``If-None-Match`` correspondente recebem 304 sem chamar o serviço nem serializar nada.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.json_response import dumps
+from app.core.metrics import cache_lookup
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Avalia ``If-None-Match`` (lista separada por vírgula, ``*`` ou ``W/"..."``)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+@dataclass(frozen=True)
+class CachedJSON:
+    body: bytes
+    etag: str
+    versao: Any = None
+    expira_em: Optional[float] = None  # monotonic; None = não expira
+
+    @classmethod
+    def serializar(cls, content: Any, versao: Any = None, expira_em: Optional[float] = None) -> "CachedJSON":
+        body = dumps(jsonable_encoder(content))
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', versao=versao, expira_em=expira_em)
+
+
+class ReferenceResponseCache:
+    """Respostas por chave (ex.: ``municipios:MG``); só guarda respostas de sucesso.
+
+    Com ``ttl`` a entrada é recalculada ao expirar; se ``versao`` não mudou, o corpo
+    (e o ETag) anterior é mantido, para que clientes continuem recebendo 304.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._entries: Dict[str, CachedJSON] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedJSON]:
+        entry = self._entries.get(key)
+        if entry is None or (entry.expira_em is not None and entry.expira_em <= self._clock()):
+            cache_lookup("reference", hit=False)
+            return None
+        cache_lookup("reference", hit=True)
+        return entry
+
+    def put(self, key: str, content: Any, ttl: Optional[float] = None, versao: Any = None) -> CachedJSON:
+        expira_em = self._clock() + ttl if ttl is not None else None
+        with self._lock:
+            anterior = self._entries.get(key)
+            if anterior is not None and versao is not None and anterior.versao == versao:
+                entry = CachedJSON(anterior.body, anterior.etag, versao, expira_em)
+            else:
+                entry = CachedJSON.serializar(content, versao, expira_em)
+            self._entries[key] = entry
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def cached_response(entry: CachedJSON, if_none_match: Optional[str], max_age: int) -> Response:
+    """200 com o corpo pré-serializado ou 304 se o cliente já tem essa versão."""
+    headers = {"ETag": entry.etag, "Cache-Control": f"private, max-age={max_age}"}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+reference_cache = ReferenceResponseCache()
@@ -0,0 +1,49 @@
+"""Serialização JSON rápida para as respostas grandes da API.
+
+Com o ``orjson`` instalado (opcional, ``pip install orjson``) a serialização e o parse
+usam a implementação em Rust; sem ele, cai no ``json`` da biblioteca padrão com as
+mesmas opções do ``JSONResponse`` do Starlette (UTF-8, sem espaços).
+
+- ``FastJSONResponse``: ``default_response_class`` dos routers de dados
+  (financiamento, SIAPS, dados editados, edições);
+- ``RawJSONResponse``: devolve bytes já serializados (ex.: o corpo recebido da API do
+  governo) sem decodificar e codificar de novo.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """Parse de JSON em UTF-8 (o ``orjson`` só aceita UTF-8)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(FastJSONResponse):
+    """``content`` em bytes vai para o corpo como está; outros valores são serializados."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return super().render(content)
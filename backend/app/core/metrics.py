@@ -0,0 +1,336 @@
+"""Métricas da aplicação no formato texto do Prometheus (sem dependências externas).
+
+Registro em memória, por processo, com contadores, histogramas e gauges calculados na
+hora da coleta. Exposto em ``GET /metrics`` (``METRICS_ENABLED``). Com vários workers
+do uvicorn cada processo tem suas próprias séries: o Prometheus soma por instância.
+
+Instrumentação:
+
+- ``MetricsMiddleware``: latência por método, rota (template, ex.
+  ``/api/municipios/municipios/{uf}``) e status;
+- ``upstream_transport(nome)``: transporte httpx que mede as chamadas às APIs
+  externas (até a chegada dos headers da resposta);
+- ``instrument_engine``/``observe_db_query``: duração das consultas ao SQLite;
+- ``cache_lookup``: acertos e faltas dos caches;
+- histogramas de renderização de PDF e de hash de senha, alimentados pelos pools.
+"""
+import bisect
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Buckets padrão do cliente oficial do Prometheus (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # o Starlette acrescenta "; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def header(self) -> List[str]:
+        # Formato 0.0.4: a família do contador é declarada com o sufixo _total
+        return [f"# HELP {self.name}_total {self.documentation}", f"# TYPE {self.name}_total counter"]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels → [contagem por bucket (não cumulativa)..., soma]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * len(self.buckets) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._values.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._values.items())
+        lines = []
+        for key, series in items:
+            acumulado = 0
+            for limite, quantidade in zip(self.buckets, series):
+                acumulado += quantidade
+                le = f'le="{_format_value(limite)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {acumulado}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {acumulado}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """Gauge lido na coleta: ``callback()`` devolve o valor ou ``{(labels...): valor}``."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        value = self.callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in sorted(value.items())
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "papprefeito"):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existente = self._metrics.get(metric.name)
+            if existente is not None:
+                if type(existente) is not type(metric):
+                    raise ValueError(f"Métrica {metric.name} já registrada com outro tipo")
+                if isinstance(metric, CallbackGauge):
+                    existente.callback = metric.callback
+                return existente
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets=buckets))
+
+    def gauge(
+        self, name: str, documentation: str, callback: Callable, labelnames: Tuple[str, ...] = ()
+    ) -> CallbackGauge:
+        return self._register(CallbackGauge(f"{self.prefix}_{name}", documentation, callback, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception:  # gauge com callback quebrado não derruba a coleta
+                continue
+            lines += metric.header() + samples
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota.",
+    ("method", "route", "status"),
+)
+upstream_request_duration = registry.histogram(
+    "upstream_request_duration_seconds", "Latência das chamadas às APIs externas (até os headers).",
+    ("upstream", "method", "status"),
+)
+cache_requests = registry.counter(
+    "cache_requests", "Consultas aos caches por resultado (hit/miss).", ("cache", "result"),
+)
+pdf_render_duration = registry.histogram(
+    "pdf_render_duration_seconds", "Renderização de PDF no pool (inclui espera na fila).",
+    ("outcome",), buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+password_hash_duration = registry.histogram(
+    "password_hash_duration_seconds", "Tempo de CPU do bcrypt por operação (sem a fila).",
+    ("operation",), buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Duração das consultas ao SQLite por banco e comando.",
+    ("database", "statement"), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# ---------------------------------------------------------------------------
+# Banco de dados
+# ---------------------------------------------------------------------------
+
+_STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "WITH"}
+_PRIMEIRA_PALAVRA = re.compile(r"\s*(\w+)")
+
+
+def _statement(sql: str) -> str:
+    match = _PRIMEIRA_PALAVRA.match(sql)
+    palavra = match.group(1).upper() if match else ""
+    return palavra if palavra in _STATEMENTS else "OTHER"
+
+
+def observe_db_query(database: str, sql: str, seconds: float) -> None:
+    db_query_duration.observe(seconds, database=database, statement=_statement(sql))
+
+
+def instrument_engine(sync_engine: Engine, database: str) -> None:
+    """Mede cada ``cursor.execute`` do engine (``before``/``after_cursor_execute``)."""
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_inicio", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info["_metrics_inicio"].pop()
+        observe_db_query(database, statement, time.perf_counter() - inicio)
+
+    def erro(context):
+        inicios = context.connection.info.get("_metrics_inicio") if context.connection else None
+        if inicios:
+            inicios.pop()
+
+    event.listen(sync_engine, "before_cursor_execute", before)
+    event.listen(sync_engine, "after_cursor_execute", after)
+    event.listen(sync_engine, "handle_error", erro)
+
+
+# ---------------------------------------------------------------------------
+# APIs externas
+# ---------------------------------------------------------------------------
+
+class _UpstreamTransport(httpx.AsyncBaseTransport):
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        status = "error"
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            upstream_request_duration.observe(
+                time.perf_counter() - started, upstream=self.upstream, method=request.method, status=status
+            )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def upstream_transport(upstream: str, transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncBaseTransport:
+    """Transporte para ``httpx.AsyncClient(transport=...)`` que registra latência e status."""
+    return _UpstreamTransport(upstream, transport or httpx.AsyncHTTPTransport())
+
+
+# ---------------------------------------------------------------------------
+# Requisições HTTP
+# ---------------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """Middleware ASGI: latência por rota. Caminhos sem rota viram ``unmatched``
+    (evita uma série por URL inexistente)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
@@ -0,0 +1,245 @@
+"""Profiler sob demanda para o worker em produção (endpoints em ``/api/admin/profiler``).
+
+Uma sessão por processo, em um de dois modos:
+
+- por tempo (``segundos``): perfila tudo o que o worker executa nesse intervalo;
+- por requisições (``requisicoes`` + ``rota``): só enquanto há requisições cujo caminho
+  começa com ``rota`` em andamento, até N delas terminarem. Requisições concorrentes de
+  outras rotas que rodem nesses intervalos também entram no perfil.
+
+Durante a sessão rodam juntos:
+
+- amostragem de pilhas: uma thread lê ``sys._current_frames()`` a cada ``intervalo_ms``
+  e conta as pilhas de todas as threads (formato "collapsed", pronto para
+  ``flamegraph.pl``/speedscope). Custo baixo e independente do código perfilado;
+- ``cProfile`` (opcional) na thread do event loop, de onde sai o resumo ``pstats`` e o
+  arquivo ``.prof`` (snakeviz, ``python -m pstats``). Mais caro: desacelera o código
+  Python do event loop enquanto ativo.
+
+A renderização de PDF roda no ``pdf_render_pool``; com processos
+(``PDF_RENDER_USE_PROCESSES``) ela não aparece aqui, só a espera pelo resultado.
+Com vários workers do uvicorn, cada processo tem o próprio profiler.
+"""
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.utils.logger import logger
+
+
+class ProfilerOcupado(Exception):
+    """Já existe uma sessão de profiling em andamento neste processo."""
+
+
+def _rotulo(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Amostrador(threading.Thread):
+    def __init__(self, intervalo: float):
+        super().__init__(name="profiler-amostrador", daemon=True)
+        self.intervalo = intervalo
+        self.pilhas: Counter = Counter()
+        self.amostras = 0
+        self.ativo = threading.Event()  # amostra só quando setado
+        self._parar = threading.Event()
+        self._rotulos: Dict[Any, str] = {}
+
+    def run(self) -> None:
+        proprio = threading.get_ident()
+        nomes: Dict[int, str] = {}
+        while not self._parar.wait(self.intervalo):
+            if not self.ativo.is_set():
+                continue
+            if self.amostras % 100 == 0:
+                nomes = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == proprio:
+                    continue
+                pilha = []
+                while frame is not None:
+                    code = frame.f_code
+                    rotulo = self._rotulos.get(code)
+                    if rotulo is None:
+                        rotulo = self._rotulos[code] = _rotulo(code)
+                    pilha.append(rotulo)
+                    frame = frame.f_back
+                pilha.append(nomes.get(ident, f"thread-{ident}"))
+                self.pilhas[";".join(reversed(pilha))] += 1
+            self.amostras += 1
+
+    def parar(self) -> None:
+        self._parar.set()
+        self.join(timeout=5)
+
+
+class SessaoPerfil:
+    def __init__(
+        self,
+        segundos: Optional[float] = None,
+        requisicoes: Optional[int] = None,
+        rota: Optional[str] = None,
+        intervalo_ms: float = 5.0,
+        usar_cprofile: bool = True,
+        timeout: float = 600.0,
+    ):
+        self.segundos = segundos
+        self.requisicoes = requisicoes
+        self.rota = rota
+        self.intervalo_ms = intervalo_ms
+        self.usar_cprofile = usar_cprofile
+        self.timeout = timeout
+        self.iniciado_em = datetime.now()
+        self.concluido_em: Optional[datetime] = None
+        self.requisicoes_concluidas = 0
+        self._inicio = time.perf_counter()
+        self._duracao = 0.0
+        self._em_andamento = 0
+        self._amostrador = _Amostrador(intervalo_ms / 1000)
+        self._cprofile = cProfile.Profile() if usar_cprofile else None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.resultado: Optional[Dict[str, Any]] = None
+
+    @property
+    def por_requisicoes(self) -> bool:
+        return self.requisicoes is not None
+
+    @property
+    def concluida(self) -> bool:
+        return self.concluido_em is not None
+
+    def _ligar(self) -> None:
+        # Sempre na thread do event loop: o cProfile mede só a thread que o habilitou
+        self._amostrador.ativo.set()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def _desligar(self) -> None:
+        self._amostrador.ativo.clear()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def iniciar(self, ao_concluir) -> None:
+        self._amostrador.start()
+        loop = asyncio.get_running_loop()
+        limite = self.segundos if not self.por_requisicoes else self.timeout
+        self._timer = loop.call_later(limite, ao_concluir)
+        if not self.por_requisicoes:
+            self._ligar()
+
+    def aceita(self, path: str) -> bool:
+        return self.por_requisicoes and not self.concluida and path.startswith(self.rota or "/")
+
+    def requisicao_iniciada(self) -> None:
+        self._em_andamento += 1
+        if self._em_andamento == 1:
+            self._ligar()
+
+    def requisicao_concluida(self) -> bool:
+        """Devolve True quando a sessão atingiu o número de requisições pedido."""
+        self._em_andamento -= 1
+        if self._em_andamento == 0:
+            self._desligar()
+        self.requisicoes_concluidas += 1
+        return self.requisicoes_concluidas >= self.requisicoes
+
+    def concluir(self) -> None:
+        if self.concluida:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._desligar()
+        self._amostrador.parar()
+        self._duracao = time.perf_counter() - self._inicio
+        self.concluido_em = datetime.now()
+        self.resultado = {
+            "collapsed": "".join(
+                f"{pilha} {quantidade}\n" for pilha, quantidade in self._amostrador.pilhas.most_common()
+            ),
+            "pstats": None,
+            "prof": None,
+        }
+        if self._cprofile is not None:
+            saida = io.StringIO()
+            stats = pstats.Stats(self._cprofile, stream=saida)  # consome profile.stats
+            if stats.stats:
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(60)
+                stats.sort_stats(pstats.SortKey.TIME).print_stats(30)
+                self.resultado["pstats"] = saida.getvalue()
+                self.resultado["prof"] = marshal.dumps(stats.stats)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "modo": "requisicoes" if self.por_requisicoes else "segundos",
+            "rota": self.rota,
+            "segundos": self.segundos,
+            "requisicoes": self.requisicoes,
+            "requisicoes_concluidas": self.requisicoes_concluidas,
+            "intervalo_ms": self.intervalo_ms,
+            "cprofile": self.usar_cprofile,
+            "iniciado_em": self.iniciado_em,
+            "concluido_em": self.concluido_em,
+            "em_andamento": not self.concluida,
+            "duracao_segundos": round(
+                self._duracao if self.concluida else time.perf_counter() - self._inicio, 3
+            ),
+            "amostras": self._amostrador.amostras,
+            "pilhas_distintas": len(self._amostrador.pilhas),
+        }
+
+
+class Profiler:
+    """Guarda a sessão atual (ou a última concluída, com o resultado)."""
+
+    def __init__(self):
+        self.sessao: Optional[SessaoPerfil] = None
+
+    def iniciar(self, sessao: SessaoPerfil) -> SessaoPerfil:
+        if self.sessao is not None and not self.sessao.concluida:
+            raise ProfilerOcupado("Já existe uma sessão de profiling em andamento")
+        self.sessao = sessao
+        sessao.iniciar(self.parar)
+        logger.info("Profiler iniciado: %s", sessao.status())
+        return sessao
+
+    def parar(self) -> Optional[SessaoPerfil]:
+        sessao = self.sessao
+        if sessao is not None and not sessao.concluida:
+            sessao.concluir()
+            logger.info(
+                "Profiler concluído: %d amostra(s), %d requisição(ões)",
+                sessao._amostrador.amostras, sessao.requisicoes_concluidas,
+            )
+        return sessao
+
+
+profiler = Profiler()
+
+
+class ProfilerMiddleware:
+    """Liga o profiling durante as requisições da rota alvo (modo por requisições)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        sessao = profiler.sessao
+        if scope["type"] != "http" or sessao is None or not sessao.aceita(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        sessao.requisicao_iniciada()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if sessao.requisicao_concluida() and profiler.sessao is sessao:
+                profiler.parar()
@@ -0,0 +1,241 @@
+"""
+Limite de tentativas de login por janela deslizante (por IP e por email).
+
+Verificado antes de qualquer hash: cada tentativa de login custa ~250 ms de bcrypt
+(inclusive para emails inexistentes), então uma rajada de credential stuffing ocupa
+a CPU dos workers. Acima do limite a resposta é 429 com ``Retry-After``, sem hash.
+
+O registro das tentativas fica em memória por padrão (por processo). Com
+``LOGIN_RATE_LIMIT_BACKEND=redis`` fica num sorted set por chave no Redis de
+``REDIS_URL``, compartilhado entre processos e instâncias; se o Redis falhar, o login
+segue sem limite (falha aberta) em vez de bloquear todo mundo.
+
+O IP é o do cliente mesmo atrás do nginx: ``X-Forwarded-For`` só é considerado quando
+a conexão vem de um proxy listado em ``TRUSTED_PROXIES``. Logins bem-sucedidos não
+consomem a cota do IP (um escritório inteiro atrás de um NAT entra normalmente).
+"""
+import ipaddress
+import math
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.utils.logger import logger
+
+
+Rede = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_trusted_proxies(valor: str) -> List[Rede]:
+    """``"127.0.0.1, 172.16.0.0/12"`` → redes; entradas inválidas são ignoradas."""
+    redes = []
+    for item in (valor or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            redes.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning("TRUSTED_PROXIES: entrada inválida ignorada: %s", item)
+    return redes
+
+
+def _confiavel(ip: str, proxies: List[Rede]) -> bool:
+    try:
+        endereco = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(endereco in rede for rede in proxies)
+
+
+def resolver_ip_cliente(peer: Optional[str], forwarded_for: Optional[str], proxies: List[Rede]) -> Optional[str]:
+    """IP do cliente: o endereço da conexão ou, se ele for um proxy confiável, o último
+    endereço não confiável de ``X-Forwarded-For`` (da direita para a esquerda; os da
+    esquerda podem ter sido forjados pelo cliente)."""
+    if not peer or not forwarded_for or not _confiavel(peer, proxies):
+        return peer
+    cliente = peer
+    for ip in reversed([parte.strip() for parte in forwarded_for.split(",") if parte.strip()]):
+        cliente = ip
+        if not _confiavel(ip, proxies):
+            break
+    return cliente
+
+
+_trusted_proxies = parse_trusted_proxies(settings.TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> Optional[str]:
+    peer = request.client.host if request.client else None
+    return resolver_ip_cliente(peer, request.headers.get("x-forwarded-for"), _trusted_proxies)
+
+
+class MemoryWindowStore:
+    """Log de tentativas por chave em memória (um deque de instantes por chave)."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, max_keys: int = 100_000):
+        self._clock = clock
+        self._max_keys = max_keys
+        self._hits: Dict[str, Deque[float]] = {}
+        self._maior_janela = 0.0
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """Registra a tentativa e devolve 0, ou devolve o tempo (s) até haver vaga."""
+        now = self._clock()
+        self._maior_janela = max(self._maior_janela, window)
+        hits = self._hits.get(key)
+        if hits is None:
+            if len(self._hits) >= self._max_keys:
+                self._varrer(now)
+            hits = self._hits[key] = deque()
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        if len(hits) >= limit:
+            return hits[0] + window - now
+        hits.append(now)
+        return 0.0
+
+    async def undo(self, key: str) -> None:
+        """Devolve a tentativa mais recente da chave."""
+        hits = self._hits.get(key)
+        if hits:
+            hits.pop()
+
+    async def reset(self, key: str) -> None:
+        self._hits.pop(key, None)
+
+    def _varrer(self, now: float) -> None:
+        """Descarta chaves sem tentativas dentro da maior janela em uso."""
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= now - self._maior_janela]:
+            del self._hits[key]
+
+    async def close(self) -> None:
+        pass
+
+
+# Limpa a janela, compara e registra num único EVAL (atômico no Redis): com comandos
+# separados, N workers leriam a mesma contagem e passariam todos juntos.
+# Devolve "0" (registrada) ou a espera em segundos, como string (o Redis trunca números).
+_HIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        return tostring(tonumber(oldest[2]) + window - now)
+    end
+    return tostring(window)
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return '0'
+"""
+
+
+class RedisWindowStore:
+    """Mesmo log num sorted set do Redis (score = instante da tentativa)."""
+
+    def __init__(self, client: Any, prefix: str = "login_rl:", clock: Callable[[], float] = time.time):
+        self._client = client
+        self._prefix = prefix
+        self._clock = clock
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        now = self._clock()
+        espera = await self._client.eval(
+            _HIT_SCRIPT, 1, self._prefix + key,
+            repr(now), repr(float(window)), limit, f"{now}:{uuid.uuid4().hex[:8]}", math.ceil(window),
+        )
+        return max(0.0, float(espera))
+
+    async def undo(self, key: str) -> None:
+        await self._client.zpopmax(self._prefix + key)
+
+    async def reset(self, key: str) -> None:
+        await self._client.delete(self._prefix + key)
+
+    async def close(self) -> None:
+        close = getattr(self._client, "aclose", None) or getattr(self._client, "close", None)
+        if close is not None:
+            await close()
+
+
+def _redis_store() -> RedisWindowStore:
+    try:
+        import redis.asyncio as redis_asyncio
+    except ImportError as exc:  # dependência opcional
+        raise RuntimeError(
+            "LOGIN_RATE_LIMIT_BACKEND=redis requer o pacote 'redis' (pip install redis)"
+        ) from exc
+    return RedisWindowStore(redis_asyncio.from_url(settings.REDIS_URL))
+
+
+class LoginRateLimiter:
+    """Janela deslizante por IP e por email, aplicada antes da verificação de senha."""
+
+    def __init__(
+        self,
+        store: Optional[Any] = None,
+        ip_limit: int = settings.LOGIN_RATE_LIMIT_IP,
+        ip_window: float = settings.LOGIN_RATE_LIMIT_IP_WINDOW_SECONDS,
+        email_limit: int = settings.LOGIN_RATE_LIMIT_EMAIL,
+        email_window: float = settings.LOGIN_RATE_LIMIT_EMAIL_WINDOW_SECONDS,
+    ):
+        self._store = store
+        self.ip_limit = ip_limit
+        self.ip_window = ip_window
+        self.email_limit = email_limit
+        self.email_window = email_window
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = _redis_store() if settings.LOGIN_RATE_LIMIT_BACKEND == "redis" else MemoryWindowStore()
+        return self._store
+
+    async def _hit(self, key: str, limit: int, window: float) -> float:
+        try:
+            return await self.store.hit(key, limit, window)
+        except Exception as exc:
+            logger.warning("Limite de login indisponível (%s); tentativa liberada", exc)
+            return 0.0
+
+    async def check(self, ip: Optional[str], email: str) -> None:
+        """Conta a tentativa ou levanta 429 (com ``Retry-After``) se IP ou email estourou."""
+        if not settings.LOGIN_RATE_LIMIT_ENABLED:
+            return
+        espera = 0.0
+        if ip:
+            espera = await self._hit(f"ip:{ip}", self.ip_limit, self.ip_window)
+        if not espera:
+            espera = await self._hit(f"email:{email.strip().lower()}", self.email_limit, self.email_window)
+        if espera:
+            logger.warning("Login limitado: ip=%s email=%s", ip, email)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Muitas tentativas de login. Tente novamente mais tarde.",
+                headers={"Retry-After": str(max(1, math.ceil(espera)))},
+            )
+
+    async def login_bem_sucedido(self, ip: Optional[str], email: str) -> None:
+        """Zera as tentativas do email e devolve a do IP (login válido não gasta a cota)."""
+        if not settings.LOGIN_RATE_LIMIT_ENABLED:
+            return
+        try:
+            await self.store.reset(f"email:{email.strip().lower()}")
+            if ip:
+                await self.store.undo(f"ip:{ip}")
+        except Exception as exc:
+            logger.warning("Limite de login indisponível (%s)", exc)
+
+    async def close(self) -> None:
+        if self._store is not None:
+            await self._store.close()
+
+
+login_rate_limiter = LoginRateLimiter()
@@ -1,12 +1,23 @@
 """
 Utilitários de segurança para autenticação
 """
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 
+from app.core.config import settings
+from app.core.metrics import password_hash_duration
+from app.utils.logger import logger
+
+T = TypeVar("T")
+
 # Contexto para hash de senhas usando bcrypt
 # bcrypt__default_rounds=12 define custo computacional
 # bcrypt__min_rounds=10 e bcrypt__max_rounds=14 para validação
@@ -52,11 +63,140 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def _cronometrado(func: Callable[..., T], *args: Any) -> Tuple[T, float]:
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """
+    Hash e verificação de senha (bcrypt, ~250 ms de CPU) fora do event loop.
+
+    Roda em um pool de threads limitado: a extensão nativa do bcrypt libera o GIL durante
+    o cálculo, então as demais requisições seguem atendidas enquanto há logins em curso.
+    Com ``workers + max_queue`` operações em andamento, novas chamadas recebem 503 com
+    ``Retry-After`` em vez de esperar até o timeout do cliente.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self._max_queue_depth = 0
+        self._rejected = 0
+        self._avg_seconds = 0.25
+        # _in_flight é decrementado na thread do pool, quando o bcrypt termina
+        self._lock = threading.Lock()
+        # operação → [quantidade, soma de execução (s), máx. de execução (s), soma de espera (s)]
+        self._stats: Dict[str, list] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.workers)
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_seconds * (self.queue_depth + 1) / self.workers))
+
+    def _liberar(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def _run(self, operacao: str, func: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                logger.warning(
+                    "Hash de senha recusado (503): fila cheia, %d em andamento, %d recusa(s) no total",
+                    self._in_flight, self._rejected,
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servidor ocupado, tente novamente em instantes",
+                    headers={"Retry-After": str(self.retry_after())},
+                )
+            self._in_flight += 1
+            self._max_queue_depth = max(self._max_queue_depth, self.queue_depth)
+        started = time.perf_counter()
+        try:
+            if self._executor is None:
+                self.start()
+            future = self._executor.submit(_cronometrado, func, *args)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        # A vaga é devolvida quando o bcrypt termina, não quando quem espera desiste:
+        # cancelada a requisição, o cálculo já em andamento segue ocupando a thread.
+        future.add_done_callback(self._liberar)
+        result, elapsed = await asyncio.wrap_future(future)
+
+        password_hash_duration.observe(elapsed, operation=operacao)
+        stats = self._stats.setdefault(operacao, [0, 0.0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        stats[3] += max(0.0, time.perf_counter() - started - elapsed)
+        self._avg_seconds += 0.2 * (elapsed - self._avg_seconds)
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """``verify_password`` no pool."""
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        """``get_password_hash`` no pool."""
+        return await self._run("hash", get_password_hash, password)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Ocupação do pool e latência por operação (execução e espera na fila, em ms)."""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self._max_queue_depth,
+            "rejected": self._rejected,
+            "operations": {
+                operacao: {
+                    "count": count,
+                    "avg_ms": round(total / count * 1000, 1),
+                    "max_ms": round(maximo * 1000, 1),
+                    "avg_wait_ms": round(espera / count * 1000, 1),
+                }
+                for operacao, (count, total, maximo, espera) in self._stats.items()
+            },
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+
 def create_access_token(
     subject: str,
     secret_key: str,
     algorithm: str = "HS256",
-    expires_delta: Optional[timedelta] = None
+    expires_delta: Optional[timedelta] = None,
+    extra_claims: Optional[Dict[str, Any]] = None
 ) -> str:
     """
     Cria um token JWT de acesso
@@ -66,6 +206,7 @@ def create_access_token(
         secret_key: Chave secreta para assinar o token
         algorithm: Algoritmo de criptografia (padrão HS256)
         expires_delta: Tempo de expiração do token
+        extra_claims: Claims adicionais (ex.: dados do usuário no modo stateless)
 
     Returns:
         Token JWT codificado
@@ -79,7 +220,8 @@ def create_access_token(
         "sub": subject,
         "exp": expire,
         "iat": datetime.utcnow(),
-        "type": "access"
+        "type": "access",
+        **(extra_claims or {})
     }
 
     encoded_jwt = jwt.encode(to_encode, secret_key, algorithm=algorithm)
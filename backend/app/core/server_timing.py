@@ -0,0 +1,133 @@
+"""Tempo por fase da requisição, devolvido no header ``Server-Timing``.
+
+``ServerTimingMiddleware`` abre uma medição por requisição; o código marca as fases com
+``with fase("fin", "Financiamento"):`` (aninháveis; funciona em código síncrono e
+assíncrono e em tarefas de ``asyncio.gather``). Fases medidas fora do processo, como a
+renderização no pool de PDF, entram com ``registrar_fase``. Requisições sem nenhuma fase
+não recebem o header. Com ``SERVER_TIMING_LOG_SPANS`` a árvore completa é logada.
+
+Ex.: ``Server-Timing: auth;dur=1.2;desc="Autenticação", fin;dur=812.4, ..., total;dur=1630.2``
+"""
+import time
+import unicodedata
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from app.utils.logger import logger
+
+
+@dataclass
+class Span:
+    nome: str
+    descricao: Optional[str] = None
+    inicio: float = 0.0  # perf_counter
+    duracao: float = 0.0  # segundos
+    filhos: List["Span"] = field(default_factory=list)
+
+
+@dataclass
+class RequestTiming:
+    inicio: float = field(default_factory=time.perf_counter)
+    fases: List[Span] = field(default_factory=list)
+
+    def todas(self) -> Iterator[Span]:
+        pendentes = list(reversed(self.fases))
+        while pendentes:
+            span = pendentes.pop()
+            yield span
+            pendentes.extend(reversed(span.filhos))
+
+
+_atual: ContextVar[Optional[RequestTiming]] = ContextVar("server_timing", default=None)
+_pai: ContextVar[Optional[Span]] = ContextVar("server_timing_pai", default=None)
+
+
+def _anexar(span: Span) -> None:
+    timing = _atual.get()
+    if timing is None:
+        return
+    pai = _pai.get()
+    (pai.filhos if pai is not None else timing.fases).append(span)
+
+
+@contextmanager
+def fase(nome: str, descricao: Optional[str] = None) -> Iterator[None]:
+    """Mede o bloco como uma fase da requisição atual (sem requisição: não faz nada)."""
+    if _atual.get() is None:
+        yield
+        return
+    span = Span(nome, descricao, time.perf_counter())
+    _anexar(span)
+    token = _pai.set(span)
+    try:
+        yield
+    finally:
+        _pai.reset(token)
+        span.duracao = time.perf_counter() - span.inicio
+
+
+def registrar_fase(nome: str, segundos: float, descricao: Optional[str] = None) -> None:
+    """Fase já medida em outro lugar (ex.: dentro do processo de renderização)."""
+    _anexar(Span(nome, descricao, time.perf_counter() - segundos, segundos))
+
+
+def _nome_valido(nome: str) -> str:
+    return "".join(c if (c.isascii() and c.isalnum()) or c in "-_." else "_" for c in nome) or "fase"
+
+
+def server_timing_header(timing: RequestTiming, total: float) -> str:
+    partes = []
+    for span in timing.todas():
+        parte = f"{_nome_valido(span.nome)};dur={span.duracao * 1000:.1f}"
+        if span.descricao:
+            # Header HTTP: só ASCII
+            desc = unicodedata.normalize("NFKD", span.descricao).encode("ascii", "ignore").decode()
+            parte += ';desc="' + desc.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        partes.append(parte)
+    partes.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(partes)
+
+
+def _arvore(spans: List[Span], nivel: int = 0) -> List[str]:
+    linhas = []
+    for span in spans:
+        rotulo = f"{span.nome} ({span.descricao})" if span.descricao else span.nome
+        linhas.append(f"{'  ' * nivel}- {rotulo}: {span.duracao * 1000:.1f} ms")
+        linhas += _arvore(span.filhos, nivel + 1)
+    return linhas
+
+
+class ServerTimingMiddleware:
+    """Middleware ASGI: abre a medição e acrescenta o header ao início da resposta."""
+
+    def __init__(self, app, log_spans: bool = False):
+        self.app = app
+        self.log_spans = log_spans
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _atual.set(timing)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and timing.fases:
+                total = time.perf_counter() - timing.inicio
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(timing, total).encode("ascii")))
+                message = {**message, "headers": headers}
+                if self.log_spans:
+                    logger.info(
+                        "Server-Timing %s %s (%.1f ms)\n%s",
+                        scope["method"], scope["path"], total * 1000, "\n".join(_arvore(timing.fases)),
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _atual.reset(token)
@@ -0,0 +1,91 @@
+"""
+Access tokens "stateless": dados do usuário embutidos no token (``AUTH_STATELESS_TOKENS``).
+
+O token carrega o ``User`` e a versão do usuário no momento da emissão (``updated_at``
+em microssegundos — toda alteração de usuário já avança esse campo). A cada requisição
+a versão do token é comparada com ``user_version_cache``, um mapa ``id → versão`` de
+todos os usuários relido do banco a cada ``AUTH_USER_VERSION_REFRESH_SECONDS`` (uma
+consulta por intervalo, não por requisição):
+
+- versão igual: o usuário do token vale, sem consulta ao banco;
+- versão diferente ou usuário ausente: cai no caminho normal (``get_user_by_id``),
+  que reflete revogações, desativações e mudanças de permissão.
+
+Alterações feitas por este processo atualizam o mapa na hora; as de outros processos
+valem em até ``AUTH_USER_VERSION_REFRESH_SECONDS``.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.models.schemas import User
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def user_version(updated_at: Optional[datetime]) -> int:
+    """Versão do usuário: ``updated_at`` em microssegundos (0 se nunca atualizado)."""
+    if updated_at is None:
+        return 0
+    return (updated_at.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+
+
+def token_claims(user: User) -> Dict[str, Any]:
+    """Claims extras do access token no modo stateless (vazio fora dele)."""
+    if not settings.AUTH_STATELESS_TOKENS:
+        return {}
+    return {
+        "usr": user.model_dump(mode="json", exclude={"id"}),
+        "ver": user_version(user.updated_at),
+    }
+
+
+def user_from_claims(payload: Dict[str, Any]) -> Optional[User]:
+    claims = payload.get("usr")
+    if not isinstance(claims, dict) or not isinstance(payload.get("ver"), int):
+        return None
+    try:
+        return User(id=payload["sub"], **claims)
+    except (KeyError, TypeError, ValidationError):
+        return None
+
+
+class UserVersionCache:
+    """Mapa ``user_id → versão`` de todos os usuários, relido em bloco periodicamente."""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._versoes: Dict[str, int] = {}
+        self._carregado_em = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def _expirado(self) -> bool:
+        return time.monotonic() - self._carregado_em >= self.refresh_seconds
+
+    async def versao(
+        self,
+        user_id: str,
+        carregar: Callable[[], Awaitable[Dict[str, int]]],
+    ) -> Optional[int]:
+        """Versão atual do usuário (None se não existe), recarregando o mapa se expirou."""
+        if self._expirado():
+            async with self._lock:
+                if self._expirado():
+                    self._versoes = await carregar()
+                    self._carregado_em = time.monotonic()
+        return self._versoes.get(user_id)
+
+    def atualizar(self, user_id: str, updated_at: Optional[datetime]) -> None:
+        """Registra uma alteração feita por este processo."""
+        self._versoes[user_id] = user_version(updated_at)
+
+    def invalidar(self) -> None:
+        self._versoes = {}
+        self._carregado_em = float("-inf")
+
+
+user_version_cache = UserVersionCache(settings.AUTH_USER_VERSION_REFRESH_SECONDS)
@@ -3,7 +3,8 @@ Modelos SQLAlchemy para o banco de dados SQLite
 """
 import uuid
 from datetime import datetime
-from sqlalchemy import String, Boolean, Integer, Text, DateTime, UniqueConstraint
+from typing import Dict, List, Optional
+from sqlalchemy import JSON, String, Boolean, Integer, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from app.core.database import Base
 
@@ -28,11 +29,40 @@ class EdicaoDB(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     codigo_municipio: Mapped[str] = mapped_column(String(10), nullable=False, index=True)
     competencia: Mapped[str] = mapped_column(String(6), nullable=False)
-    perda_recurso_mensal: Mapped[str] = mapped_column(Text, nullable=False)  # JSON string
+    # Coluna JSON (texto no SQLite, lido/agregado com as funções JSON1 em SQL)
+    perda_recurso_mensal: Mapped[List[float]] = mapped_column(JSON, nullable=False)
     usuario_id: Mapped[str] = mapped_column(String(36), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __table_args__ = (
         UniqueConstraint("codigo_municipio", "competencia", name="uq_municipio_competencia"),
+        # Listagem paginada por cursor: ORDER BY updated_at DESC, id DESC (com e sem filtro)
+        Index("ix_edicoes_updated_at_id", "updated_at", "id"),
+        Index("ix_edicoes_municipio_updated_at_id", "codigo_municipio", "updated_at", "id"),
+        # Agregados por competência (e faixa de códigos da UF)
+        Index("ix_edicoes_competencia_municipio", "competencia", "codigo_municipio"),
+    )
+
+
+class EdicaoHistoricoDB(Base):
+    """Versões de uma edição (append-only). Cada linha guarda só as posições alteradas;
+    ``snapshot`` traz a lista inteira a cada ``EDICOES_HISTORICO_SNAPSHOT_A_CADA`` versões
+    para limitar o custo da reconstrução e permitir descartar versões antigas."""
+    __tablename__ = "edicoes_historico"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    codigo_municipio: Mapped[str] = mapped_column(String(10), nullable=False)
+    competencia: Mapped[str] = mapped_column(String(6), nullable=False)
+    versao: Mapped[int] = mapped_column(Integer, nullable=False)
+    usuario_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    alterado_em: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    excluida: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    tamanho: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    alteracoes: Mapped[Optional[Dict[str, float]]] = mapped_column(JSON, nullable=True)  # {"posição": valor}
+    snapshot: Mapped[Optional[List[float]]] = mapped_column(JSON, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("codigo_municipio", "competencia", "versao", name="uq_historico_versao"),
+        Index("ix_historico_alterado_em", "codigo_municipio", "competencia", "alterado_em"),
     )
@@ -1,9 +1,9 @@
 """
 Modelos Pydantic para validação de dados
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from pydantic import BaseModel, Field, validator
-from pydantic import AliasChoices, ConfigDict
+from pydantic import AliasChoices, ConfigDict, model_validator
 from datetime import datetime
 
 class UF(BaseModel):
@@ -19,6 +19,13 @@ class Municipio(BaseModel):
     uf: str = Field(..., description="Sigla da UF")
     populacao: Optional[int] = Field(None, description="População do município")
 
+class MunicipioBuscaItem(Municipio):
+    """Resultado da busca de municípios por nome (autocomplete)"""
+    rotulo: str = Field(..., description="Nome com a UF, ex.: 'Filadélfia - BA'")
+    correspondencia: Literal["exata", "prefixo", "palavra", "aproximada"] = Field(
+        ..., description="Tipo de correspondência com o termo buscado"
+    )
+
 class FinanciamentoParams(BaseModel):
     """Parâmetros para consulta de financiamento"""
     codigo_ibge: str = Field(..., min_length=6, max_length=7, description="Código IBGE do município")
@@ -232,6 +239,14 @@ class ResumoDetalhado(ResumoFinanceiro):
     total_desconto: float = Field(default=0.0, description="Soma de todos os descontos")
 
 
+class ResumoMunicipioRegional(BaseModel):
+    """Resumo financeiro de um município dentro do relatório regional"""
+    codigo_ibge: str = Field(..., description="Código IBGE do município")
+    municipio_nome: Optional[str] = Field(None, description="Nome do município para exibição")
+    uf: Optional[str] = Field(None, description="Sigla da UF para exibição")
+    resumo: ResumoFinanceiro
+
+
 class RelatorioPDFRequest(BaseModel):
     """Payload para geração do relatório financeiro em PDF"""
     codigo_ibge: str = Field(..., description="Código IBGE do município")
@@ -261,6 +276,76 @@ class RelatorioPDFRequest(BaseModel):
 
         return v
 
+class RelatorioJobRequest(RelatorioPDFRequest):
+    """Payload para enfileirar a geração de um relatório (POST /relatorios/jobs)"""
+    tipo: Literal["padrao", "detalhado"] = Field("detalhado", description="Modelo do relatório")
+
+class RelatorioJobStatus(BaseModel):
+    """Status de um job de relatório"""
+    id: str
+    tipo: str
+    codigo_ibge: str
+    competencia: str
+    status: str = Field(..., description="pendente, processando, concluido ou falhou")
+    progresso: int = Field(..., ge=0, le=100)
+    etapa: str
+    tentativas: int
+    erro: Optional[str] = None
+    criado_em: datetime
+    concluido_em: Optional[datetime] = None
+    expira_em: Optional[datetime] = None
+    tamanho_bytes: Optional[int] = None
+    status_url: str
+    arquivo_url: Optional[str] = None
+
+class MunicipiosRelatorioRequest(BaseModel):
+    """Seleção de municípios para relatórios de vários municípios: lista de códigos IBGE ou uma UF"""
+    competencia: str = Field(..., min_length=6, max_length=6, description="Competência no formato AAAAMM")
+    codigos_ibge: Optional[List[str]] = Field(None, description="Códigos IBGE dos municípios")
+    uf: Optional[str] = Field(None, min_length=2, max_length=2, description="Sigla da UF (todos os municípios)")
+
+    @validator('codigos_ibge')
+    def validate_codigos_ibge(cls, v: Optional[List[str]]) -> Optional[List[str]]:
+        if v is None:
+            return v
+        if not v:
+            raise ValueError('Informe ao menos um código IBGE')
+        for codigo in v:
+            if not codigo or not codigo.isdigit() or len(codigo) < 6:
+                raise ValueError(f'Código IBGE inválido: {codigo}')
+        # Remove repetidos preservando a ordem
+        return list(dict.fromkeys(v))
+
+    @validator('uf')
+    def validate_uf(cls, v: Optional[str], values) -> Optional[str]:
+        if v is not None and values.get('codigos_ibge'):
+            raise ValueError('Informe codigos_ibge ou uf, não ambos')
+        return v.upper() if v else v
+
+    @validator('competencia')
+    def validate_competencia(cls, v: str) -> str:
+        if not v.isdigit():
+            raise ValueError('Competência deve conter apenas dígitos')
+
+        ano = int(v[:4])
+        mes = int(v[4:])
+
+        if ano < 2020 or ano > 2030:
+            raise ValueError('Ano deve estar entre 2020 e 2030')
+
+        if mes < 1 or mes > 12:
+            raise ValueError('Mês deve estar entre 01 e 12')
+
+        return v
+
+class RelatorioLoteRequest(MunicipiosRelatorioRequest):
+    """Payload para geração de relatórios em lote (ZIP, um PDF por município)"""
+    tipo: Literal["padrao", "detalhado"] = Field("padrao", description="Modelo do relatório")
+
+class RelatorioRegionalRequest(MunicipiosRelatorioRequest):
+    """Payload para o relatório regional consolidado (um PDF comparando os municípios)"""
+    regiao_nome: Optional[str] = Field(None, max_length=120, description="Nome da região/CIR/consórcio")
+
 class ResponseBase(BaseModel):
     """Modelo base para respostas da API"""
     success: bool = True
@@ -522,3 +607,40 @@ class SiapsGapResponse(BaseModel):
     total_potencial: float = 0.0
     detalhe: List[SiapsGapDetalhe] = Field(default_factory=list)
     valores_validados: bool = False
+
+
+class ProfilerIniciarRequest(BaseModel):
+    """Sessão de profiling: por tempo (``segundos``) OU pelas próximas ``requisicoes`` da ``rota``."""
+    segundos: Optional[float] = Field(None, gt=0, le=300, description="Duração da sessão")
+    requisicoes: Optional[int] = Field(None, ge=1, le=1000, description="Quantidade de requisições da rota")
+    rota: Optional[str] = Field(
+        None, description="Prefixo do caminho (ex.: /api/relatorios/pdf-detalhado, /api/siaps/gap)"
+    )
+    intervalo_ms: float = Field(5.0, ge=1, le=1000, description="Intervalo da amostragem de pilhas")
+    cprofile: bool = Field(True, description="Também rodar o cProfile (gera pstats e .prof; mais caro)")
+    timeout_segundos: float = Field(600, gt=0, le=3600, description="Limite do modo por requisições")
+
+    @model_validator(mode="after")
+    def _um_modo(self):
+        if (self.segundos is None) == (self.requisicoes is None):
+            raise ValueError("Informe 'segundos' ou 'requisicoes' (apenas um)")
+        if self.requisicoes is not None and not (self.rota or "").startswith("/"):
+            raise ValueError("'rota' (começando com /) é obrigatória no modo por requisições")
+        return self
+
+
+class ProfilerStatusResponse(BaseModel):
+    """Estado da sessão de profiling atual ou da última concluída."""
+    modo: Literal["segundos", "requisicoes"]
+    rota: Optional[str] = None
+    segundos: Optional[float] = None
+    requisicoes: Optional[int] = None
+    requisicoes_concluidas: int = 0
+    intervalo_ms: float
+    cprofile: bool
+    iniciado_em: datetime
+    concluido_em: Optional[datetime] = None
+    em_andamento: bool
+    duracao_segundos: float
+    amostras: int
+    pilhas_distintas: int
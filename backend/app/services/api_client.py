@@ -6,14 +6,36 @@ import httpx
 import json
 import asyncio
 import os
+from dataclasses import dataclass
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 
 from app.core.config import settings
+from app.core.json_response import loads
+from app.core.metrics import upstream_transport
 from app.models.schemas import DadosFinanciamento, FinanciamentoParams
 from app.utils.logger import logger
 
 
+@dataclass(frozen=True)
+class RespostaFinanciamento:
+    """JSON da API de financiamento: ``dados`` decodificados e o corpo original.
+
+    ``conteudo`` é o corpo recebido, em UTF-8, pronto para ser repassado ao cliente
+    (``None`` se a API respondeu em outra codificação).
+    """
+
+    dados: Dict[str, Any]
+    conteudo: Optional[bytes]
+
+
+def _corpo_utf8(response: httpx.Response) -> Optional[bytes]:
+    charset = (response.charset_encoding or "utf-8").lower().replace("_", "-")
+    if charset not in ("utf-8", "utf8") or json.detect_encoding(response.content) != "utf-8":
+        return None
+    return response.content
+
+
 class SaudeAPIClient:
     """Cliente para comunicação com a API de financiamento da saúde"""
 
@@ -55,6 +77,18 @@ class SaudeAPIClient:
         Returns:
             dict: JSON bruto retornado pela API externa ou None em caso de erro
         """
+        resposta = await self.consultar_financiamento_bruto(codigo_ibge, competencia)
+        return resposta.dados if resposta is not None else None
+
+    async def consultar_financiamento_bruto(
+        self,
+        codigo_ibge: str,
+        competencia: str
+    ) -> Optional[RespostaFinanciamento]:
+        """
+        Como ``consultar_financiamento``, mas devolve também o corpo original da
+        resposta, para endpoints que repassam o JSON sem transformá-lo.
+        """
         # Validar parâmetros
         if not codigo_ibge or not competencia:
             logger.error("Código IBGE e competência são obrigatórios")
@@ -82,8 +116,8 @@ class SaudeAPIClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                logger.info(f"Consultando API para município {codigo_ibge}, competência {competencia}")
+            async with httpx.AsyncClient(timeout=self.timeout, transport=upstream_transport("saude")) as client:
+                logger.debug("Consultando API para município %s, competência %s", codigo_ibge, competencia)
 
                 # Configurar headers
                 headers = {
@@ -98,7 +132,8 @@ class SaudeAPIClient:
                 )
 
                 response.raise_for_status()
-                dados = response.json()
+                conteudo = _corpo_utf8(response)
+                dados = loads(conteudo) if conteudo is not None else response.json()
 
                 # Validar dados recebidos
                 if not self._validate_response_data(dados):
@@ -113,20 +148,25 @@ class SaudeAPIClient:
                     logger.warning("Nenhum dado encontrado para os parâmetros informados")
                     return None
 
-                logger.info(f"Dados consultados com sucesso: {len(resumos)} resumos, {len(pagamentos)} pagamentos")
+                logger.info("Dados consultados com sucesso: %d resumos, %d pagamentos", len(resumos), len(pagamentos))
 
                 # Persistir cache local em JSON (compatível com app atual)
                 try:
                     cache_path = settings.DATA_CACHE_FILE
                     abs_path = os.path.abspath(cache_path)
-                    with open(abs_path, 'w', encoding='utf-8') as f:
-                        json.dump(dados, f, ensure_ascii=False, indent=4)
-                    logger.info(f"Cache salvo em {abs_path}")
+                    if conteudo is not None:
+                        # Corpo recebido, sem serializar de novo
+                        with open(abs_path, 'wb') as f:
+                            f.write(conteudo)
+                    else:
+                        with open(abs_path, 'w', encoding='utf-8') as f:
+                            json.dump(dados, f, ensure_ascii=False)
+                    logger.debug("Cache salvo em %s", abs_path)
                 except Exception as e:
-                    logger.warning(f"Falha ao salvar cache local: {str(e)}")
+                    logger.warning("Falha ao salvar cache local: %s", e)
 
                 # Retornar JSON bruto da API externa (completo)
-                return dados
+                return RespostaFinanciamento(dados, conteudo)
 
         except httpx.TimeoutException:
             logger.error("Timeout na consulta à API")
@@ -135,19 +175,19 @@ class SaudeAPIClient:
             logger.error("Erro de conexão com a API")
             return None
         except httpx.HTTPStatusError as e:
-            logger.error(f"Erro HTTP na consulta à API: {e.response.status_code}")
+            logger.error("Erro HTTP na consulta à API: %s", e.response.status_code)
             return None
         except json.JSONDecodeError:
             logger.error("Erro ao decodificar resposta da API")
             return None
         except Exception as e:
-            logger.error(f"Erro inesperado na consulta à API: {str(e)}")
+            logger.error("Erro inesperado na consulta à API: %s", e)
             return None
 
     async def test_connection(self) -> bool:
         """Testa a conectividade com a API externa"""
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
+            async with httpx.AsyncClient(timeout=10, transport=upstream_transport("saude")) as client:
                 # Fazer uma requisição simples para testar conectividade
                 response = await client.get(self.base_url, timeout=10)
                 return response.status_code == 200
@@ -0,0 +1,226 @@
+"""
+Histórico append-only das edições, gravado como diffs esparsos.
+
+Cada versão guarda só as posições de ``perda_recurso_mensal`` que mudaram (e o novo
+tamanho da lista). A cada ``EDICOES_HISTORICO_SNAPSHOT_A_CADA`` versões — e sempre que a
+edição é criada ou recriada — a lista inteira vai em ``snapshot``, então reconstruir
+qualquer ponto no tempo aplica no máximo N diffs a partir do snapshot anterior.
+
+Versões além de ``EDICOES_HISTORICO_MAX_VERSOES`` são descartadas a partir do snapshot
+mais recente que ainda as cobre, o que limita o histórico de cada edição a
+``MAX_VERSOES + SNAPSHOT_A_CADA`` linhas.
+
+As funções aqui só adicionam à sessão: quem chama faz o commit junto com a edição.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.db_models import EdicaoHistoricoDB
+
+Chave = Tuple[str, str]
+
+
+@dataclass
+class Mudanca:
+    """Uma alteração a registrar. ``novo=None`` é exclusão; ``anterior=None``, criação."""
+    codigo_municipio: str
+    competencia: str
+    anterior: Optional[List[float]]
+    novo: Optional[List[float]]
+    usuario_id: Optional[str]
+    em: datetime
+    # Estado anterior ainda sem histórico (edições gravadas antes dele existir)
+    anterior_usuario_id: Optional[str] = None
+    anterior_em: Optional[datetime] = None
+
+    @property
+    def chave(self) -> Chave:
+        return self.codigo_municipio, self.competencia
+
+
+def calcular_alteracoes(anterior: List[float], novo: List[float]) -> Dict[str, float]:
+    """Posições de ``novo`` diferentes de ``anterior`` (chaves em texto, como no JSON)."""
+    return {
+        str(posicao): valor
+        for posicao, valor in enumerate(novo)
+        if posicao >= len(anterior) or anterior[posicao] != valor
+    }
+
+
+def aplicar_alteracoes(estado: List[float], tamanho: int, alteracoes: Dict[str, float]) -> List[float]:
+    resultado = list(estado[:tamanho])
+    resultado += [0.0] * (tamanho - len(resultado))
+    for posicao, valor in alteracoes.items():
+        resultado[int(posicao)] = valor
+    return resultado
+
+
+def _filtro_chaves(chaves: List[Chave]):
+    return tuple_(EdicaoHistoricoDB.codigo_municipio, EdicaoHistoricoDB.competencia).in_(chaves)
+
+
+def _filtro_chave(codigo_municipio: str, competencia: str):
+    return and_(
+        EdicaoHistoricoDB.codigo_municipio == codigo_municipio,
+        EdicaoHistoricoDB.competencia == competencia,
+    )
+
+
+# Base de reconstrução: snapshot completo ou exclusão (estado vazio)
+_E_BASE = or_(EdicaoHistoricoDB.snapshot.isnot(None), EdicaoHistoricoDB.excluida.is_(True))
+
+
+async def registrar_versoes(session: AsyncSession, mudancas: List[Mudanca]) -> None:
+    """Adiciona uma versão por mudança (e a linha de base, se a edição não tinha histórico)."""
+    if not mudancas:
+        return
+    chaves = list({m.chave for m in mudancas})
+    ultimas: Dict[Chave, int] = {
+        (codigo, competencia): versao
+        for codigo, competencia, versao in (await session.execute(
+            select(
+                EdicaoHistoricoDB.codigo_municipio,
+                EdicaoHistoricoDB.competencia,
+                func.max(EdicaoHistoricoDB.versao),
+            )
+            .where(_filtro_chaves(chaves))
+            .group_by(EdicaoHistoricoDB.codigo_municipio, EdicaoHistoricoDB.competencia)
+        )).all()
+    }
+
+    snapshot_a_cada = max(1, settings.EDICOES_HISTORICO_SNAPSHOT_A_CADA)
+    descartar: Dict[Chave, int] = {}
+    for mudanca in mudancas:
+        versao = ultimas.get(mudanca.chave, 0)
+        if versao == 0 and mudanca.anterior is not None:
+            versao = 1
+            session.add(EdicaoHistoricoDB(
+                codigo_municipio=mudanca.codigo_municipio,
+                competencia=mudanca.competencia,
+                versao=versao,
+                usuario_id=mudanca.anterior_usuario_id,
+                alterado_em=mudanca.anterior_em or mudanca.em,
+                tamanho=len(mudanca.anterior),
+                snapshot=list(mudanca.anterior),
+            ))
+
+        versao += 1
+        linha = EdicaoHistoricoDB(
+            codigo_municipio=mudanca.codigo_municipio,
+            competencia=mudanca.competencia,
+            versao=versao,
+            usuario_id=mudanca.usuario_id,
+            alterado_em=mudanca.em,
+        )
+        if mudanca.novo is None:
+            linha.excluida = True
+            linha.tamanho = 0
+        else:
+            linha.tamanho = len(mudanca.novo)
+            if mudanca.anterior is None or versao % snapshot_a_cada == 0:
+                linha.snapshot = list(mudanca.novo)
+            else:
+                linha.alteracoes = calcular_alteracoes(mudanca.anterior, mudanca.novo)
+        session.add(linha)
+        ultimas[mudanca.chave] = versao
+
+        limite = versao - settings.EDICOES_HISTORICO_MAX_VERSOES + 1
+        if settings.EDICOES_HISTORICO_MAX_VERSOES > 0 and limite > 1 and limite % snapshot_a_cada == 0:
+            descartar[mudanca.chave] = limite
+
+    if descartar:
+        await session.flush()
+        for (codigo, competencia), limite in descartar.items():
+            await _descartar_antigas(session, codigo, competencia, limite)
+
+
+async def _descartar_antigas(session: AsyncSession, codigo: str, competencia: str, limite: int) -> None:
+    """Remove as versões anteriores à base mais recente que não passa de ``limite``."""
+    base = (await session.execute(
+        select(func.max(EdicaoHistoricoDB.versao)).where(
+            _filtro_chave(codigo, competencia), EdicaoHistoricoDB.versao <= limite, _E_BASE
+        )
+    )).scalar()
+    if base and base > 1:
+        await session.execute(
+            delete(EdicaoHistoricoDB).where(
+                _filtro_chave(codigo, competencia), EdicaoHistoricoDB.versao < base
+            )
+        )
+
+
+async def listar_versoes(
+    session: AsyncSession,
+    codigo_municipio: str,
+    competencia: str,
+    ate: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    stmt = select(EdicaoHistoricoDB).where(_filtro_chave(codigo_municipio, competencia))
+    if ate is not None:
+        stmt = stmt.where(EdicaoHistoricoDB.alterado_em <= ate)
+    rows = (await session.execute(stmt.order_by(EdicaoHistoricoDB.versao))).scalars().all()
+    return [
+        {
+            'versao': row.versao,
+            'usuario_id': row.usuario_id,
+            'alterado_em': row.alterado_em.isoformat(),
+            'excluida': row.excluida,
+            'tamanho': row.tamanho,
+            'alteracoes': row.alteracoes,
+            'snapshot': row.snapshot,
+        }
+        for row in rows
+    ]
+
+
+async def reconstruir(
+    session: AsyncSession,
+    codigo_municipio: str,
+    competencia: str,
+    em: Optional[datetime] = None,
+) -> Optional[Dict[str, Any]]:
+    """Estado da edição em ``em`` (ou o mais recente); None se não há versão até lá."""
+    alvo_stmt = select(EdicaoHistoricoDB.versao).where(_filtro_chave(codigo_municipio, competencia))
+    if em is not None:
+        alvo_stmt = alvo_stmt.where(EdicaoHistoricoDB.alterado_em <= em)
+    alvo = (await session.execute(
+        alvo_stmt.order_by(EdicaoHistoricoDB.versao.desc()).limit(1)
+    )).scalar()
+    if alvo is None:
+        return None
+
+    base = (await session.execute(
+        select(func.max(EdicaoHistoricoDB.versao)).where(
+            _filtro_chave(codigo_municipio, competencia), EdicaoHistoricoDB.versao <= alvo, _E_BASE
+        )
+    )).scalar()
+    rows = (await session.execute(
+        select(EdicaoHistoricoDB)
+        .where(
+            _filtro_chave(codigo_municipio, competencia),
+            EdicaoHistoricoDB.versao.between(base or 0, alvo),
+        )
+        .order_by(EdicaoHistoricoDB.versao)
+    )).scalars().all()
+
+    estado: List[float] = []
+    for row in rows:
+        if row.excluida:
+            estado = []
+        elif row.snapshot is not None:
+            estado = list(row.snapshot)
+        else:
+            estado = aplicar_alteracoes(estado, row.tamanho, row.alteracoes or {})
+    ultima = rows[-1]
+    return {
+        'versao': ultima.versao,
+        'usuario_id': ultima.usuario_id,
+        'alterado_em': ultima.alterado_em.isoformat(),
+        'excluida': ultima.excluida,
+        'perda_recurso_mensal': None if ultima.excluida else estado,
+    }
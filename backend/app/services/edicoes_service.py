@@ -1,13 +1,85 @@
 """
 Serviço para gerenciar edições de municípios usando SQLAlchemy async
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 from datetime import datetime
-import json
-from sqlalchemy import select, and_, desc
+import time
+from sqlalchemy import select, and_, desc, distinct, func, true, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.models.db_models import EdicaoDB
+from app.models.schemas import UF_CODES
+from app.services import edicoes_historico
+from app.services.edicoes_historico import Mudanca
+
+# Linhas por INSERT ... ON CONFLICT na importação em lote (6 parâmetros por linha,
+# bem abaixo do limite de variáveis do SQLite)
+LOTE_CHUNK_SIZE = 500
+
+
+_CODIGO_POR_UF = {sigla: codigo for codigo, sigla in UF_CODES.items()}
+
+
+# Totais da listagem por cursor: (banco, codigo_municipio) → (total, expira_em).
+# Limpo a cada escrita deste processo; escritas de outros processos aparecem após o TTL.
+_total_cache: Dict[Tuple[str, Optional[str]], Tuple[int, float]] = {}
+
+
+def _invalidar_totais() -> None:
+    _total_cache.clear()
+
+
+class CursorInvalido(ValueError):
+    """Cursor de paginação malformado."""
+
+
+def encode_cursor(updated_at: datetime, edicao_id: int) -> str:
+    """Cursor ``<updated_at ISO>,<id>`` da última linha de uma página."""
+    return f"{updated_at.isoformat()},{edicao_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        updated_at, edicao_id = cursor.rsplit(',', 1)
+        return datetime.fromisoformat(updated_at), int(edicao_id)
+    except ValueError:
+        raise CursorInvalido(f"Cursor inválido: {cursor!r}")
+
+
+class EdicaoLoteInvalida(Exception):
+    """Linha inválida na importação em lote (nada é gravado)."""
+
+    def __init__(self, linha: int, mensagem: str):
+        super().__init__(f"Linha {linha}: {mensagem}")
+        self.linha = linha
+        self.mensagem = mensagem
+
+
+def validar_edicao_lote(linha: int, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Normaliza uma linha da importação em lote ou levanta ``EdicaoLoteInvalida``."""
+    codigo = str(item.get('codigo_municipio') or '').strip()
+    competencia = str(item.get('competencia') or '').strip()
+    perdas = item.get('perda_recurso_mensal')
+
+    if not codigo.isdigit() or not 6 <= len(codigo) <= 7:
+        raise EdicaoLoteInvalida(linha, f"codigo_municipio inválido: {codigo!r}")
+    if not competencia.isdigit() or len(competencia) != 6:
+        raise EdicaoLoteInvalida(linha, f"competencia inválida: {competencia!r}")
+    if not isinstance(perdas, list):
+        raise EdicaoLoteInvalida(linha, "perda_recurso_mensal deve ser uma lista de números")
+    try:
+        perdas = [float(valor) for valor in perdas]
+    except (TypeError, ValueError):
+        raise EdicaoLoteInvalida(linha, "perda_recurso_mensal deve ser uma lista de números")
+
+    return {
+        'codigo_municipio': codigo,
+        'competencia': competencia,
+        'perda_recurso_mensal': perdas,
+        'usuario_id': item.get('usuario_id') or None,
+    }
 
 
 class EdicoesService:
@@ -52,9 +124,35 @@ class EdicoesService:
             )
             row = result.scalar_one_or_none()
             now = datetime.utcnow()
+            novo = list(perda_recurso_mensal)
+
+            if row and row.perda_recurso_mensal == novo:
+                # Nada mudou: não reescreve a linha, não avança updated_at nem cria versão
+                return {
+                    'success': True,
+                    'document_id': str(row.id),
+                    'message': 'Nenhuma alteração',
+                    'data': {
+                        'codigo_municipio': row.codigo_municipio,
+                        'competencia': row.competencia,
+                        'perda_recurso_mensal': row.perda_recurso_mensal,
+                        'updated_at': row.updated_at.isoformat()
+                    }
+                }
+
+            await edicoes_historico.registrar_versoes(self.session, [Mudanca(
+                codigo_municipio=codigo_municipio,
+                competencia=competencia,
+                anterior=row.perda_recurso_mensal if row else None,
+                novo=novo,
+                usuario_id=usuario_id or (row.usuario_id if row else None),
+                em=now,
+                anterior_usuario_id=row.usuario_id if row else None,
+                anterior_em=row.updated_at if row else None,
+            )])
 
             if row:
-                row.perda_recurso_mensal = json.dumps(perda_recurso_mensal)
+                row.perda_recurso_mensal = novo
                 row.updated_at = now
                 if usuario_id:
                     row.usuario_id = usuario_id
@@ -62,7 +160,7 @@ class EdicoesService:
                 row = EdicaoDB(
                     codigo_municipio=codigo_municipio,
                     competencia=competencia,
-                    perda_recurso_mensal=json.dumps(perda_recurso_mensal),
+                    perda_recurso_mensal=novo,
                     usuario_id=usuario_id,
                     created_at=now,
                     updated_at=now,
@@ -70,6 +168,7 @@ class EdicoesService:
                 self.session.add(row)
 
             await self.session.commit()
+            _invalidar_totais()
             await self.session.refresh(row)
 
             return {
@@ -79,7 +178,7 @@ class EdicoesService:
                 'data': {
                     'codigo_municipio': row.codigo_municipio,
                     'competencia': row.competencia,
-                    'perda_recurso_mensal': json.loads(row.perda_recurso_mensal),
+                    'perda_recurso_mensal': row.perda_recurso_mensal,
                     'updated_at': row.updated_at.isoformat()
                 }
             }
@@ -91,33 +190,105 @@ class EdicoesService:
                 'message': f'Erro ao salvar edição: {str(e)}'
             }
 
+    async def historico_edicao(
+        self,
+        codigo_municipio: str,
+        competencia: str,
+        em: Optional[datetime] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Versões da edição até ``em`` e o estado reconstruído naquele instante.
+
+        Edições sem histórico (gravadas antes dele existir) valem desde o ``updated_at``.
+        Devolve None se a edição não existia em ``em``.
+        """
+        versoes = await edicoes_historico.listar_versoes(
+            self.session, codigo_municipio, competencia, ate=em
+        )
+        estado = await edicoes_historico.reconstruir(self.session, codigo_municipio, competencia, em)
+        if estado is None:
+            atual = await self.get_edicao(codigo_municipio, competencia)
+            if not atual or (em is not None and em < datetime.fromisoformat(atual['updated_at'])):
+                return None
+            estado = {
+                'versao': 0,
+                'usuario_id': atual['usuario_id'],
+                'alterado_em': atual['updated_at'],
+                'excluida': False,
+                'perda_recurso_mensal': atual['perda_recurso_mensal'],
+            }
+        return {
+            'codigo_municipio': codigo_municipio,
+            'competencia': competencia,
+            'em': em.isoformat() if em else None,
+            **estado,
+            'versoes': versoes,
+        }
+
+    async def _contar(self, codigo_municipio: Optional[str]) -> int:
+        count_stmt = select(func.count(EdicaoDB.id))
+        if codigo_municipio:
+            count_stmt = count_stmt.where(EdicaoDB.codigo_municipio == codigo_municipio)
+        return (await self.session.execute(count_stmt)).scalar()
+
+    async def _contar_cacheado(self, codigo_municipio: Optional[str]) -> int:
+        key = (str(self.session.bind.url), codigo_municipio)
+        cached = _total_cache.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        total = await self._contar(codigo_municipio)
+        _total_cache[key] = (total, time.monotonic() + settings.EDICOES_COUNT_CACHE_SECONDS)
+        return total
+
     async def listar_edicoes(
         self,
         codigo_municipio: Optional[str] = None,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        after: Optional[str] = None,
+        incluir_total: bool = True,
     ) -> Dict[str, Any]:
+        """Lista edições da mais recente para a mais antiga.
+
+        Dois modos de paginação:
+        - ``after`` (cursor ``<updated_at>,<id>`` devolvido em ``next_cursor``): keyset sobre
+          o índice ``(updated_at, id)``, custo constante em qualquer profundidade. O total é
+          opcional e vem de um COUNT cacheado por ``EDICOES_COUNT_CACHE_SECONDS``;
+        - ``offset`` (compatibilidade): OFFSET/LIMIT com COUNT exato a cada página.
+        """
         try:
             stmt = select(EdicaoDB)
             if codigo_municipio:
                 stmt = stmt.where(EdicaoDB.codigo_municipio == codigo_municipio)
-            stmt = stmt.order_by(desc(EdicaoDB.updated_at)).offset(offset).limit(limit)
+            if after:
+                after_updated_at, after_id = decode_cursor(after)
+                stmt = stmt.where(
+                    tuple_(EdicaoDB.updated_at, EdicaoDB.id) < tuple_(after_updated_at, after_id)
+                )
+            stmt = stmt.order_by(desc(EdicaoDB.updated_at), desc(EdicaoDB.id))
+            if not after:
+                stmt = stmt.offset(offset)
+            stmt = stmt.limit(limit)
 
             result = await self.session.execute(stmt)
             rows = result.scalars().all()
 
-            # Total count
-            from sqlalchemy import func
-            count_stmt = select(func.count(EdicaoDB.id))
-            if codigo_municipio:
-                count_stmt = count_stmt.where(EdicaoDB.codigo_municipio == codigo_municipio)
-            total = (await self.session.execute(count_stmt)).scalar()
+            next_cursor = None
+            if len(rows) == limit:
+                next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+
+            if after:
+                total = await self._contar_cacheado(codigo_municipio) if incluir_total else None
+            else:
+                total = await self._contar(codigo_municipio)
 
             return {
                 'success': True,
                 'total': total,
+                'next_cursor': next_cursor,
                 'documents': [self._row_to_dict(r) for r in rows]
             }
+        except CursorInvalido:
+            raise
         except Exception as e:
             print(f"Erro ao listar edições: {e}")
             return {
@@ -130,7 +301,8 @@ class EdicoesService:
     async def deletar_edicao(
         self,
         codigo_municipio: str,
-        competencia: str
+        competencia: str,
+        usuario_id: Optional[str] = None
     ) -> Dict[str, Any]:
         try:
             result = await self.session.execute(
@@ -149,8 +321,19 @@ class EdicoesService:
                     'message': 'Edição não encontrada'
                 }
 
+            await edicoes_historico.registrar_versoes(self.session, [Mudanca(
+                codigo_municipio=codigo_municipio,
+                competencia=competencia,
+                anterior=row.perda_recurso_mensal,
+                novo=None,
+                usuario_id=usuario_id,
+                em=datetime.utcnow(),
+                anterior_usuario_id=row.usuario_id,
+                anterior_em=row.updated_at,
+            )])
             await self.session.delete(row)
             await self.session.commit()
+            _invalidar_totais()
 
             return {
                 'success': True,
@@ -164,13 +347,192 @@ class EdicoesService:
                 'message': f'Erro ao deletar edição: {str(e)}'
             }
 
+    async def _upsert_chunk(self, chunk: List[Dict[str, Any]]) -> int:
+        """Grava o bloco e suas versões no histórico; devolve quantas linhas mudaram."""
+        por_chave = {(item['codigo_municipio'], item['competencia']): item for item in chunk}
+        existentes = {
+            (r.codigo_municipio, r.competencia): r
+            for r in (await self.session.execute(
+                select(
+                    EdicaoDB.codigo_municipio,
+                    EdicaoDB.competencia,
+                    EdicaoDB.perda_recurso_mensal,
+                    EdicaoDB.usuario_id,
+                    EdicaoDB.updated_at,
+                ).where(tuple_(EdicaoDB.codigo_municipio, EdicaoDB.competencia).in_(list(por_chave)))
+            )).all()
+        }
+
+        linhas = []
+        mudancas = []
+        for chave, item in por_chave.items():
+            atual = existentes.get(chave)
+            if atual is not None and atual.perda_recurso_mensal == item['perda_recurso_mensal']:
+                continue
+            linhas.append(item)
+            mudancas.append(Mudanca(
+                codigo_municipio=item['codigo_municipio'],
+                competencia=item['competencia'],
+                anterior=atual.perda_recurso_mensal if atual else None,
+                novo=item['perda_recurso_mensal'],
+                usuario_id=item['usuario_id'] or (atual.usuario_id if atual else None),
+                em=item['updated_at'],
+                anterior_usuario_id=atual.usuario_id if atual else None,
+                anterior_em=atual.updated_at if atual else None,
+            ))
+        if not linhas:
+            return 0
+
+        stmt = sqlite_insert(EdicaoDB).values(linhas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EdicaoDB.codigo_municipio, EdicaoDB.competencia],
+            set_={
+                'perda_recurso_mensal': stmt.excluded.perda_recurso_mensal,
+                'updated_at': stmt.excluded.updated_at,
+                'usuario_id': func.coalesce(stmt.excluded.usuario_id, EdicaoDB.usuario_id),
+            },
+        )
+        await self.session.execute(stmt)
+        await edicoes_historico.registrar_versoes(self.session, mudancas)
+        return len(linhas)
+
+    async def importar_lote(
+        self,
+        itens: AsyncIterator[Dict[str, Any]],
+        usuario_id: Optional[str] = None,
+        chunk_size: int = LOTE_CHUNK_SIZE,
+    ) -> Dict[str, Any]:
+        """Upsert em lote: um INSERT ... ON CONFLICT por bloco, tudo em uma transação.
+
+        ``itens`` produz dicts já validados (``validar_edicao_lote``); qualquer erro
+        (inclusive ``EdicaoLoteInvalida`` vinda do parser) desfaz o lote inteiro. Linhas
+        iguais ao que já está gravado são contadas em ``total`` mas não reescritas.
+        """
+        total = 0
+        alteradas = 0
+        chunk: List[Dict[str, Any]] = []
+        try:
+            async for item in itens:
+                now = datetime.utcnow()
+                chunk.append({
+                    'codigo_municipio': item['codigo_municipio'],
+                    'competencia': item['competencia'],
+                    'perda_recurso_mensal': item['perda_recurso_mensal'],
+                    'usuario_id': item.get('usuario_id') or usuario_id,
+                    'created_at': now,
+                    'updated_at': now,
+                })
+                if len(chunk) >= chunk_size:
+                    alteradas += await self._upsert_chunk(chunk)
+                    total += len(chunk)
+                    chunk = []
+            if chunk:
+                alteradas += await self._upsert_chunk(chunk)
+                total += len(chunk)
+
+            await self.session.commit()
+            _invalidar_totais()
+            return {
+                'success': True,
+                'total': total,
+                'alteradas': alteradas,
+                'message': f'{total} edição(ões) importada(s) com sucesso'
+            }
+        except EdicaoLoteInvalida as e:
+            await self.session.rollback()
+            return {
+                'success': False,
+                'linha': e.linha,
+                'error': e.mensagem,
+                'message': f'Importação cancelada: {e}'
+            }
+        except Exception as e:
+            await self.session.rollback()
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f'Erro ao importar edições: {str(e)}'
+            }
+
+    async def agregar_perdas(
+        self,
+        uf: Optional[str] = None,
+        competencia: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Soma as perdas das edições dentro do banco (``json_each``), sem carregar as linhas.
+
+        ``perda_mensal[i]`` é a soma da posição ``i`` das listas; ``uf`` (sigla) vira a faixa
+        de códigos IBGE da UF, que usa os índices de ``codigo_municipio``.
+        """
+        filtros = []
+        if uf:
+            codigo_uf = _CODIGO_POR_UF[uf.upper()]
+            filtros += [
+                EdicaoDB.codigo_municipio >= codigo_uf,
+                EdicaoDB.codigo_municipio < str(int(codigo_uf) + 1),
+            ]
+        if competencia:
+            filtros.append(EdicaoDB.competencia == competencia)
+
+        try:
+            contagem = (await self.session.execute(
+                select(
+                    func.count(EdicaoDB.id),
+                    func.count(distinct(EdicaoDB.codigo_municipio)),
+                ).where(*filtros)
+            )).one()
+
+            valores = func.json_each(EdicaoDB.perda_recurso_mensal).table_valued("key", "value")
+            por_posicao = (await self.session.execute(
+                select(valores.c.key, func.sum(valores.c.value))
+                .select_from(EdicaoDB)
+                .join(valores, true())
+                .where(*filtros)
+                .group_by(valores.c.key)
+                .order_by(valores.c.key)
+            )).all()
+
+            perda_mensal = [0.0] * (por_posicao[-1][0] + 1 if por_posicao else 0)
+            for posicao, soma in por_posicao:
+                perda_mensal[posicao] = float(soma or 0.0)
+
+            return {
+                'success': True,
+                'uf': uf.upper() if uf else None,
+                'competencia': competencia,
+                'total_edicoes': contagem[0],
+                'total_municipios': contagem[1],
+                'perda_total': sum(perda_mensal),
+                'perda_mensal': perda_mensal,
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f'Erro ao agregar edições: {str(e)}'
+            }
+
+    async def exportar_edicoes(
+        self,
+        codigo_municipio: Optional[str] = None,
+        batch_size: int = LOTE_CHUNK_SIZE,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Percorre as edições em blocos de ``batch_size`` sem carregar a tabela inteira."""
+        stmt = select(EdicaoDB).order_by(EdicaoDB.id).execution_options(yield_per=batch_size)
+        if codigo_municipio:
+            stmt = stmt.where(EdicaoDB.codigo_municipio == codigo_municipio)
+
+        result = await self.session.stream_scalars(stmt)
+        async for rows in result.partitions():
+            yield [self._row_to_dict(r) for r in rows]
+
     @staticmethod
     def _row_to_dict(row: EdicaoDB) -> Dict[str, Any]:
         return {
             'id': str(row.id),
             'codigo_municipio': row.codigo_municipio,
             'competencia': row.competencia,
-            'perda_recurso_mensal': json.loads(row.perda_recurso_mensal),
+            'perda_recurso_mensal': row.perda_recurso_mensal,
             'usuario_id': row.usuario_id,
             'created_at': row.created_at.isoformat() if row.created_at else None,
             'updated_at': row.updated_at.isoformat() if row.updated_at else None,
@@ -2,10 +2,15 @@
 Serviço para consulta de dados de municípios brasileiros
 Baseado na biblioteca pyUFbr
 """
-from typing import List, Optional
+import bisect
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
 from pyUFbr.baseuf import ufbr
 
-from app.models.schemas import UF, Municipio
+from app.models.schemas import UF, Municipio, MunicipioBuscaItem
 from app.utils.logger import logger
 
 
@@ -17,10 +22,160 @@ MUNICIPIOS_DUPLICADOS = {
     # Adicionar outros conforme necessário
 }
 
+# Lista completa das UFs brasileiras (pyUFbr não fornece o código IBGE da UF)
+UFS_FALLBACK = [
+    {'codigo': '12', 'nome': 'Acre', 'sigla': 'AC'},
+    {'codigo': '27', 'nome': 'Alagoas', 'sigla': 'AL'},
+    {'codigo': '16', 'nome': 'Amapá', 'sigla': 'AP'},
+    {'codigo': '13', 'nome': 'Amazonas', 'sigla': 'AM'},
+    {'codigo': '29', 'nome': 'Bahia', 'sigla': 'BA'},
+    {'codigo': '23', 'nome': 'Ceará', 'sigla': 'CE'},
+    {'codigo': '53', 'nome': 'Distrito Federal', 'sigla': 'DF'},
+    {'codigo': '32', 'nome': 'Espírito Santo', 'sigla': 'ES'},
+    {'codigo': '52', 'nome': 'Goiás', 'sigla': 'GO'},
+    {'codigo': '21', 'nome': 'Maranhão', 'sigla': 'MA'},
+    {'codigo': '51', 'nome': 'Mato Grosso', 'sigla': 'MT'},
+    {'codigo': '50', 'nome': 'Mato Grosso do Sul', 'sigla': 'MS'},
+    {'codigo': '31', 'nome': 'Minas Gerais', 'sigla': 'MG'},
+    {'codigo': '15', 'nome': 'Pará', 'sigla': 'PA'},
+    {'codigo': '25', 'nome': 'Paraíba', 'sigla': 'PB'},
+    {'codigo': '41', 'nome': 'Paraná', 'sigla': 'PR'},
+    {'codigo': '26', 'nome': 'Pernambuco', 'sigla': 'PE'},
+    {'codigo': '22', 'nome': 'Piauí', 'sigla': 'PI'},
+    {'codigo': '33', 'nome': 'Rio de Janeiro', 'sigla': 'RJ'},
+    {'codigo': '24', 'nome': 'Rio Grande do Norte', 'sigla': 'RN'},
+    {'codigo': '43', 'nome': 'Rio Grande do Sul', 'sigla': 'RS'},
+    {'codigo': '11', 'nome': 'Rondônia', 'sigla': 'RO'},
+    {'codigo': '14', 'nome': 'Roraima', 'sigla': 'RR'},
+    {'codigo': '42', 'nome': 'Santa Catarina', 'sigla': 'SC'},
+    {'codigo': '35', 'nome': 'São Paulo', 'sigla': 'SP'},
+    {'codigo': '28', 'nome': 'Sergipe', 'sigla': 'SE'},
+    {'codigo': '17', 'nome': 'Tocantins', 'sigla': 'TO'},
+]
+
+
+def normalizar_nome(nome: str) -> str:
+    """Forma de comparação de nomes: sem acentos, maiúsculas, espaços simples."""
+    sem_acento = unicodedata.normalize('NFKD', nome)
+    sem_acento = ''.join(c for c in sem_acento if not unicodedata.combining(c))
+    return ' '.join(sem_acento.upper().split())
+
+
+def _trigramas(nome: str) -> Set[str]:
+    """Trigramas do nome normalizado (com bordas), base da busca aproximada."""
+    texto = f"  {nome} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+# "Santana/BA", "Santana - BA", "Santana, BA": UF explícita ao final do termo
+_SUFIXO_UF = re.compile(r'^(?P<nome>.+?)\s*[/,-]\s*(?P<uf>[A-Za-z]{2})\s*$')
+
+# Similaridade mínima (Dice sobre trigramas) para a busca aproximada
+_SIMILARIDADE_MINIMA = 0.45
+
+
+class MunicipioIndex:
+    """Índice nacional de municípios, montado uma vez a partir da pyUFbr.
+
+    - ``por_codigo``: código IBGE de 6 dígitos → município;
+    - ``por_uf``: municípios de cada UF já ordenados por nome (sem considerar acentos);
+    - ``por_nome``: nome normalizado → municípios com esse nome (em todas as UFs);
+    - ``nomes``/``palavras``: nomes e palavras internas ordenados, para busca por
+      prefixo com ``bisect`` (faz o papel de uma trie sobre um array compacto);
+    - ``trigramas``: trigrama → nomes que o contêm, para a busca aproximada.
+    """
+
+    def __init__(self):
+        self.ufs: List[UF] = []
+        self.por_uf: Dict[str, List[Municipio]] = {}
+        self.por_codigo: Dict[str, Municipio] = {}
+        self.por_nome: Dict[str, List[Municipio]] = {}
+        self.nomes: List[str] = []
+        self.palavras: List[Tuple[str, str]] = []
+        self.trigramas: Dict[str, Set[str]] = {}
+
+    @classmethod
+    def construir(cls) -> "MunicipioIndex":
+        index = cls()
+        nomes_pyufbr = {}
+        try:
+            for sigla in ufbr.list_uf:
+                try:
+                    nomes_pyufbr[sigla] = ufbr._get_uf_by_sigla(sigla)['nome']
+                except Exception as e:
+                    logger.warning("Erro ao processar UF %s via pyUFbr: %s", sigla, e)
+        except Exception as e:
+            logger.error("Erro ao buscar UFs via pyUFbr: %s", e)
+
+        for uf_info in sorted(UFS_FALLBACK, key=lambda uf: uf['sigla']):
+            sigla = uf_info['sigla']
+            index.ufs.append(UF(
+                codigo=uf_info['codigo'],
+                nome=nomes_pyufbr.get(sigla, uf_info['nome']),
+                sigla=sigla,
+            ))
+
+            # nt_cidades traz os municípios DA UF; get_cidade(nome) faz busca nacional
+            # e retorna a UF errada para nomes duplicados (ex.: SANTANA-AP x SANTANA-BA)
+            cidades = ufbr.nt_cidades(sigla=sigla) if sigla in nomes_pyufbr else None
+            if not isinstance(cidades, list):  # lib retorna 'Inexistente' para UF inválida
+                logger.warning("pyUFbr sem municípios para a UF %s", sigla)
+                continue
+
+            municipios = []
+            for cidade in cidades:
+                try:
+                    # pyUFbr retorna '2900108.0': 7 dígitos, o último é o verificador
+                    codigo_ibge = cidade.codigo.split('.')[0][:-1]
+                    municipio = Municipio(codigo_ibge=codigo_ibge, nome=cidade.nome, uf=sigla)
+                except Exception as e:
+                    logger.warning("Erro ao processar município %s: %s", cidade.nome, e)
+                    continue
+                municipios.append(municipio)
+                index.por_codigo[codigo_ibge] = municipio
+                index.por_nome.setdefault(normalizar_nome(cidade.nome), []).append(municipio)
+
+            municipios.sort(key=lambda m: (normalizar_nome(m.nome), m.nome))
+            index.por_uf[sigla] = municipios
+
+        for municipios in index.por_nome.values():
+            municipios.sort(key=lambda m: m.uf)
+        index.nomes = sorted(index.por_nome)
+        palavras = set()
+        for nome in index.nomes:
+            partes = nome.split(' ')
+            # "JOSE" encontra "SAO JOSE DOS CAMPOS"; a primeira palavra já é coberta por ``nomes``
+            for i in range(1, len(partes)):
+                palavras.add((' '.join(partes[i:]), nome))
+            for trigrama in _trigramas(nome):
+                index.trigramas.setdefault(trigrama, set()).add(nome)
+        index.palavras = sorted(palavras)
+
+        logger.info(
+            "Índice de municípios carregado: %d UFs, %d municípios", len(index.ufs), len(index.por_codigo)
+        )
+        return index
+
 
 class MunicipioService:
     """Serviço para consulta de municípios e UFs"""
 
+    def __init__(self):
+        self._index: Optional[MunicipioIndex] = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> MunicipioIndex:
+        if self._index is None:
+            self.carregar_indice()
+        return self._index
+
+    def carregar_indice(self) -> None:
+        """Monta o índice nacional (no startup; senão, na primeira consulta)."""
+        with self._lock:
+            if self._index is None:
+                self._index = MunicipioIndex.construir()
+
     def get_ufs(self) -> List[UF]:
         """
         Retorna lista de todas as UFs
@@ -28,127 +183,111 @@ class MunicipioService:
         Returns:
             List[UF]: Lista de Unidades Federativas
         """
-        # Fallback com lista completa das UFs brasileiras
-        ufs_fallback = [
-            {'codigo': '12', 'nome': 'Acre', 'sigla': 'AC'},
-            {'codigo': '27', 'nome': 'Alagoas', 'sigla': 'AL'},
-            {'codigo': '16', 'nome': 'Amapá', 'sigla': 'AP'},
-            {'codigo': '13', 'nome': 'Amazonas', 'sigla': 'AM'},
-            {'codigo': '29', 'nome': 'Bahia', 'sigla': 'BA'},
-            {'codigo': '23', 'nome': 'Ceará', 'sigla': 'CE'},
-            {'codigo': '53', 'nome': 'Distrito Federal', 'sigla': 'DF'},
-            {'codigo': '32', 'nome': 'Espírito Santo', 'sigla': 'ES'},
-            {'codigo': '52', 'nome': 'Goiás', 'sigla': 'GO'},
-            {'codigo': '21', 'nome': 'Maranhão', 'sigla': 'MA'},
-            {'codigo': '51', 'nome': 'Mato Grosso', 'sigla': 'MT'},
-            {'codigo': '50', 'nome': 'Mato Grosso do Sul', 'sigla': 'MS'},
-            {'codigo': '31', 'nome': 'Minas Gerais', 'sigla': 'MG'},
-            {'codigo': '15', 'nome': 'Pará', 'sigla': 'PA'},
-            {'codigo': '25', 'nome': 'Paraíba', 'sigla': 'PB'},
-            {'codigo': '41', 'nome': 'Paraná', 'sigla': 'PR'},
-            {'codigo': '26', 'nome': 'Pernambuco', 'sigla': 'PE'},
-            {'codigo': '22', 'nome': 'Piauí', 'sigla': 'PI'},
-            {'codigo': '33', 'nome': 'Rio de Janeiro', 'sigla': 'RJ'},
-            {'codigo': '24', 'nome': 'Rio Grande do Norte', 'sigla': 'RN'},
-            {'codigo': '43', 'nome': 'Rio Grande do Sul', 'sigla': 'RS'},
-            {'codigo': '11', 'nome': 'Rondônia', 'sigla': 'RO'},
-            {'codigo': '14', 'nome': 'Roraima', 'sigla': 'RR'},
-            {'codigo': '42', 'nome': 'Santa Catarina', 'sigla': 'SC'},
-            {'codigo': '35', 'nome': 'São Paulo', 'sigla': 'SP'},
-            {'codigo': '28', 'nome': 'Sergipe', 'sigla': 'SE'},
-            {'codigo': '17', 'nome': 'Tocantins', 'sigla': 'TO'},
-        ]
+        return list(self.index.ufs)
 
-        try:
-            ufs_data = []
-            logger.info("Tentando obter UFs da biblioteca pyUFbr...")
+    def get_municipios_por_uf(self, uf_sigla: str) -> List[Municipio]:
+        """
+        Retorna lista de municípios de uma UF
 
-            # Primeira tentativa: usar pyUFbr
-            ufs_list = ufbr.list_uf
-            logger.info(f"pyUFbr retornou {len(ufs_list)} UFs: {list(ufs_list)}")
+        Args:
+            uf_sigla: Sigla da UF (ex: 'MG', 'SP')
 
-            for uf_sigla in sorted(ufs_list):
-                try:
-                    uf_dict = ufbr._get_uf_by_sigla(uf_sigla)
-                    # Buscar código no fallback já que pyUFbr não fornece
-                    fallback_uf = next((uf for uf in ufs_fallback if uf['sigla'] == uf_sigla), None)
-                    codigo = fallback_uf['codigo'] if fallback_uf else '00'
-
-                    ufs_data.append(UF(
-                        codigo=codigo,
-                        nome=uf_dict['nome'],
-                        sigla=uf_dict['sigla']
-                    ))
-                    logger.debug(f"UF {uf_sigla} processada com sucesso")
-                except Exception as e:
-                    logger.warning(f"Erro ao processar UF {uf_sigla} via pyUFbr: {str(e)}")
-                    # Buscar no fallback
-                    fallback_uf = next((uf for uf in ufs_fallback if uf['sigla'] == uf_sigla), None)
-                    if fallback_uf:
-                        ufs_data.append(UF(
-                            codigo=fallback_uf['codigo'],
-                            nome=fallback_uf['nome'],
-                            sigla=fallback_uf['sigla']
-                        ))
-                        logger.info(f"UF {uf_sigla} adicionada via fallback")
-
-            if ufs_data:
-                logger.info(f"Retornando {len(ufs_data)} UFs da biblioteca pyUFbr")
-                return ufs_data
+        Returns:
+            List[Municipio]: Lista de municípios da UF, em ordem alfabética
+        """
+        municipios = self.index.por_uf.get(uf_sigla.upper())
+        if not municipios:
+            logger.error("UF inválida ou sem municípios: %s", uf_sigla)
+            return []
+        return list(municipios)
 
-        except Exception as e:
-            logger.error(f"Erro ao buscar UFs via pyUFbr: {str(e)}")
+    def buscar_por_nome(self, nome: str, uf_sigla: Optional[str] = None) -> List[Municipio]:
+        """
+        Municípios com o nome informado, sem diferenciar acentos e maiúsculas
 
-        # Se chegou aqui, usar o fallback completo
-        logger.warning("Usando lista fallback completa de UFs")
-        ufs_data = []
-        for uf_info in ufs_fallback:
-            ufs_data.append(UF(
-                codigo=uf_info['codigo'],
-                nome=uf_info['nome'],
-                sigla=uf_info['sigla']
-            ))
+        Args:
+            nome: Nome do município (ex: 'sao jose', 'Filadélfia')
+            uf_sigla: Restringe a uma UF
 
-        logger.info(f"Retornando {len(ufs_data)} UFs via fallback")
-        return ufs_data
+        Returns:
+            List[Municipio]: Municípios com esse nome (vários quando há homônimos)
+        """
+        municipios = self.index.por_nome.get(normalizar_nome(nome), [])
+        if uf_sigla:
+            municipios = [m for m in municipios if m.uf == uf_sigla.upper()]
+        return list(municipios)
 
-    def get_municipios_por_uf(self, uf_sigla: str) -> List[Municipio]:
+    def buscar(self, termo: str, limit: int = 10, uf_sigla: Optional[str] = None) -> List[MunicipioBuscaItem]:
         """
-        Retorna lista de municípios de uma UF
+        Autocomplete nacional de municípios, sem diferenciar acentos e maiúsculas
+
+        Ordem do resultado: nome exato, nomes que começam com o termo, nomes com
+        uma palavra interna que começa com o termo e, por fim, nomes parecidos
+        (erros de digitação). Homônimos (ex.: Filadélfia - BA e - TO) aparecem
+        todos, identificados pela UF; a UF pode vir no termo ("Santana/AP").
 
         Args:
-            uf_sigla: Sigla da UF (ex: 'MG', 'SP')
+            termo: Texto digitado
+            limit: Quantidade máxima de resultados
+            uf_sigla: Restringe a uma UF
 
         Returns:
-            List[Municipio]: Lista de municípios da UF
+            List[MunicipioBuscaItem]: Municípios encontrados, do mais ao menos relevante
         """
-        try:
-            municipios_data = []
-            # Usa nt_cidades (namedtuples codigo/nome DA UF) em vez de get_cidade(nome),
-            # que faz busca nacional e retorna a UF errada para nomes duplicados
-            # (ex.: SANTANA retornaria Santana-AP em vez de Santana-BA).
-            cidades = ufbr.nt_cidades(sigla=uf_sigla)
-            if not isinstance(cidades, list):  # lib retorna 'Inexistente' para UF inválida
-                logger.error(f"UF inválida ou sem municípios: {uf_sigla}")
-                return []
+        index = self.index
+        sufixo = _SUFIXO_UF.match(termo)
+        if sufixo and sufixo.group('uf').upper() in index.por_uf:
+            termo, uf_sigla = sufixo.group('nome'), sufixo.group('uf')
+        chave = normalizar_nome(termo)
+        uf = uf_sigla.upper() if uf_sigla else None
+        if not chave or limit <= 0:
+            return []
 
-            for m in sorted(cidades, key=lambda c: c.nome):
-                try:
-                    # Remove último dígito verificador (pyUFbr retorna 7 dígitos)
-                    codigo_ibge = str(int(float(m.codigo)))[:-1]
-                    municipios_data.append(Municipio(
-                        codigo_ibge=codigo_ibge,
-                        nome=m.nome,
-                        uf=uf_sigla.upper()
+        resultado: List[MunicipioBuscaItem] = []
+        vistos: Set[str] = set()
+
+        def incluir(nomes, correspondencia: str) -> bool:
+            for nome in nomes:
+                if nome in vistos:
+                    continue
+                vistos.add(nome)
+                for m in index.por_nome[nome]:
+                    if uf and m.uf != uf:
+                        continue
+                    resultado.append(MunicipioBuscaItem(
+                        **m.model_dump(), rotulo=f"{m.nome} - {m.uf}", correspondencia=correspondencia
                     ))
-                except Exception as e:
-                    logger.warning(f"Erro ao processar município {m.nome}: {str(e)}")
+                    if len(resultado) >= limit:
+                        return True
+            return False
 
-            return municipios_data
-
-        except Exception as e:
-            logger.error(f"Erro ao buscar municípios da UF {uf_sigla}: {str(e)}")
-            return []
+        if chave in index.por_nome and incluir([chave], 'exata'):
+            return resultado
+
+        # Prefixo: intervalo contíguo do array ordenado; nomes mais curtos primeiro
+        inicio = bisect.bisect_left(index.nomes, chave)
+        fim = bisect.bisect_left(index.nomes, chave + '\uffff')
+        if incluir(sorted(index.nomes[inicio:fim], key=len), 'prefixo'):
+            return resultado
+
+        inicio = bisect.bisect_left(index.palavras, (chave,))
+        fim = bisect.bisect_left(index.palavras, (chave + '\uffff',))
+        nomes = sorted({nome for _, nome in index.palavras[inicio:fim]}, key=lambda n: (len(n), n))
+        if incluir(nomes, 'palavra') or len(chave) < 3:
+            return resultado
+
+        # Aproximada: coeficiente de Dice entre os trigramas do termo e de cada nome
+        trigramas = _trigramas(chave)
+        comuns: Counter = Counter()
+        for trigrama in trigramas:
+            comuns.update(index.trigramas.get(trigrama, ()))
+        candidatos = []
+        for nome, n in comuns.items():
+            similaridade = 2 * n / (len(trigramas) + len(nome) + 2)  # len(_trigramas(nome)) ~ len(nome) + 2
+            if similaridade >= _SIMILARIDADE_MINIMA:
+                candidatos.append((-similaridade, nome))
+        incluir([nome for _, nome in sorted(candidatos)], 'aproximada')
+        return resultado
 
     def _get_codigo_uf(self, uf_sigla: str) -> str:
         """
@@ -189,31 +328,31 @@ class MunicipioService:
                     codigo = MUNICIPIOS_DUPLICADOS[key]
                     # Remover último dígito (verificador) se tiver 7
                     resultado = codigo[:-1] if len(codigo) == 7 else codigo
-                    logger.info(f"Município duplicado encontrado: {municipio_nome}/{uf_sigla} -> {resultado}")
+                    logger.info("Município duplicado encontrado: %s/%s -> %s", municipio_nome, uf_sigla, resultado)
                     return resultado
 
-            # Segundo: buscar via pyUFbr
-            cidade = ufbr.get_cidade(municipio_nome)
-            if cidade and hasattr(cidade, 'codigo'):
-                # Remove último dígito conforme lógica original (pyUFbr retorna 7 dígitos)
-                codigo_ibge = str(int(float(cidade.codigo)))[:-1]
-
-                # Validar se código pertence à UF esperada
-                if uf_sigla:
-                    codigo_uf = codigo_ibge[:2]
-                    uf_esperada = self._get_codigo_uf(uf_sigla)
-                    if codigo_uf != uf_esperada:
-                        logger.warning(
-                            f"Código IBGE {codigo_ibge} não pertence a {uf_sigla}. "
-                            f"Esperado: {uf_esperada}, Recebido: {codigo_uf}"
-                        )
-                        return None
-
-                return codigo_ibge
-            return None
+            # Segundo: buscar no índice (homônimos desambiguados pela UF)
+            encontrados = self.buscar_por_nome(municipio_nome)
+            if not encontrados:
+                return None
+            if uf_sigla:
+                da_uf = [m for m in encontrados if m.uf == uf_sigla.upper()]
+                if not da_uf:
+                    logger.warning(
+                        "Município %s não pertence a %s. Encontrado em: %s",
+                        municipio_nome, uf_sigla, ", ".join(m.uf for m in encontrados),
+                    )
+                    return None
+                return da_uf[0].codigo_ibge
+            if len(encontrados) > 1:
+                logger.warning(
+                    "Município %s existe em mais de uma UF (%s); informe a UF",
+                    municipio_nome, ", ".join(m.uf for m in encontrados),
+                )
+            return encontrados[0].codigo_ibge
 
         except Exception as e:
-            logger.error(f"Erro ao obter código IBGE para {municipio_nome}: {str(e)}")
+            logger.error("Erro ao obter código IBGE para %s: %s", municipio_nome, e)
             return None
 
     def get_municipio_por_codigo(self, codigo_ibge: str) -> Optional[Municipio]:
@@ -226,15 +365,10 @@ class MunicipioService:
         Returns:
             Municipio: Dados do município ou None se não encontrado
         """
-        try:
-            # Esta funcionalidade requereria busca reversa na pyUFbr
-            # Por enquanto, retornamos None para implementação futura
-            logger.info(f"Busca reversa por código IBGE {codigo_ibge} não implementada")
-            return None
-
-        except Exception as e:
-            logger.error(f"Erro ao buscar município por código {codigo_ibge}: {str(e)}")
-            return None
+        codigo = (codigo_ibge or '').strip()
+        if len(codigo) == 7:
+            codigo = codigo[:-1]  # aceita o código com dígito verificador
+        return self.index.por_codigo.get(codigo)
 
     def validate_uf(self, uf_sigla: str) -> bool:
         """
@@ -247,7 +381,7 @@ class MunicipioService:
             bool: True se a UF for válida
         """
         try:
-            return uf_sigla.upper() in ufbr.list_uf
+            return uf_sigla.upper() in self.index.por_uf
         except Exception:
             return False
 
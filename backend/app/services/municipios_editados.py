@@ -1,13 +1,28 @@
 """
 Serviço para gerenciamento de dados editados de municípios
-Migração do sistema de arquivos JSON para gestão via API
+
+Armazenamento em SQLite (``EDITED_DATA_DB``), uma linha por município/competência:
+leitura por chave primária, upsert atômico e escrita segura entre requisições e
+processos concorrentes (WAL + ``busy_timeout``). O antigo ``municipios_editados.json``
+é importado uma única vez, na primeira abertura do banco, e renomeado para
+``*.migrado``.
+
+``get_editado`` (chamado a cada PDF) passa por um cache LRU em memória dos objetos já
+montados, inclusive dos "não editado". As escritas deste processo atualizam o cache na
+hora; as de outros processos são detectadas por ``PRAGMA data_version``, que muda a cada
+commit de outra conexão no mesmo banco; nesse caso o cache inteiro é descartado.
 """
 import json
 import os
-from typing import List, Optional, Dict, Any
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 from app.core.config import settings
+from app.core.metrics import cache_lookup, observe_db_query
 from app.models.schemas import (
     MunicipioEditado,
     MunicipioEditadoCreate,
@@ -18,36 +33,193 @@ from app.models.schemas import (
 from app.utils.logger import logger
 
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS municipios_editados (
+    codigo_ibge TEXT NOT NULL,
+    competencia TEXT NOT NULL,
+    perda_recurso_mensal TEXT NOT NULL,
+    perda_vinculo_mensal TEXT,
+    perda_qualidade_mensal TEXT,
+    data_edicao TEXT NOT NULL,
+    PRIMARY KEY (codigo_ibge, competencia)
+) WITHOUT ROWID
+"""
+
+_COLUNAS = (
+    "codigo_ibge, competencia, perda_recurso_mensal, "
+    "perda_vinculo_mensal, perda_qualidade_mensal, data_edicao"
+)
+
+
+def _dump_lista(valores: Optional[List[float]]) -> Optional[str]:
+    return None if valores is None else json.dumps(valores)
+
+
+def _load_lista(valor: Optional[str]) -> Optional[List[float]]:
+    return None if valor is None else json.loads(valor)
+
+
 class MunicipioEditadoService:
     """Serviço para gerenciar dados editados de municípios"""
 
-    def __init__(self):
-        self.data_file = settings.EDITED_DATA_FILE
-
-    def _load_data(self) -> Dict[str, Any]:
-        """Carrega dados do arquivo JSON"""
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        json_file: Optional[str] = None,
+        cache_max_entries: Optional[int] = None,
+    ):
+        self.db_path = db_path or settings.EDITED_DATA_DB
+        self.data_file = json_file or settings.EDITED_DATA_FILE
+        self.cache_max_entries = (
+            settings.EDITED_CACHE_MAX_ENTRIES if cache_max_entries is None else cache_max_entries
+        )
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        # (codigo_ibge, competencia) → editado (None = sem edição), do LRU ao MRU
+        self._cache: "OrderedDict[Tuple[str, str], Optional[MunicipioEditado]]" = OrderedDict()
+        self._cache_data_version: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre a conexão (uma por processo), cria a tabela e migra o JSON legado."""
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=10,
+                isolation_level=None,  # transações explícitas
+                check_same_thread=False,  # acesso serializado por self._lock
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._migrar_json(conn)
+            self._conn = conn
+        return self._conn
+
+    def _migrar_json(self, conn: sqlite3.Connection) -> None:
+        """Importa ``municipios_editados.json`` (uma vez) e renomeia o arquivo."""
+        if not os.path.exists(self.data_file):
+            return
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
         except Exception as e:
-            logger.error(f"Erro ao carregar dados editados: {str(e)}")
-            return {}
-
-    def _save_data(self, data: Dict[str, Any]) -> bool:
-        """Salva dados no arquivo JSON"""
+            logger.error("Erro ao ler dados editados legados para migração: %s", e)
+            return
+
+        linhas = []
+        for key, value in data.items():
+            if '_' not in key:
+                continue
+            codigo_ibge, competencia = key.split('_', 1)
+            linhas.append((
+                codigo_ibge,
+                competencia,
+                json.dumps(value.get('perda_recurso_mensal', [])),
+                _dump_lista(value.get('perda_vinculo_mensal')),
+                _dump_lista(value.get('perda_qualidade_mensal')),
+                value.get('data_edicao', datetime.now().isoformat()),
+            ))
+
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            logger.error(f"Erro ao salvar dados editados: {str(e)}")
-            return False
+            # OR IGNORE: se outro processo migrou primeiro, mantém o que já está no banco
+            conn.executemany(
+                f"INSERT OR IGNORE INTO municipios_editados ({_COLUNAS}) VALUES (?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
 
-    def _get_municipio_key(self, codigo_ibge: str, competencia: str) -> str:
-        """Gera chave única para o município"""
-        return f"{codigo_ibge}_{competencia}"
+        try:
+            os.replace(self.data_file, f"{self.data_file}.migrado")
+        except FileNotFoundError:
+            pass  # renomeado por outro processo
+        logger.info("%s registro(s) de dados editados migrados de %s", len(linhas), self.data_file)
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        """Executa um comando e devolve o número de linhas afetadas."""
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                return self._connect().execute(sql, params).rowcount
+            finally:
+                observe_db_query("editados", sql, time.perf_counter() - started)
+
+    def _fetchone(self, sql: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                return self._connect().execute(sql, params).fetchone()
+            finally:
+                observe_db_query("editados", sql, time.perf_counter() - started)
+
+    def _fetchall(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                return self._connect().execute(sql, params).fetchall()
+            finally:
+                observe_db_query("editados", sql, time.perf_counter() - started)
+
+    def _sincronizar_cache(self) -> None:
+        """Descarta o cache se outra conexão (outro processo) gravou desde a última leitura."""
+        data_version = self._fetchone("PRAGMA data_version")[0]
+        if data_version != self._cache_data_version:
+            self._cache.clear()
+            self._cache_data_version = data_version
+
+    def _cache_put(self, codigo_ibge: str, competencia: str, editado: Optional[MunicipioEditado]) -> None:
+        if self.cache_max_entries <= 0:
+            return
+        with self._lock:
+            key = (codigo_ibge, competencia)
+            self._cache[key] = editado
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+
+    def _cache_discard(self, codigo_ibge: str, competencia: str) -> None:
+        with self._lock:
+            self._cache.pop((codigo_ibge, competencia), None)
+
+    def _row_to_model(self, row: sqlite3.Row) -> MunicipioEditado:
+        return MunicipioEditado(
+            codigo_ibge=row['codigo_ibge'],
+            competencia=row['competencia'],
+            perda_recurso_mensal=json.loads(row['perda_recurso_mensal']),
+            perda_vinculo_mensal=_load_lista(row['perda_vinculo_mensal']),
+            perda_qualidade_mensal=_load_lista(row['perda_qualidade_mensal']),
+            data_edicao=datetime.fromisoformat(row['data_edicao']),
+        )
+
+    def _validar_uf(self, codigo_ibge: str, operacao: str) -> None:
+        """Apenas registra aviso para municípios fora das UFs permitidas."""
+        if validate_codigo_ibge_uf(codigo_ibge):
+            return
+        try:
+            uf_real = get_uf_from_codigo_ibge(codigo_ibge)
+            logger.warning(
+                "Tentativa de %s para município de UF não permitida - Código IBGE: %s, UF: %s",
+                operacao, codigo_ibge, uf_real,
+            )
+        except ValueError:
+            logger.warning("Tentativa de %s com código IBGE inválido: %s", operacao, codigo_ibge)
+
+    def init(self) -> None:
+        """Abre o banco na inicialização da aplicação (cria a tabela e migra o JSON)."""
+        with self._lock:
+            self._connect()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._cache.clear()
+            self._cache_data_version = None
 
     def get_all_editados(self) -> List[MunicipioEditado]:
         """
@@ -57,27 +229,13 @@ class MunicipioEditadoService:
             List[MunicipioEditado]: Lista de municípios editados
         """
         try:
-            data = self._load_data()
-            editados = []
-
-            for key, value in data.items():
-                if '_' in key:
-                    codigo_ibge, competencia = key.split('_', 1)
-                    editados.append(MunicipioEditado(
-                        codigo_ibge=codigo_ibge,
-                        competencia=competencia,
-                        perda_recurso_mensal=value.get('perda_recurso_mensal', []),
-                        perda_vinculo_mensal=value.get('perda_vinculo_mensal'),
-                        perda_qualidade_mensal=value.get('perda_qualidade_mensal'),
-                        data_edicao=datetime.fromisoformat(
-                            value.get('data_edicao', datetime.now().isoformat())
-                        )
-                    ))
-
-            return editados
+            rows = self._fetchall(
+                f"SELECT {_COLUNAS} FROM municipios_editados ORDER BY codigo_ibge, competencia"
+            )
+            return [self._row_to_model(row) for row in rows]
 
         except Exception as e:
-            logger.error(f"Erro ao buscar dados editados: {str(e)}")
+            logger.error("Erro ao buscar dados editados: %s", e)
             return []
 
     def get_editado(self, codigo_ibge: str, competencia: str) -> Optional[MunicipioEditado]:
@@ -90,28 +248,29 @@ class MunicipioEditadoService:
 
         Returns:
             MunicipioEditado: Dados editados ou None se não encontrado
+            (o objeto é compartilhado pelo cache: não alterar)
         """
         try:
-            data = self._load_data()
-            key = self._get_municipio_key(codigo_ibge, competencia)
-
-            if key in data:
-                value = data[key]
-                return MunicipioEditado(
-                    codigo_ibge=codigo_ibge,
-                    competencia=competencia,
-                    perda_recurso_mensal=value.get('perda_recurso_mensal', []),
-                    perda_vinculo_mensal=value.get('perda_vinculo_mensal'),
-                    perda_qualidade_mensal=value.get('perda_qualidade_mensal'),
-                    data_edicao=datetime.fromisoformat(
-                        value.get('data_edicao', datetime.now().isoformat())
-                    )
+            with self._lock:
+                self._sincronizar_cache()
+                key = (codigo_ibge, competencia)
+                if key in self._cache:
+                    cache_lookup("editados", hit=True)
+                    self._cache.move_to_end(key)
+                    return self._cache[key]
+
+                cache_lookup("editados", hit=False)
+                row = self._fetchone(
+                    f"SELECT {_COLUNAS} FROM municipios_editados "
+                    "WHERE codigo_ibge = ? AND competencia = ?",
+                    (codigo_ibge, competencia),
                 )
-
-            return None
+                editado = self._row_to_model(row) if row else None
+                self._cache_put(codigo_ibge, competencia, editado)
+                return editado
 
         except Exception as e:
-            logger.error(f"Erro ao buscar dados editados para {codigo_ibge}_{competencia}: {str(e)}")
+            logger.error("Erro ao buscar dados editados para %s_%s: %s", codigo_ibge, competencia, e)
             return None
 
     def create_editado(self, municipio_data: MunicipioEditadoCreate) -> Optional[MunicipioEditado]:
@@ -122,54 +281,47 @@ class MunicipioEditadoService:
             municipio_data: Dados do município a criar
 
         Returns:
-            MunicipioEditado: Dados criados ou None em caso de erro
+            MunicipioEditado: Dados criados ou None se já existirem / em caso de erro
         """
         try:
-            # Validar UF do município
-            if not validate_codigo_ibge_uf(municipio_data.codigo_ibge):
-                try:
-                    uf_real = get_uf_from_codigo_ibge(municipio_data.codigo_ibge)
-                    logger.warning(
-                        f"Tentativa de criar dados editados para município de UF não permitida - "
-                        f"Código IBGE: {municipio_data.codigo_ibge}, UF: {uf_real}"
-                    )
-                except ValueError:
-                    logger.warning(
-                        f"Tentativa de criar dados editados com código IBGE inválido: "
-                        f"{municipio_data.codigo_ibge}"
-                    )
-
-            data = self._load_data()
-            key = self._get_municipio_key(municipio_data.codigo_ibge, municipio_data.competencia)
-
-            # Verificar se já existe
-            if key in data:
-                logger.warning(f"Dados editados já existem para {key}")
-                return None
+            self._validar_uf(municipio_data.codigo_ibge, "criar dados editados")
 
-            # Criar novos dados
             now = datetime.now()
-            data[key] = {
-                'perda_recurso_mensal': municipio_data.perda_recurso_mensal,
-                'perda_vinculo_mensal': municipio_data.perda_vinculo_mensal,
-                'perda_qualidade_mensal': municipio_data.perda_qualidade_mensal,
-                'data_edicao': now.isoformat()
-            }
-
-            if self._save_data(data):
-                return MunicipioEditado(
-                    codigo_ibge=municipio_data.codigo_ibge,
-                    competencia=municipio_data.competencia,
-                    perda_recurso_mensal=municipio_data.perda_recurso_mensal,
-                    perda_vinculo_mensal=municipio_data.perda_vinculo_mensal,
-                    perda_qualidade_mensal=municipio_data.perda_qualidade_mensal,
-                    data_edicao=now
+            # ON CONFLICT DO NOTHING: a verificação de existência e a inserção são atômicas
+            inseridos = self._execute(
+                f"INSERT INTO municipios_editados ({_COLUNAS}) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (codigo_ibge, competencia) DO NOTHING",
+                (
+                    municipio_data.codigo_ibge,
+                    municipio_data.competencia,
+                    json.dumps(municipio_data.perda_recurso_mensal),
+                    _dump_lista(municipio_data.perda_vinculo_mensal),
+                    _dump_lista(municipio_data.perda_qualidade_mensal),
+                    now.isoformat(),
+                ),
+            )
+            if inseridos == 0:
+                logger.warning(
+                    "Dados editados já existem para %s_%s",
+                    municipio_data.codigo_ibge, municipio_data.competencia,
                 )
+                self._cache_discard(municipio_data.codigo_ibge, municipio_data.competencia)
+                return None
 
-            return None
+            editado = MunicipioEditado(
+                codigo_ibge=municipio_data.codigo_ibge,
+                competencia=municipio_data.competencia,
+                perda_recurso_mensal=municipio_data.perda_recurso_mensal,
+                perda_vinculo_mensal=municipio_data.perda_vinculo_mensal,
+                perda_qualidade_mensal=municipio_data.perda_qualidade_mensal,
+                data_edicao=now
+            )
+            self._cache_put(editado.codigo_ibge, editado.competencia, editado)
+            return editado
 
         except Exception as e:
-            logger.error(f"Erro ao criar dados editados: {str(e)}")
+            logger.error("Erro ao criar dados editados: %s", e)
+            self._cache_discard(municipio_data.codigo_ibge, municipio_data.competencia)
             return None
 
     def update_editado(
@@ -190,32 +342,30 @@ class MunicipioEditadoService:
             MunicipioEditado: Dados atualizados ou None em caso de erro
         """
         try:
-            data = self._load_data()
-            key = self._get_municipio_key(codigo_ibge, competencia)
-
-            if key not in data:
-                logger.warning(f"Dados editados não encontrados para {key}")
+            row = self._fetchone(
+                "UPDATE municipios_editados SET perda_recurso_mensal = ?, data_edicao = ? "
+                "WHERE codigo_ibge = ? AND competencia = ? "
+                f"RETURNING {_COLUNAS}",
+                (
+                    json.dumps(update_data.perda_recurso_mensal),
+                    datetime.now().isoformat(),
+                    codigo_ibge,
+                    competencia,
+                ),
+            )
+
+            if row is None:
+                logger.warning("Dados editados não encontrados para %s_%s", codigo_ibge, competencia)
+                self._cache_discard(codigo_ibge, competencia)
                 return None
 
-            # Atualizar dados
-            now = datetime.now()
-            data[key].update({
-                'perda_recurso_mensal': update_data.perda_recurso_mensal,
-                'data_edicao': now.isoformat()
-            })
-
-            if self._save_data(data):
-                return MunicipioEditado(
-                    codigo_ibge=codigo_ibge,
-                    competencia=competencia,
-                    perda_recurso_mensal=update_data.perda_recurso_mensal,
-                    data_edicao=now
-                )
-
-            return None
+            editado = self._row_to_model(row)
+            self._cache_put(codigo_ibge, competencia, editado)
+            return editado
 
         except Exception as e:
-            logger.error(f"Erro ao atualizar dados editados: {str(e)}")
+            logger.error("Erro ao atualizar dados editados: %s", e)
+            self._cache_discard(codigo_ibge, competencia)
             return None
 
     def delete_editado(self, codigo_ibge: str, competencia: str) -> bool:
@@ -230,18 +380,20 @@ class MunicipioEditadoService:
             bool: True se removido com sucesso
         """
         try:
-            data = self._load_data()
-            key = self._get_municipio_key(codigo_ibge, competencia)
-
-            if key in data:
-                del data[key]
-                return self._save_data(data)
-
-            logger.warning(f"Dados editados não encontrados para {key}")
+            removidos = self._execute(
+                "DELETE FROM municipios_editados WHERE codigo_ibge = ? AND competencia = ?",
+                (codigo_ibge, competencia),
+            )
+            self._cache_put(codigo_ibge, competencia, None)
+            if removidos:
+                return True
+
+            logger.warning("Dados editados não encontrados para %s_%s", codigo_ibge, competencia)
             return False
 
         except Exception as e:
-            logger.error(f"Erro ao deletar dados editados: {str(e)}")
+            logger.error("Erro ao deletar dados editados: %s", e)
+            self._cache_discard(codigo_ibge, competencia)
             return False
 
     def upsert_editado(self, municipio_data: MunicipioEditadoCreate) -> Optional[MunicipioEditado]:
@@ -255,48 +407,42 @@ class MunicipioEditadoService:
             MunicipioEditado: Dados salvos ou None em caso de erro
         """
         try:
-            # Validar UF do município
-            if not validate_codigo_ibge_uf(municipio_data.codigo_ibge):
-                try:
-                    uf_real = get_uf_from_codigo_ibge(municipio_data.codigo_ibge)
-                    logger.warning(
-                        f"Tentativa de upsert para município de UF não permitida - "
-                        f"Código IBGE: {municipio_data.codigo_ibge}, UF: {uf_real}"
-                    )
-                except ValueError:
-                    logger.warning(
-                        f"Tentativa de upsert com código IBGE inválido: "
-                        f"{municipio_data.codigo_ibge}"
-                    )
-
-            data = self._load_data()
-            key = self._get_municipio_key(municipio_data.codigo_ibge, municipio_data.competencia)
-
-            # Criar ou atualizar dados
-            now = datetime.now()
-            data[key] = {
-                'perda_recurso_mensal': municipio_data.perda_recurso_mensal,
-                'perda_vinculo_mensal': municipio_data.perda_vinculo_mensal,
-                'perda_qualidade_mensal': municipio_data.perda_qualidade_mensal,
-                'data_edicao': now.isoformat()
-            }
-
-            if self._save_data(data):
-                return MunicipioEditado(
-                    codigo_ibge=municipio_data.codigo_ibge,
-                    competencia=municipio_data.competencia,
-                    perda_recurso_mensal=municipio_data.perda_recurso_mensal,
-                    perda_vinculo_mensal=municipio_data.perda_vinculo_mensal,
-                    perda_qualidade_mensal=municipio_data.perda_qualidade_mensal,
-                    data_edicao=now
-                )
+            self._validar_uf(municipio_data.codigo_ibge, "upsert")
 
-            return None
+            now = datetime.now()
+            self._execute(
+                f"INSERT INTO municipios_editados ({_COLUNAS}) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (codigo_ibge, competencia) DO UPDATE SET "
+                "perda_recurso_mensal = excluded.perda_recurso_mensal, "
+                "perda_vinculo_mensal = excluded.perda_vinculo_mensal, "
+                "perda_qualidade_mensal = excluded.perda_qualidade_mensal, "
+                "data_edicao = excluded.data_edicao",
+                (
+                    municipio_data.codigo_ibge,
+                    municipio_data.competencia,
+                    json.dumps(municipio_data.perda_recurso_mensal),
+                    _dump_lista(municipio_data.perda_vinculo_mensal),
+                    _dump_lista(municipio_data.perda_qualidade_mensal),
+                    now.isoformat(),
+                ),
+            )
+
+            editado = MunicipioEditado(
+                codigo_ibge=municipio_data.codigo_ibge,
+                competencia=municipio_data.competencia,
+                perda_recurso_mensal=municipio_data.perda_recurso_mensal,
+                perda_vinculo_mensal=municipio_data.perda_vinculo_mensal,
+                perda_qualidade_mensal=municipio_data.perda_qualidade_mensal,
+                data_edicao=now
+            )
+            self._cache_put(editado.codigo_ibge, editado.competencia, editado)
+            return editado
 
         except Exception as e:
-            logger.error(f"Erro ao fazer upsert dos dados editados: {str(e)}")
+            logger.error("Erro ao fazer upsert dos dados editados: %s", e)
+            self._cache_discard(municipio_data.codigo_ibge, municipio_data.competencia)
             return None
 
 
 # Instância global do serviço
-municipio_editado_service = MunicipioEditadoService()
\ No newline at end of file
+municipio_editado_service = MunicipioEditadoService()
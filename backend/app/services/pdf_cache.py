@@ -0,0 +1,166 @@
+"""Cache em disco de PDFs, endereçado pelo conteúdo das entradas do relatório.
+
+A chave é o SHA-256 de um JSON canônico com tudo que influencia o PDF (versão dos
+templates, município, competência, resumos, pagamentos usados, perdas editadas). Se
+nenhuma entrada mudou, o mesmo PDF é servido sem renderizar de novo; qualquer edição
+em ``perda_*`` ou nos dados de financiamento gera outra chave.
+
+A chave também serve de ETag forte: o endpoint responde 304 a ``If-None-Match`` antes
+mesmo de ler o arquivo. Tamanho total limitado (``PDF_CACHE_MAX_MB``) com despejo LRU;
+a ordem de uso sobrevive a reinícios via ``mtime`` dos arquivos.
+
+``get``/``put`` fazem I/O de disco: chamados de código assíncrono, vão para uma thread
+(``asyncio.to_thread``). O índice em memória é protegido por lock.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import cache_lookup
+from app.utils.logger import logger
+
+
+def cache_key(**parts: Any) -> str:
+    """SHA-256 de um JSON canônico (chaves ordenadas) das partes informadas."""
+    canonical = json.dumps(
+        parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+class PdfCache:
+    """Armazenamento ``<dir>/<kk>/<key>.pdf`` com limite de bytes e despejo LRU."""
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._index: Optional["OrderedDict[str, int]"] = None  # key → tamanho, do LRU ao MRU
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory / key[:2] / f"{key}.pdf"
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        with self._lock:
+            return self._load_index_locked()
+
+    def _load_index_locked(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            entries = []
+            if self.directory.exists():
+                for path in self.directory.glob("*/*.pdf"):
+                    try:
+                        st = path.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, path.stem, st.st_size))
+            entries.sort()
+            self._index = OrderedDict((key, size) for _, key, size in entries)
+            self._total_bytes = sum(self._index.values())
+        return self._index
+
+    @property
+    def total_bytes(self) -> int:
+        self._load_index()
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._load_index())
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        self._load_index()
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            # Removido por outro worker (ou nunca existiu)
+            self._forget(key)
+            cache_lookup("pdf", hit=False)
+            return None
+        except OSError as exc:
+            logger.warning("Cache de PDF: falha ao ler %s: %s", path, exc)
+            cache_lookup("pdf", hit=False)
+            return None
+        cache_lookup("pdf", hit=True)
+
+        with self._lock:
+            index = self._load_index_locked()
+            if key not in index:
+                # Gravado por outro worker: passa a contar no limite deste processo
+                self._total_bytes += len(data)
+                index[key] = len(data)
+            index.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        self._load_index()
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Escrita atômica: leitores concorrentes nunca veem um PDF pela metade
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_name, path)
+        except OSError as exc:
+            logger.warning("Cache de PDF: falha ao gravar %s: %s", path, exc)
+            return
+
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            despejados = self._evict()
+        for key in despejados:
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                logger.warning("Cache de PDF: falha ao remover %s: %s", key, exc)
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            size = self._load_index_locked().pop(key, None)
+            if size is not None:
+                self._total_bytes -= size
+
+    def _evict(self) -> List[str]:
+        """Tira do índice as entradas menos usadas até caber no limite (com o lock)."""
+        index = self._load_index_locked()
+        despejados = []
+        while self._total_bytes > self.max_bytes and index:
+            key, size = index.popitem(last=False)
+            self._total_bytes -= size
+            despejados.append(key)
+        return despejados
+
+
+# Instância global do cache
+pdf_cache = PdfCache(
+    directory=settings.PDF_CACHE_DIR,
+    max_bytes=settings.PDF_CACHE_MAX_MB * 1024 * 1024,
+    enabled=settings.PDF_CACHE_ENABLED,
+)
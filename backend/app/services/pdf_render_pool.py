@@ -0,0 +1,141 @@
+"""Pool dedicado para renderização de PDF fora do event loop.
+
+O WeasyPrint é CPU-bound (centenas de ms a segundos por relatório) e síncrono; chamado
+direto de um endpoint ``async`` ele trava todas as outras requisições do worker. O pool
+executa a renderização em processos separados (configurável: ``PDF_RENDER_*``), com
+workers aquecidos por um ``initializer`` (templates, CSS e fontes já carregados).
+
+A fila é limitada: com ``workers + max_queue`` renderizações em andamento, novas
+chamadas falham imediatamente com ``PdfRenderPoolSaturated`` (o endpoint responde 503
+com ``Retry-After``) em vez de acumular requisições até o timeout do cliente.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.metrics import pdf_render_duration
+from app.utils.logger import logger
+
+T = TypeVar("T")
+
+# Peso da amostra mais recente na média móvel do tempo de renderização
+_EWMA_ALPHA = 0.2
+
+
+class PdfRenderPoolSaturated(Exception):
+    """Fila de renderização cheia; ``retry_after`` é a estimativa (s) para tentar de novo."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Pool de renderização de PDF saturado (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
+class PdfRenderPool:
+    """Executor limitado para funções de renderização síncronas."""
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        use_processes: bool = True,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.use_processes = use_processes
+        self._initializer = initializer
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        self._avg_seconds = 1.0
+        # _in_flight é decrementado na thread que conclui o future
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Renderizações em execução + aguardando na fila."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.workers)
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def start(self) -> None:
+        """Cria o executor e, no modo processo, já sobe (e aquece) os workers."""
+        if self._executor is not None:
+            return
+        if self.use_processes:
+            # spawn: não herda threads/conexões do processo do servidor
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self._initializer,
+            )
+            # O executor cria processos sob demanda; uma tarefa trivial por worker
+            # força todos a subir agora, pagando o aquecimento antes do 1º relatório.
+            for _ in range(self.workers):
+                self._executor.submit(os.getpid)
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="pdf-render",
+                initializer=self._initializer,
+            )
+        logger.info(
+            "Pool de renderização de PDF iniciado: %d worker(s) (%s), fila máx. %d",
+            self.workers, "processos" if self.use_processes else "threads", self.max_queue,
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def retry_after(self) -> int:
+        """Estimativa de quando haverá vaga, pela média dos tempos de renderização."""
+        backlog = self.queue_depth + 1
+        return max(1, math.ceil(self._avg_seconds * backlog / self.workers))
+
+    async def run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """Executa ``func(*args, **kwargs)`` no pool sem bloquear o event loop.
+
+        No modo processo, ``func`` e os argumentos precisam ser serializáveis (pickle).
+
+        A vaga só é liberada quando o trabalho termina de fato: se quem espera for
+        cancelado (ex.: cliente desconectou) com a renderização já em andamento, ela
+        continua ocupando o worker e contando para a saturação.
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise PdfRenderPoolSaturated(self.retry_after())
+            self._in_flight += 1
+        try:
+            if self._executor is None:
+                self.start()
+            future = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(functools.partial(self._concluido, time.perf_counter()))
+        return await asyncio.wrap_future(future)
+
+    def _concluido(self, started: float, future: Future) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():  # cancelado ainda na fila: não chegou a renderizar
+                return
+            self._avg_seconds += _EWMA_ALPHA * (elapsed - self._avg_seconds)
+        pdf_render_duration.observe(elapsed, outcome="error" if future.exception() else "ok")
@@ -0,0 +1,143 @@
+"""Montagem dos parâmetros de renderização dos relatórios em PDF.
+
+Reúne o que os endpoints de relatório, a fila de jobs, o lote e o regional fazem antes de
+renderizar: consulta o financiamento, aplica as perdas editadas do município e calcula
+o resumo. O resultado (``render_kwargs``) alimenta ``report_cache_key``/``render_report``.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.server_timing import fase
+from app.services.api_client import saude_api_client
+from app.services.municipios_editados import municipio_editado_service
+from app.models.schemas import ResumoMunicipioRegional
+from app.services.relatorio_pdf import compute_financial_summary
+from app.utils.logger import logger
+
+TIPOS_RELATORIO = ("padrao", "detalhado")
+
+
+class DadosRelatorioIndisponiveis(Exception):
+    """Sem dados de financiamento para o município/competência."""
+
+
+async def montar_parametros_relatorio(
+    tipo: str,
+    codigo_ibge: str,
+    competencia: str,
+    municipio_nome: Optional[str] = None,
+    uf: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Devolve os ``render_kwargs`` do relatório ``tipo`` (``padrao`` ou ``detalhado``).
+
+    Raises:
+        DadosRelatorioIndisponiveis: a API de financiamento não retornou resumos.
+    """
+    if tipo not in TIPOS_RELATORIO:
+        raise ValueError(f"Tipo de relatório inválido: {tipo}")
+
+    with fase("fin", "Consulta de financiamento"):
+        dados = await saude_api_client.consultar_financiamento(codigo_ibge, competencia)
+    if not dados or not dados.get('resumosPlanosOrcamentarios'):
+        logger.warning(
+            "Dados de financiamento não encontrados - Código IBGE: %s, Competência: %s",
+            codigo_ibge, competencia,
+        )
+        raise DadosRelatorioIndisponiveis(
+            "Não foi possível localizar dados de financiamento para gerar o relatório"
+        )
+
+    with fase("editado", "Perdas editadas"):
+        editado = municipio_editado_service.get_editado(codigo_ibge, competencia)
+
+    if tipo == "padrao":
+        resumos = dados.get('resumosPlanosOrcamentarios', [])
+        perdas = editado.perda_recurso_mensal if editado else [0.0] * len(resumos)
+        # Passar também os resumos de planos orçamentários para a página 4
+        return dict(
+            municipio_nome=municipio_nome,
+            uf=uf,
+            competencia=competencia,
+            resumo=compute_financial_summary(resumos, perdas),
+            resumos_planos=resumos,
+        )
+
+    resumos_completos = dados.get('resumosPlanosOrcamentarios', [])
+    # Considerar apenas recursos MUNICIPAIS — mesmo filtro do frontend (processarDados).
+    # Garante que o total do PDF bata com a tela e que os ganhos por componente (indexados
+    # pela lista municipal) caiam na linha correta.
+    resumos = [
+        r for r in resumos_completos
+        if not r.get('dsEsferaAdministrativa') or r.get('dsEsferaAdministrativa') == 'MUNICIPAL'
+    ]
+    pagamentos = dados.get('pagamentos', [])
+
+    if not pagamentos:
+        logger.warning(
+            "Nenhum dado de pagamento encontrado nos dados da API - Código IBGE: %s, Competência: %s",
+            codigo_ibge, competencia,
+        )
+
+    perdas = editado.perda_recurso_mensal if editado else [0.0] * len(resumos)
+
+    # Dados de pagamento + simulação por componente (SIAPS)
+    return dict(
+        municipio_nome=municipio_nome,
+        uf=uf,
+        competencia=competencia,
+        resumo=compute_financial_summary(resumos, perdas),
+        pagamentos=pagamentos,
+        resumos=resumos,
+        perdas_vinculo=editado.perda_vinculo_mensal if editado else None,
+        perdas_qualidade=editado.perda_qualidade_mensal if editado else None,
+    )
+
+
+async def montar_parametros_regional(
+    regiao_nome: str,
+    competencia: str,
+    municipios: Sequence[Tuple[str, Optional[str], Optional[str]]],
+    concurrency: int = 4,
+) -> Dict[str, Any]:
+    """``render_kwargs`` do relatório regional a partir de ``(codigo_ibge, nome, uf)``.
+
+    Consulta os municípios em paralelo (até ``concurrency`` ao mesmo tempo). Municípios sem
+    dados não interrompem o relatório: são listados em ``sem_dados``.
+    """
+    limite = asyncio.Semaphore(max(1, concurrency))
+
+    async def resumir(codigo_ibge: str, nome: Optional[str], uf: Optional[str]):
+        async with limite:
+            try:
+                params = await montar_parametros_relatorio("padrao", codigo_ibge, competencia, nome, uf)
+            except DadosRelatorioIndisponiveis:
+                return None
+        return ResumoMunicipioRegional(
+            codigo_ibge=codigo_ibge,
+            municipio_nome=nome,
+            uf=uf,
+            resumo=params["resumo"],
+        )
+
+    resultados = await asyncio.gather(*(resumir(*municipio) for municipio in municipios))
+
+    com_dados: List[ResumoMunicipioRegional] = []
+    sem_dados: List[str] = []
+    for (codigo_ibge, nome, uf), resultado in zip(municipios, resultados):
+        if resultado is None:
+            sem_dados.append(f"{nome}/{uf}" if nome and uf else (nome or codigo_ibge))
+        else:
+            com_dados.append(resultado)
+
+    if not com_dados:
+        raise DadosRelatorioIndisponiveis(
+            "Nenhum município da região tem dados de financiamento na competência"
+        )
+    return dict(
+        regiao_nome=regiao_nome,
+        competencia=competencia,
+        municipios=com_dados,
+        sem_dados=sem_dados,
+    )
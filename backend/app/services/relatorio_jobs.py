@@ -0,0 +1,312 @@
+"""Fila assíncrona de geração de relatórios (jobs com status, progresso e download).
+
+Relatórios detalhados levam segundos; com vários pedidos simultâneos o cliente HTTP
+estoura o timeout esperando o PDF. Com a fila, ``POST /relatorios/jobs`` devolve um id na
+hora, o cliente consulta o status e baixa o arquivo quando pronto.
+
+Fila em processo (``asyncio``), adequada ao deploy atual de um único processo uvicorn:
+- concorrência limitada (``REPORT_JOBS_CONCURRENCY`` workers consumindo a fila) e
+  tamanho máximo de pendentes (``REPORT_JOBS_MAX_PENDING``);
+- novas tentativas com backoff para falhas transitórias (API fora, pool saturado);
+  falta de dados de financiamento é definitiva e não é repetida;
+- arquivos gravados em ``REPORT_JOBS_DIR`` e removidos, junto com o job, após
+  ``REPORT_JOBS_TTL_MINUTES`` da conclusão.
+
+Jobs não sobrevivem a reinício do servidor (o cliente recebe 404 e reenvia).
+"""
+from __future__ import annotations
+
+import asyncio
+import pathlib
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.pdf_render_pool import PdfRenderPoolSaturated
+from app.utils.logger import logger
+
+STATUS_PENDENTE = "pendente"
+STATUS_PROCESSANDO = "processando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_FALHOU = "falhou"
+
+_RETRY_BACKOFF_BASE = 2  # segundos; espera = base * tentativa
+
+
+class FilaRelatoriosCheia(Exception):
+    """Pendentes demais na fila de relatórios."""
+
+
+class FalhaDefinitiva(Exception):
+    """Erro que uma nova tentativa não resolve (ex.: município sem dados)."""
+
+
+@dataclass
+class RelatorioJob:
+    """Estado de um pedido de relatório na fila."""
+
+    id: str
+    tipo: str
+    codigo_ibge: str
+    competencia: str
+    municipio_nome: Optional[str] = None
+    uf: Optional[str] = None
+    usuario_id: Optional[str] = None
+    status: str = STATUS_PENDENTE
+    progresso: int = 0
+    etapa: str = "Aguardando na fila"
+    tentativas: int = 0
+    erro: Optional[str] = None
+    criado_em: datetime = field(default_factory=datetime.utcnow)
+    iniciado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+    arquivo: Optional[pathlib.Path] = None
+    tamanho_bytes: Optional[int] = None
+
+    @property
+    def finalizado(self) -> bool:
+        return self.status in (STATUS_CONCLUIDO, STATUS_FALHOU)
+
+    @property
+    def nome_arquivo(self) -> str:
+        prefixo = "relatorio_detalhado" if self.tipo == "detalhado" else "relatorio"
+        return f"{prefixo}_{self.codigo_ibge}_{self.competencia}.pdf"
+
+    def expira_em(self, ttl: timedelta) -> Optional[datetime]:
+        return self.concluido_em + ttl if self.concluido_em else None
+
+    def avancar(self, progresso: int, etapa: str) -> None:
+        self.progresso, self.etapa = progresso, etapa
+
+
+# Gera o PDF do job (atualizando o progresso via ``job.avancar``) e devolve os bytes
+GeradorRelatorio = Callable[[RelatorioJob], Awaitable[bytes]]
+
+
+class RelatorioJobQueue:
+    """Fila em processo com workers limitados, novas tentativas e expiração."""
+
+    def __init__(
+        self,
+        directory: str,
+        concurrency: int,
+        max_pending: int,
+        max_attempts: int,
+        ttl: timedelta,
+        gerar: GeradorRelatorio,
+    ):
+        self.gerar = gerar
+        self.directory = pathlib.Path(directory)
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending
+        self.max_attempts = max(1, max_attempts)
+        self.ttl = ttl
+        self._jobs: Dict[str, RelatorioJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    # --- ciclo de vida ----------------------------------------------------
+
+    def start(self) -> None:
+        """Sobe os workers e a limpeza periódica (chamar dentro do event loop)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"relatorio-job-{n}")
+            for n in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._limpeza_periodica(), name="relatorio-job-limpeza"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    # --- API --------------------------------------------------------------
+
+    def submit(
+        self,
+        tipo: str,
+        codigo_ibge: str,
+        competencia: str,
+        municipio_nome: Optional[str] = None,
+        uf: Optional[str] = None,
+        usuario_id: Optional[str] = None,
+    ) -> RelatorioJob:
+        """Enfileira um relatório.
+
+        Raises:
+            FilaRelatoriosCheia: pendentes acima de ``max_pending``.
+        """
+        if self._queue is None:
+            self.start()
+        if self.pendentes >= self.max_pending:
+            raise FilaRelatoriosCheia(f"{self.pendentes} relatórios aguardando na fila")
+
+        job = RelatorioJob(
+            id=uuid.uuid4().hex,
+            tipo=tipo,
+            codigo_ibge=codigo_ibge,
+            competencia=competencia,
+            municipio_nome=municipio_nome,
+            uf=uf,
+            usuario_id=usuario_id,
+        )
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[RelatorioJob]:
+        job = self._jobs.get(job_id)
+        if job is not None and self._expirado(job):
+            arquivo = self._remover(job)
+            if arquivo is not None:
+                try:
+                    # Chamado dos endpoints: apaga o arquivo sem segurar o event loop
+                    asyncio.get_running_loop().run_in_executor(None, _apagar_arquivo, job.id, arquivo)
+                except RuntimeError:
+                    _apagar_arquivo(job.id, arquivo)
+            return None
+        return job
+
+    @property
+    def pendentes(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == STATUS_PENDENTE)
+
+    # --- execução ---------------------------------------------------------
+
+    async def _worker(self, numero: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    await self._executar(job)
+            except Exception as exc:  # o worker nunca pode morrer
+                logger.error("Worker de relatórios %s: erro inesperado: %s", numero, exc, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _executar(self, job: RelatorioJob) -> None:
+        job.status = STATUS_PROCESSANDO
+        job.iniciado_em = datetime.utcnow()
+
+        while True:
+            job.tentativas += 1
+            try:
+                await self._gerar(job)
+                return
+            except FalhaDefinitiva as exc:
+                self._falhar(job, str(exc))
+                return
+            except PdfRenderPoolSaturated as exc:
+                espera = exc.retry_after
+                motivo = "pool de renderização ocupado"
+            except Exception as exc:
+                espera = _RETRY_BACKOFF_BASE * job.tentativas
+                motivo = str(exc) or exc.__class__.__name__
+
+            if job.tentativas >= self.max_attempts:
+                self._falhar(job, f"Falhou após {job.tentativas} tentativa(s): {motivo}")
+                return
+            logger.warning(
+                "Job de relatório %s (tentativa %d) falhou: %s; nova tentativa em %ss",
+                job.id, job.tentativas, motivo, espera,
+            )
+            job.etapa = f"Nova tentativa em {espera}s"
+            await asyncio.sleep(espera)
+
+    async def _gerar(self, job: RelatorioJob) -> None:
+        pdf_bytes = await self.gerar(job)
+
+        job.avancar(90, "Salvando arquivo")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        arquivo = self.directory / f"{job.id}.pdf"
+        await asyncio.to_thread(arquivo.write_bytes, pdf_bytes)
+
+        job.arquivo = arquivo
+        job.tamanho_bytes = len(pdf_bytes)
+        job.status = STATUS_CONCLUIDO
+        job.avancar(100, "Concluído")
+        job.erro = None
+        job.concluido_em = datetime.utcnow()
+        logger.info("Job de relatório %s concluído (%s bytes)", job.id, job.tamanho_bytes)
+
+    def _falhar(self, job: RelatorioJob, erro: str) -> None:
+        job.status = STATUS_FALHOU
+        job.etapa = "Falhou"
+        job.erro = erro
+        job.concluido_em = datetime.utcnow()
+        logger.error("Job de relatório %s falhou: %s", job.id, erro)
+
+    # --- expiração --------------------------------------------------------
+
+    def _expirado(self, job: RelatorioJob) -> bool:
+        expira_em = job.expira_em(self.ttl)
+        return expira_em is not None and expira_em <= datetime.utcnow()
+
+    def _remover(self, job: RelatorioJob) -> Optional[pathlib.Path]:
+        """Tira o job da fila; devolve o arquivo a apagar (se houver)."""
+        self._jobs.pop(job.id, None)
+        return job.arquivo
+
+    async def limpar_expirados(self) -> int:
+        expirados = [job for job in self._jobs.values() if self._expirado(job)]
+        for job in expirados:
+            arquivo = self._remover(job)
+            if arquivo is not None:
+                await asyncio.to_thread(_apagar_arquivo, job.id, arquivo)
+        return len(expirados)
+
+    async def _limpeza_periodica(self) -> None:
+        intervalo = max(30.0, self.ttl.total_seconds() / 4)
+        while True:
+            await asyncio.sleep(intervalo)
+            removidos = await self.limpar_expirados()
+            if removidos:
+                logger.info("%d job(s) de relatório expirado(s) removido(s)", removidos)
+
+
+def _apagar_arquivo(job_id: str, arquivo: pathlib.Path) -> None:
+    try:
+        arquivo.unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as exc:
+        logger.warning("Falha ao remover arquivo do job %s: %s", job_id, exc)
+
+
+async def gerar_pdf_relatorio(job: RelatorioJob) -> bytes:
+    """Pipeline dos endpoints síncronos: dados → chave do cache → pool de renderização."""
+    # Import tardio: o pipeline de PDF carrega o WeasyPrint, dispensável para a fila em si
+    from app.services.relatorio_dados import DadosRelatorioIndisponiveis, montar_parametros_relatorio
+    from app.services.relatorio_pdf import render_report, report_cache_key
+
+    job.avancar(10, "Consultando dados de financiamento")
+    try:
+        render_kwargs = await montar_parametros_relatorio(
+            job.tipo, job.codigo_ibge, job.competencia, job.municipio_nome, job.uf
+        )
+    except DadosRelatorioIndisponiveis as exc:
+        raise FalhaDefinitiva(str(exc)) from exc
+
+    job.avancar(40, "Renderizando PDF")
+    key = report_cache_key(job.tipo, job.codigo_ibge, render_kwargs)
+    pdf_bytes, _ = await render_report(job.tipo, key, render_kwargs)
+    return pdf_bytes
+
+
+# Instância global da fila
+relatorio_job_queue = RelatorioJobQueue(
+    directory=settings.REPORT_JOBS_DIR,
+    concurrency=settings.REPORT_JOBS_CONCURRENCY,
+    max_pending=settings.REPORT_JOBS_MAX_PENDING,
+    max_attempts=settings.REPORT_JOBS_MAX_ATTEMPTS,
+    ttl=timedelta(minutes=settings.REPORT_JOBS_TTL_MINUTES),
+    gerar=gerar_pdf_relatorio,
+)
@@ -0,0 +1,152 @@
+"""Geração de relatórios em lote, entregue como um ZIP transmitido em partes.
+
+Cada município é preparado e renderizado em paralelo (até ``REPORT_BATCH_CONCURRENCY``
+ao mesmo tempo, renderização no pool de PDF). Os PDFs entram no ZIP na ordem em que
+ficam prontos e cada pedaço do arquivo é enviado ao cliente logo em seguida: na memória
+ficam só os PDFs em andamento, nunca o ZIP inteiro.
+
+O ZIP é escrito sem ``seek`` (descritores de dados após cada arquivo) e sem compressão,
+já que PDF não comprime. Falhas não interrompem o lote: vão para ``manifesto.json``,
+última entrada do ZIP, junto com a lista do que foi gerado.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.pdf_render_pool import PdfRenderPoolSaturated
+from app.services.relatorio_jobs import GeradorRelatorio, RelatorioJob, gerar_pdf_relatorio
+from app.utils.logger import logger
+
+MANIFESTO = "manifesto.json"
+
+
+@dataclass(frozen=True)
+class ItemLote:
+    codigo_ibge: str
+    municipio_nome: Optional[str] = None
+    uf: Optional[str] = None
+
+
+class _ZipStream:
+    """Destino não posicionável do ``ZipFile``: acumula bytes até o próximo ``drain``."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+async def _gerar_item(
+    item: ItemLote,
+    tipo: str,
+    competencia: str,
+    gerar: GeradorRelatorio,
+    limite: asyncio.Semaphore,
+    max_espera: float,
+) -> Tuple[RelatorioJob, Optional[bytes], Optional[str]]:
+    job = RelatorioJob(
+        id=uuid.uuid4().hex,
+        tipo=tipo,
+        codigo_ibge=item.codigo_ibge,
+        competencia=competencia,
+        municipio_nome=item.municipio_nome,
+        uf=item.uf,
+    )
+    async with limite:
+        loop = asyncio.get_running_loop()
+        prazo = loop.time() + max_espera
+        while True:
+            try:
+                return job, await gerar(job), None
+            except PdfRenderPoolSaturated as exc:
+                # Pool dividido com os demais usuários: espera a vaga em vez de falhar,
+                # mas só até o prazo (com o pool sempre cheio o ZIP não fica parado)
+                if loop.time() + exc.retry_after > prazo:
+                    logger.warning(
+                        "Lote: pool de PDF saturado por mais de %ss para %s/%s",
+                        max_espera, item.codigo_ibge, competencia,
+                    )
+                    return job, None, f"Pool de renderização saturado por mais de {max_espera:g}s"
+                await asyncio.sleep(exc.retry_after)
+            except Exception as exc:
+                logger.warning("Lote: falha no relatório de %s/%s: %s", item.codigo_ibge, competencia, exc)
+                return job, None, str(exc) or exc.__class__.__name__
+
+
+async def gerar_lote_zip(
+    itens: List[ItemLote],
+    competencia: str,
+    tipo: str = "padrao",
+    concurrency: Optional[int] = None,
+    gerar: GeradorRelatorio = gerar_pdf_relatorio,
+    max_espera: Optional[float] = None,
+) -> AsyncIterator[bytes]:
+    """Gera os relatórios de ``itens`` e produz os bytes do ZIP à medida que ficam prontos.
+
+    ``max_espera``: segundos que cada município aguarda vaga no pool de PDF saturado
+    antes de entrar como falha no manifesto (padrão ``REPORT_BATCH_SATURATED_MAX_WAIT_SECONDS``).
+    """
+    limite = asyncio.Semaphore(max(1, concurrency or settings.REPORT_BATCH_CONCURRENCY))
+    if max_espera is None:
+        max_espera = settings.REPORT_BATCH_SATURATED_MAX_WAIT_SECONDS
+    tarefas = [
+        asyncio.create_task(_gerar_item(item, tipo, competencia, gerar, limite, max_espera))
+        for item in itens
+    ]
+    stream = _ZipStream()
+    gerados = []
+    falhas = []
+    try:
+        with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED) as zf:
+            for proxima in asyncio.as_completed(tarefas):
+                job, pdf_bytes, erro = await proxima
+                if pdf_bytes is None:
+                    falhas.append({
+                        "codigo_ibge": job.codigo_ibge,
+                        "municipio": job.municipio_nome,
+                        "erro": erro,
+                    })
+                    continue
+                zf.writestr(job.nome_arquivo, pdf_bytes)
+                gerados.append({
+                    "codigo_ibge": job.codigo_ibge,
+                    "municipio": job.municipio_nome,
+                    "arquivo": job.nome_arquivo,
+                    "tamanho_bytes": len(pdf_bytes),
+                })
+                yield stream.drain()
+
+            manifesto = {
+                "competencia": competencia,
+                "tipo": tipo,
+                "gerado_em": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                "total": len(itens),
+                "gerados": gerados,
+                "falhas": falhas,
+            }
+            zf.writestr(MANIFESTO, json.dumps(manifesto, ensure_ascii=False, indent=2))
+        yield stream.drain()
+        logger.info(
+            "Lote de relatórios %s: %d gerado(s), %d falha(s)", competencia, len(gerados), len(falhas)
+        )
+    finally:
+        # Cliente desconectou no meio: não continua renderizando para ninguém
+        for tarefa in tarefas:
+            tarefa.cancel()
@@ -1,17 +1,37 @@
 """Serviços utilitários para geração do relatório financeiro em PDF usando HTML-to-PDF."""
 from __future__ import annotations
 
+import asyncio
 import html
-import base64
-from typing import Any, Dict, Iterable, List, Optional
-from pathlib import Path
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import weasyprint
 
 from fpdf import FPDF
 
-from app.models.schemas import ResumoFinanceiro, DetalhamentoPrograma, ResumoDetalhado
+from app.core.config import settings
+from app.models.schemas import (
+    ResumoFinanceiro,
+    DetalhamentoPrograma,
+    ResumoDetalhado,
+    ResumoMunicipioRegional,
+)
+from app.services.pdf_cache import cache_key, pdf_cache
+from app.core.server_timing import fase, registrar_fase
+from app.services.pdf_render_pool import PdfRenderPool
+from app.services.relatorio_template import (
+    TEMPLATES_ROOT,
+    load_inline_css,
+    load_template,
+    template_version,
+)
 from app.utils.logger import logger
 
+# Incrementar quando a montagem do HTML mudar sem alteração em ``templates/``
+# (invalida o cache de PDFs).
+REPORT_LAYOUT_VERSION = 1
+
 
 def _sanitize_text(value: str) -> str:
     """Garantir compatibilidade de caracteres com as fontes padrão do FPDF."""
@@ -599,6 +619,85 @@ def _get_badge_text(programa: DetalhamentoPrograma) -> str:
 
 
 
+def _progress_value(ratio: float) -> int:
+    """Largura (%) da barra de progresso dos cards; mínimo visível de 6% quando há valor."""
+    if ratio <= 0:
+        return 0
+    return max(6, min(100, int(round(ratio * 100))))
+
+
+def _build_html_report(
+    *,
+    municipio_nome: Optional[str],
+    uf: Optional[str],
+    resumo: ResumoFinanceiro,
+) -> str:
+    """Monta o HTML do relatório padrão (``relatorio_base.html``) em uma única passada."""
+    template = load_template("relatorio_base.html")
+
+    # Calcular valores necessários
+    recurso_atual_anual = resumo.total_recebido * 12
+    recurso_potencial_anual = recurso_atual_anual + resumo.total_diferenca_anual
+    recurso_potencial_mensal = resumo.total_recebido + resumo.total_perda_mensal
+
+    # Métricas complementares para os cards
+    ratio_perda_mensal = _safe_ratio(resumo.total_perda_mensal, recurso_potencial_mensal)
+    ratio_diferenca_anual = _safe_ratio(resumo.total_diferenca_anual, recurso_potencial_anual)
+    ratio_recebimento_atual = _safe_ratio(resumo.total_recebido, recurso_potencial_mensal)
+
+    perda_percent = int(round(ratio_perda_mensal * 100))
+    diferenca_percent = int(round(ratio_diferenca_anual * 100))
+    recebimento_percent = int(round(ratio_recebimento_atual * 100))
+
+    perda_detalhe = f"Equivalente a R$ {_br_number(resumo.total_diferenca_anual, 0)} por ano"
+    diferenca_detalhe = f"Impacto de {resumo.percentual_perda_anual:.1f}% do orçamento anual"
+    atual_detalhe = f"Potencial com ajuste: R$ {_br_number(recurso_potencial_mensal, 0)}"
+
+    perda_indicador = f"{perda_percent}% do potencial mensal"
+    diferenca_indicador = f"{diferenca_percent}% do potencial anual"
+    atual_indicador = f"Cobertura atual de {recebimento_percent}%"
+
+    return template.render({
+        'municipio_nome': municipio_nome or 'Município',
+        'uf': uf or '',
+        'css_content': load_inline_css(),
+        'percentual_perda_anual': f"{resumo.percentual_perda_anual:.2f}",
+        'total_perda_mensal': _br_number(resumo.total_perda_mensal, 0),
+        'total_diferenca_anual': _br_number(resumo.total_diferenca_anual, 0),
+        'total_recebido': _br_number(resumo.total_recebido, 0),
+        'recurso_atual_anual': _br_number(recurso_atual_anual, 0),
+        'recurso_potencial_anual': _br_number(recurso_potencial_anual, 0),
+        'recurso_potencial_mensal': _br_number(recurso_potencial_mensal, 0),
+        'perda_badge': html.escape('Oportunidade'),
+        'perda_detalhe': html.escape(perda_detalhe),
+        'perda_progress': str(_progress_value(ratio_perda_mensal)),
+        'perda_indicador': html.escape(perda_indicador),
+        'diferenca_badge': html.escape('Visão anual'),
+        'diferenca_detalhe': html.escape(diferenca_detalhe),
+        'diferenca_progress': str(_progress_value(ratio_diferenca_anual)),
+        'diferenca_indicador': html.escape(diferenca_indicador),
+        'atual_badge': html.escape('Cenário atual'),
+        'atual_detalhe': html.escape(atual_detalhe),
+        'atual_progress': str(_progress_value(ratio_recebimento_atual)),
+        'atual_indicador': html.escape(atual_indicador),
+    })
+
+
+# Tempo gasto no WeasyPrint pela renderização em curso nesta thread (ver _build_timed)
+_render_clock = threading.local()
+
+
+def _render_pdf(html_content: str) -> bytes:
+    """Converte o HTML em PDF com WeasyPrint (CPU-bound; chamar pelo ``pdf_render_pool``)."""
+    # base_url para que o WeasyPrint encontre as imagens relativas aos templates
+    base_url = TEMPLATES_ROOT.as_uri() + '/'
+    started = time.perf_counter()
+    try:
+        return weasyprint.HTML(string=html_content, base_url=base_url).write_pdf()
+    finally:
+        _render_clock.seconds = getattr(_render_clock, "seconds", 0.0) + time.perf_counter() - started
+
+
 def create_pdf_report(
     *,
     municipio_nome: Optional[str],
@@ -654,114 +753,11 @@ def create_html_pdf_report(
     resumos_planos: Optional[List[Dict[str, Any]]] = None,
 ) -> bytes:
     """Cria o relatório em PDF usando templates HTML modernos."""
-
-    templates_root = Path(__file__).resolve().parents[2] / "templates"
-
-    # Carregar CSS
-    css_path = templates_root / "css" / "modern-cards.css"
-    css_content = ""
-    if css_path.exists():
-        css_content = css_path.read_text(encoding='utf-8')
-
-    # Carregar imagem do timbrado e converter para base64
-    img_path = templates_root / "images" / "Imagem Timbrado.png"
-    img_base64 = ""
-    if img_path.exists():
-        with open(img_path, "rb") as img_file:
-            img_data = img_file.read()
-            img_base64 = base64.b64encode(img_data).decode('utf-8')
-            # Substituir URL relativa por data URI no CSS
-            css_content = css_content.replace(
-                "url('../images/Imagem Timbrado.png')",
-                f"url('data:image/png;base64,{img_base64}')"
-            )
-
-    # Carregar template HTML
-    template_path = templates_root / "relatorio_base.html"
-    html_content = ""
-    if template_path.exists():
-        html_template = template_path.read_text(encoding='utf-8')
-    else:
-        raise FileNotFoundError(f"Template HTML não encontrado: {template_path}")
-
-    if html_template:
-
-        # Calcular valores necessários
-        recurso_atual_anual = resumo.total_recebido * 12
-        recurso_potencial_anual = recurso_atual_anual + resumo.total_diferenca_anual
-        recurso_potencial_mensal = resumo.total_recebido + resumo.total_perda_mensal
-
-        # Métricas complementares para os cards
-        ratio_perda_mensal = _safe_ratio(resumo.total_perda_mensal, recurso_potencial_mensal)
-        ratio_diferenca_anual = _safe_ratio(resumo.total_diferenca_anual, recurso_potencial_anual)
-        ratio_recebimento_atual = _safe_ratio(resumo.total_recebido, recurso_potencial_mensal)
-
-        def _progress_value(ratio: float) -> int:
-            if ratio <= 0:
-                return 0
-            return max(6, min(100, int(round(ratio * 100))))
-
-        perda_percent = int(round(ratio_perda_mensal * 100))
-        diferenca_percent = int(round(ratio_diferenca_anual * 100))
-        recebimento_percent = int(round(ratio_recebimento_atual * 100))
-
-        perda_detalhe = f"Equivalente a R$ {_br_number(resumo.total_diferenca_anual, 0)} por ano"
-        diferenca_detalhe = f"Impacto de {resumo.percentual_perda_anual:.1f}% do orçamento anual"
-        atual_detalhe = f"Potencial com ajuste: R$ {_br_number(recurso_potencial_mensal, 0)}"
-
-        perda_indicador = f"{perda_percent}% do potencial mensal"
-        diferenca_indicador = f"{diferenca_percent}% do potencial anual"
-        atual_indicador = f"Cobertura atual de {recebimento_percent}%"
-
-        # Substituir variáveis no template
-        html_content = html_template.replace('{{ municipio_nome }}', municipio_nome or 'Município')
-        html_content = html_content.replace('{{ uf }}', uf or '')
-        html_content = html_content.replace('{{ css_content }}', css_content)
-
-        # Processar todas as substituições de template
-        replacements = {
-            '{{ "%.2f"|format(resumo.percentual_perda_anual) }}': f"{resumo.percentual_perda_anual:.2f}",
-            '{{ "{:,.0f}".format(resumo.total_perda_mensal).replace(\',\', \'.\') }}': _br_number(resumo.total_perda_mensal, 0),
-            '{{ "{:,.0f}".format(resumo.total_diferenca_anual).replace(\',\', \'.\') }}': _br_number(resumo.total_diferenca_anual, 0),
-            '{{ "{:,.0f}".format(resumo.total_recebido).replace(\',\', \'.\') }}': _br_number(resumo.total_recebido, 0),
-            '{{ "{:,.0f}".format(resumo.total_recebido * 12).replace(\',\', \'.\') }}': _br_number(recurso_atual_anual, 0),
-            '{{ "{:,.0f}".format((resumo.total_recebido * 12) + resumo.total_diferenca_anual).replace(\',\', \'.\') }}': _br_number(recurso_potencial_anual, 0),
-            '{{ "{:,.0f}".format(resumo.total_recebido + resumo.total_perda_mensal).replace(\',\', \'.\') }}': _br_number(recurso_potencial_mensal, 0),
-            '__PERDA_BADGE__': html.escape('Oportunidade'),
-            '__PERDA_DETALHE__': html.escape(perda_detalhe),
-            '__PERDA_PROGRESS__': str(_progress_value(ratio_perda_mensal)),
-            '__PERDA_INDICADOR__': html.escape(perda_indicador),
-            '__DIFERENCA_BADGE__': html.escape('Visão anual'),
-            '__DIFERENCA_DETALHE__': html.escape(diferenca_detalhe),
-            '__DIFERENCA_PROGRESS__': str(_progress_value(ratio_diferenca_anual)),
-            '__DIFERENCA_INDICADOR__': html.escape(diferenca_indicador),
-            '__ATUAL_BADGE__': html.escape('Cenário atual'),
-            '__ATUAL_DETALHE__': html.escape(atual_detalhe),
-            '__ATUAL_PROGRESS__': str(_progress_value(ratio_recebimento_atual)),
-            '__ATUAL_INDICADOR__': html.escape(atual_indicador),
-        }
-
-        # Aplicar todas as substituições
-        for old_pattern, new_value in replacements.items():
-            html_content = html_content.replace(old_pattern, new_value)
-
-        # Substituir cálculos para gráfico de barras (porcentagem de altura)
-        if recurso_potencial_anual > 0:
-            bar_height_percentage = (recurso_atual_anual / recurso_potencial_anual) * 100
-        else:
-            bar_height_percentage = 50
-
-        html_content = html_content.replace(
-            '{{ (resumo.total_recebido * 12 / ((resumo.total_recebido * 12) + resumo.total_diferenca_anual) * 100) }}',
-            f"{bar_height_percentage:.1f}"
-        )
-
-        # Substituir valor em milhões para o eixo do gráfico
-        max_value_millions = recurso_potencial_anual / 1000000
-        html_content = html_content.replace(
-            '{{ "{:.1f}mi".format(((resumo.total_recebido * 12) + resumo.total_diferenca_anual) / 1000000) }}',
-            f"{max_value_millions:.1f}mi"
-        )
+    html_content = _build_html_report(
+        municipio_nome=municipio_nome,
+        uf=uf,
+        resumo=resumo,
+    )
 
     # Gerar PDF com WeasyPrint
     try:
@@ -769,10 +765,7 @@ def create_html_pdf_report(
         if not html_content or len(html_content) < 1000:
             raise ValueError("HTML template não foi processado corretamente")
 
-        # Configurar base_url para que o WeasyPrint encontre as imagens
-        base_url = templates_root.as_uri() + '/'
-        html_doc = weasyprint.HTML(string=html_content, base_url=base_url)
-        pdf_bytes = html_doc.write_pdf()
+        pdf_bytes = _render_pdf(html_content)
 
         # Verificar se o PDF foi gerado corretamente
         if not pdf_bytes or len(pdf_bytes) < 5000:
@@ -2010,44 +2003,20 @@ def create_detailed_pdf_report(
 ) -> bytes:
     """Cria relatório PDF detalhado com separação por temas e detalhamento de Saúde Bucal."""
 
-    templates_root = Path(__file__).resolve().parents[2] / "templates"
-
-    # Carregar CSS
-    css_path = templates_root / "css" / "modern-cards.css"
-    css_content = ""
-    if css_path.exists():
-        css_content = css_path.read_text(encoding='utf-8')
-
-    # Carregar imagem do timbrado e converter para base64
-    img_path = templates_root / "images" / "Imagem Timbrado.png"
-    if img_path.exists():
-        with open(img_path, "rb") as img_file:
-            img_data = img_file.read()
-            img_base64 = base64.b64encode(img_data).decode('utf-8')
-            css_content = css_content.replace(
-                "url('../images/Imagem Timbrado.png')",
-                f"url('data:image/png;base64,{img_base64}')"
-            )
-
-    # Carregar template HTML detalhado
-    template_path = templates_root / "relatorio_detalhado.html"
-    if not template_path.exists():
-        raise FileNotFoundError(f"Template HTML detalhado não encontrado: {template_path}")
-
-    html_template = template_path.read_text(encoding='utf-8')
+    template = load_template("relatorio_detalhado.html")
 
     # Validar e garantir que pagamentos seja uma lista válida
     pagamentos_validos = pagamentos if pagamentos and isinstance(pagamentos, list) and len(pagamentos) > 0 else []
 
     if not pagamentos_validos:
         logger.warning(
-            f"Nenhum dado de pagamento disponível para relatório detalhado - "
-            f"Município: {municipio_nome}/{uf}, Competência: {competencia}"
+            "Nenhum dado de pagamento disponível para relatório detalhado - Município: %s/%s, Competência: %s",
+            municipio_nome, uf, competencia,
         )
     else:
-        logger.info(
-            f"Gerando relatório detalhado - Município: {municipio_nome}/{uf}, "
-            f"Competência: {competencia}, Pagamentos: {len(pagamentos_validos)}"
+        logger.debug(
+            "Gerando relatório detalhado - Município: %s/%s, Competência: %s, Pagamentos: %d",
+            municipio_nome, uf, competencia, len(pagamentos_validos),
         )
 
     # Processar dados detalhados de Saúde Bucal
@@ -2071,12 +2040,6 @@ def create_detailed_pdf_report(
     if not emulti_dados:
         logger.debug("Nenhum dado de eMulti processado")
 
-    # Substituir variáveis básicas
-    html_content = html_template.replace('{{ municipio_nome }}', municipio_nome or 'Município')
-    html_content = html_content.replace('{{ uf }}', uf or '')
-    html_content = html_content.replace('{{ css_content }}', css_content)
-    html_content = html_content.replace('{{ img_base64 }}', img_base64)
-
     # Substituir competências
     if pagamentos and len(pagamentos) > 0:
         comp_cnes = pagamentos[0].get('nuCompCnes', competencia)
@@ -2085,59 +2048,370 @@ def create_detailed_pdf_report(
         comp_cnes = competencia
         parcela_pgto = competencia
 
-    html_content = html_content.replace('__COMPETENCIA_CNES__', str(comp_cnes))
-    html_content = html_content.replace('__PARCELA_PGTO__', str(parcela_pgto))
-
-    # Substituir conteúdo das seções temáticas
-    html_content = html_content.replace('__ESF_CONTENT__', esf_html or '<p>Dados não disponíveis</p>')
-    html_content = html_content.replace('__EAP_CONTENT__', eap_html or '<p>Dados não disponíveis</p>')
-    html_content = html_content.replace('__SAUDE_BUCAL_CONTENT__', saude_bucal_html or '<p>Dados não disponíveis</p>')
-    html_content = html_content.replace('__CEO_CONTENT__', ceo_html or '<p>Dados não disponíveis</p>')
-    html_content = html_content.replace('__LRPD_CONTENT__', lrpd_html or '<p>Dados não disponíveis</p>')
-    html_content = html_content.replace('__EMULTI_CONTENT__', emulti_html or '<p>Dados não disponíveis</p>')
-
     # Simulação por componente (Vínculo e Acompanhamento / Qualidade) — ganho projetado (SIAPS)
     simulacao_componentes_html = _gerar_html_simulacao_componentes(
         resumos, perdas_vinculo, perdas_qualidade
     )
-    html_content = html_content.replace(
-        '__SIMULACAO_COMPONENTES_CONTENT__', simulacao_componentes_html
-    )
 
-    # Substituir valores do resumo financeiro
-    replacements = {
-        '{{ "{:,.0f}".format(resumo.total_recebido).replace(\',\', \'.\') }}': _br_number(resumo.total_recebido, 0),
-        '{{ "{:,.0f}".format(resumo.total_perda_mensal).replace(\',\', \'.\') }}': _br_number(resumo.total_perda_mensal, 0),
-        '{{ "{:,.0f}".format(resumo.total_diferenca_anual).replace(\',\', \'.\') }}': _br_number(resumo.total_diferenca_anual, 0),
-        '{{ "%.2f"|format(resumo.percentual_perda_anual) }}': f"{resumo.percentual_perda_anual:.2f}",
-        '{{ "{:,.0f}".format(resumo.total_recebido + resumo.total_perda_mensal).replace(\',\', \'.\') }}': _br_number(resumo.total_recebido + resumo.total_perda_mensal, 0),
-    }
-
-    for old_pattern, new_value in replacements.items():
-        html_content = html_content.replace(old_pattern, new_value)
+    html_content = template.render({
+        'municipio_nome': municipio_nome or 'Município',
+        'uf': uf or '',
+        'css_content': load_inline_css(),
+        'competencia_cnes': str(comp_cnes),
+        'parcela_pgto': str(parcela_pgto),
+        # Conteúdo das seções temáticas
+        'esf_content': esf_html or '<p>Dados não disponíveis</p>',
+        'eap_content': eap_html or '<p>Dados não disponíveis</p>',
+        'saude_bucal_content': saude_bucal_html or '<p>Dados não disponíveis</p>',
+        'ceo_content': ceo_html or '<p>Dados não disponíveis</p>',
+        'lrpd_content': lrpd_html or '<p>Dados não disponíveis</p>',
+        'emulti_content': emulti_html or '<p>Dados não disponíveis</p>',
+        'simulacao_componentes_content': simulacao_componentes_html,
+        # Valores do resumo financeiro
+        'total_recebido': _br_number(resumo.total_recebido, 0),
+        'total_perda_mensal': _br_number(resumo.total_perda_mensal, 0),
+        'total_diferenca_anual': _br_number(resumo.total_diferenca_anual, 0),
+        'percentual_perda_anual': f"{resumo.percentual_perda_anual:.2f}",
+        'recurso_potencial_mensal': _br_number(resumo.total_recebido + resumo.total_perda_mensal, 0),
+    })
 
     # Gerar PDF
     try:
-        base_url = templates_root.as_uri() + '/'
-        html_doc = weasyprint.HTML(string=html_content, base_url=base_url)
-        pdf_bytes = html_doc.write_pdf()
+        pdf_bytes = _render_pdf(html_content)
 
         if not pdf_bytes or len(pdf_bytes) < 5000:
-            logger.error(f"PDF detalhado gerado é muito pequeno: {len(pdf_bytes) if pdf_bytes else 0} bytes")
+            logger.error("PDF detalhado gerado é muito pequeno: %d bytes", len(pdf_bytes) if pdf_bytes else 0)
             raise ValueError("PDF gerado está muito pequeno, possível erro na geração")
 
         logger.info(
-            f"PDF detalhado gerado com sucesso - Município: {municipio_nome}/{uf}, "
-            f"Tamanho: {len(pdf_bytes)} bytes"
+            "PDF detalhado gerado com sucesso - Município: %s/%s, Tamanho: %d bytes",
+            municipio_nome, uf, len(pdf_bytes),
         )
         return pdf_bytes
     except ValueError as e:
-        logger.error(f"Erro de validação ao gerar PDF detalhado: {e}")
+        logger.error("Erro de validação ao gerar PDF detalhado: %s", e)
         raise
     except Exception as e:
         logger.error(
-            f"Erro inesperado ao gerar PDF detalhado - "
-            f"Município: {municipio_nome}/{uf}, Competência: {competencia}: {e}",
+            "Erro inesperado ao gerar PDF detalhado - Município: %s/%s, Competência: %s: %s",
+            municipio_nome, uf, competencia, e,
             exc_info=True
         )
         raise
+
+
+def compute_regional_summary(municipios: Iterable[ResumoMunicipioRegional]) -> ResumoFinanceiro:
+    """Soma os resumos dos municípios; o percentual é recalculado sobre o total da região."""
+    total_perda_mensal = 0.0
+    total_recebido = 0.0
+    for item in municipios:
+        total_perda_mensal += item.resumo.total_perda_mensal
+        total_recebido += item.resumo.total_recebido
+
+    total_diferenca_anual = total_perda_mensal * 12.0
+    total_real_anual = total_recebido * 12.0
+    percentual = (total_diferenca_anual / total_real_anual * 100.0) if total_real_anual else 0.0
+
+    return ResumoFinanceiro(
+        total_perda_mensal=total_perda_mensal,
+        total_diferenca_anual=total_diferenca_anual,
+        percentual_perda_anual=percentual,
+        total_recebido=total_recebido,
+    )
+
+
+def _rank_regional(municipios: Iterable[ResumoMunicipioRegional]) -> List[ResumoMunicipioRegional]:
+    """Maior perda percentual primeiro; empate pela perda absoluta e depois pelo nome."""
+    return sorted(
+        municipios,
+        key=lambda item: (
+            -item.resumo.percentual_perda_anual,
+            -item.resumo.total_perda_mensal,
+            item.municipio_nome or item.codigo_ibge,
+        ),
+    )
+
+
+def _municipio_label(item: ResumoMunicipioRegional) -> str:
+    label = item.municipio_nome or item.codigo_ibge
+    if item.uf:
+        label = f"{label}/{item.uf.upper()}"
+    return html.escape(label)
+
+
+def _gerar_html_ranking_regional(
+    ranking: List[ResumoMunicipioRegional],
+    total: ResumoFinanceiro,
+) -> str:
+    """Tabela do ranking regional com linha de total."""
+    linhas = []
+    for posicao, item in enumerate(ranking, start=1):
+        resumo = item.resumo
+        participacao = _safe_ratio(resumo.total_perda_mensal, total.total_perda_mensal) * 100
+        linhas.append(
+            '<tr>'
+            f'<td>{posicao}º</td>'
+            f'<td>{_municipio_label(item)}</td>'
+            f'<td class="num">R$ {_br_number(resumo.total_recebido, 0)}</td>'
+            f'<td class="num">R$ {_br_number(resumo.total_perda_mensal, 0)}</td>'
+            f'<td class="num">R$ {_br_number(resumo.total_diferenca_anual, 0)}</td>'
+            f'<td class="num">{_br_number(resumo.percentual_perda_anual)}%</td>'
+            f'<td class="num">{_br_number(participacao, 1)}%</td>'
+            '</tr>'
+        )
+
+    return (
+        '<table class="ranking-table">'
+        '<thead><tr>'
+        '<th>#</th><th>Município</th>'
+        '<th class="num">Recebido/mês</th><th class="num">Perda/mês</th>'
+        '<th class="num">Perda anual</th><th class="num">Perda anual (%)</th>'
+        '<th class="num">Part. na perda</th>'
+        '</tr></thead>'
+        f'<tbody>{"".join(linhas)}</tbody>'
+        '<tfoot><tr>'
+        '<td></td><td>Total da região</td>'
+        f'<td class="num">R$ {_br_number(total.total_recebido, 0)}</td>'
+        f'<td class="num">R$ {_br_number(total.total_perda_mensal, 0)}</td>'
+        f'<td class="num">R$ {_br_number(total.total_diferenca_anual, 0)}</td>'
+        f'<td class="num">{_br_number(total.percentual_perda_anual)}%</td>'
+        '<td class="num">100,0%</td>'
+        '</tr></tfoot>'
+        '</table>'
+    )
+
+
+def _gerar_html_pagina_municipio_regional(
+    posicao: int,
+    total_municipios: int,
+    item: ResumoMunicipioRegional,
+    total: ResumoFinanceiro,
+) -> str:
+    """Página de resumo de um município (reaproveita os cards do relatório padrão)."""
+    resumo = item.resumo
+    recurso_potencial_mensal = resumo.total_recebido + resumo.total_perda_mensal
+    ratio_perda = _safe_ratio(resumo.total_perda_mensal, recurso_potencial_mensal)
+    ratio_recebido = _safe_ratio(resumo.total_recebido, recurso_potencial_mensal)
+    participacao = _safe_ratio(resumo.total_perda_mensal, total.total_perda_mensal) * 100
+    comparacao = "acima" if resumo.percentual_perda_anual > total.percentual_perda_anual else "abaixo"
+    if resumo.percentual_perda_anual == total.percentual_perda_anual:
+        comparacao = "igual"
+
+    return (
+        '<div class="page" style="page-break-before: always;">'
+        '<div class="report-header">'
+        f'<h1 class="report-title">{_municipio_label(item)}</h1>'
+        f'<p class="regional-subtitle">{posicao}º de {total_municipios} no ranking regional de perda anual</p>'
+        '</div>'
+        '<div class="financial-cards">'
+        '<div class="financial-card danger">'
+        '<div class="card-header"><div class="card-icon">⚠</div>'
+        '<div><h3 class="card-title">Perda Mensal Estimada</h3></div></div>'
+        f'<div class="card-value">R$ {_br_number(resumo.total_perda_mensal, 0)}</div>'
+        '<div class="card-progress">'
+        f'<div class="card-progress-bar" style="width: {_progress_value(ratio_perda)}%;"></div>'
+        '</div>'
+        f'<div class="card-indicator">{int(round(ratio_perda * 100))}% do potencial mensal</div>'
+        '</div>'
+        '<div class="financial-card warning">'
+        '<div class="card-header"><div class="card-icon">📊</div>'
+        '<div><h3 class="card-title">Impacto Anual Total</h3></div></div>'
+        f'<div class="card-value">R$ {_br_number(resumo.total_diferenca_anual, 0)}</div>'
+        f'<div class="card-indicator">{_br_number(resumo.percentual_perda_anual)}% do orçamento anual</div>'
+        '</div>'
+        '<div class="financial-card success">'
+        '<div class="card-header"><div class="card-icon">💰</div>'
+        '<div><h3 class="card-title">Recurso Atual Mensal</h3></div></div>'
+        f'<div class="card-value">R$ {_br_number(resumo.total_recebido, 0)}</div>'
+        '<div class="card-progress">'
+        f'<div class="card-progress-bar" style="width: {_progress_value(ratio_recebido)}%;"></div>'
+        '</div>'
+        f'<div class="card-indicator">Cobertura atual de {int(round(ratio_recebido * 100))}%</div>'
+        '</div>'
+        '</div>'
+        '<div class="regional-comparison">'
+        f'<p>Perda anual de <strong>{_br_number(resumo.percentual_perda_anual)}%</strong>, '
+        f'{comparacao} da média regional ({_br_number(total.percentual_perda_anual)}%).</p>'
+        f'<p>Responde por <strong>{_br_number(participacao, 1)}%</strong> da perda mensal da região.</p>'
+        f'<p>Recurso potencial mensal: R$ {_br_number(recurso_potencial_mensal, 0)}.</p>'
+        '</div>'
+        '</div>'
+    )
+
+
+def _build_regional_html_report(
+    *,
+    regiao_nome: str,
+    competencia: str,
+    municipios: List[ResumoMunicipioRegional],
+    sem_dados: Optional[List[str]] = None,
+) -> str:
+    """Monta o HTML do relatório regional (``relatorio_regional.html``) em uma única passada.
+
+    CSS e timbrado entram uma única vez no ``<style>``; as páginas dos municípios só
+    referenciam as classes, então o documento cresce apenas com o conteúdo de cada página.
+    """
+    template = load_template("relatorio_regional.html")
+    total = compute_regional_summary(municipios)
+    ranking = _rank_regional(municipios)
+
+    paginas = [
+        _gerar_html_pagina_municipio_regional(posicao, len(ranking), item, total)
+        for posicao, item in enumerate(ranking, start=1)
+    ]
+
+    sem_dados_html = ""
+    if sem_dados:
+        sem_dados_html = (
+            '<p class="regional-missing">Sem dados de financiamento na competência: '
+            f'{html.escape(", ".join(sem_dados))}.</p>'
+        )
+
+    return template.render({
+        'regiao_nome': html.escape(regiao_nome),
+        'competencia': html.escape(competencia),
+        'total_municipios': str(len(ranking)),
+        'css_content': load_inline_css(),
+        'percentual_perda_anual': f"{total.percentual_perda_anual:.2f}",
+        'total_perda_mensal': _br_number(total.total_perda_mensal, 0),
+        'total_diferenca_anual': _br_number(total.total_diferenca_anual, 0),
+        'total_recebido': _br_number(total.total_recebido, 0),
+        'ranking_content': _gerar_html_ranking_regional(ranking, total),
+        'sem_dados_content': sem_dados_html,
+        'municipios_content': "".join(paginas),
+    })
+
+
+def create_regional_pdf_report(
+    *,
+    regiao_nome: str,
+    competencia: str,
+    municipios: List[ResumoMunicipioRegional],
+    sem_dados: Optional[List[str]] = None,
+) -> bytes:
+    """Cria o relatório regional: consolidado, ranking e uma página por município."""
+    if not municipios:
+        raise ValueError("Relatório regional sem municípios com dados")
+
+    html_content = _build_regional_html_report(
+        regiao_nome=regiao_nome,
+        competencia=competencia,
+        municipios=municipios,
+        sem_dados=sem_dados,
+    )
+    pdf_bytes = _render_pdf(html_content)
+    logger.info(
+        "PDF regional gerado - Região: %s, Municípios: %d, Tamanho: %d bytes",
+        regiao_nome, len(municipios), len(pdf_bytes),
+    )
+    return pdf_bytes
+
+
+def _warm_render_worker() -> None:
+    """Inicializador dos workers do pool: compila templates, monta o CSS e carrega fontes."""
+    try:
+        load_template("relatorio_base.html")
+        load_template("relatorio_detalhado.html")
+        load_template("relatorio_regional.html")
+        css_content = load_inline_css()
+        # Uma renderização mínima com o CSS real carrega fontconfig/Pango e o timbrado
+        _render_pdf(f"<html><head><style>{css_content}</style></head><body><p>.</p></body></html>")
+    except Exception as exc:
+        logger.warning("Falha ao aquecer worker de renderização de PDF: %s", exc)
+
+
+pdf_render_pool = PdfRenderPool(
+    workers=settings.PDF_RENDER_WORKERS,
+    max_queue=settings.PDF_RENDER_MAX_QUEUE,
+    use_processes=settings.PDF_RENDER_USE_PROCESSES,
+    initializer=_warm_render_worker,
+)
+
+
+async def create_pdf_report_async(**kwargs: Any) -> bytes:
+    """``create_pdf_report`` executado no pool de renderização (não bloqueia o event loop).
+
+    Raises:
+        PdfRenderPoolSaturated: fila de renderização cheia.
+    """
+    return await pdf_render_pool.run(create_pdf_report, **kwargs)
+
+
+async def create_detailed_pdf_report_async(**kwargs: Any) -> bytes:
+    """``create_detailed_pdf_report`` executado no pool de renderização.
+
+    Raises:
+        PdfRenderPoolSaturated: fila de renderização cheia.
+    """
+    return await pdf_render_pool.run(create_detailed_pdf_report, **kwargs)
+
+
+async def create_regional_pdf_report_async(**kwargs: Any) -> bytes:
+    """``create_regional_pdf_report`` executado no pool de renderização.
+
+    Raises:
+        PdfRenderPoolSaturated: fila de renderização cheia.
+    """
+    return await pdf_render_pool.run(create_regional_pdf_report, **kwargs)
+
+
+_REPORT_BUILDERS = {
+    "padrao": create_pdf_report,
+    "detalhado": create_detailed_pdf_report,
+    "regional": create_regional_pdf_report,
+}
+
+
+def report_cache_key(kind: str, codigo_ibge: str, render_kwargs: Dict[str, Any]) -> str:
+    """Chave do cache de PDFs: tudo que influencia o relatório ``kind``.
+
+    Dos pagamentos só o primeiro é usado na montagem do relatório detalhado, então só
+    ele entra na chave (o restante do payload não invalida o cache).
+    """
+    parts = dict(render_kwargs)
+    if isinstance(parts.get("resumo"), ResumoFinanceiro):
+        parts["resumo"] = parts["resumo"].model_dump()
+    if parts.get("municipios"):
+        parts["municipios"] = [item.model_dump() for item in parts["municipios"]]
+    if parts.get("pagamentos"):
+        parts["pagamentos"] = parts["pagamentos"][:1]
+    return cache_key(
+        template_version=template_version(),
+        layout_version=REPORT_LAYOUT_VERSION,
+        kind=kind,
+        codigo_ibge=codigo_ibge,
+        **parts,
+    )
+
+
+def _build_timed(kind: str, **render_kwargs: Any) -> Tuple[bytes, float, float]:
+    """Roda no worker do pool: ``(pdf, segundos montando o HTML, segundos no WeasyPrint)``."""
+    _render_clock.seconds = 0.0
+    started = time.perf_counter()
+    pdf_bytes = _REPORT_BUILDERS[kind](**render_kwargs)
+    total = time.perf_counter() - started
+    return pdf_bytes, total - _render_clock.seconds, _render_clock.seconds
+
+
+async def render_report(kind: str, key: str, render_kwargs: Dict[str, Any]) -> tuple[bytes, bool]:
+    """Devolve ``(pdf, veio_do_cache)``; renderiza no pool e grava no cache se preciso.
+
+    Registra as fases ``cache``, ``fila``, ``html`` e ``pdf`` no Server-Timing. O cache
+    em disco é lido e gravado numa thread, fora do event loop.
+
+    Raises:
+        PdfRenderPoolSaturated: fila de renderização cheia.
+    """
+    with fase("cache", "Cache de PDF"):
+        cached = await asyncio.to_thread(pdf_cache.get, key)
+    if cached is not None:
+        return cached, True
+    started = time.perf_counter()
+    pdf_bytes, html_seconds, pdf_seconds = await pdf_render_pool.run(_build_timed, kind, **render_kwargs)
+    fila = max(0.0, time.perf_counter() - started - html_seconds - pdf_seconds)
+    registrar_fase("fila", fila, "Espera e transferência no pool")
+    registrar_fase("html", html_seconds, "Montagem do HTML")
+    registrar_fase("pdf", pdf_seconds, "Renderização WeasyPrint")
+    with fase("cache_put", "Gravação no cache"):
+        await asyncio.to_thread(pdf_cache.put, key, pdf_bytes)
+    return pdf_bytes, False
@@ -0,0 +1,142 @@
+"""Templates HTML dos relatórios compilados em segmentos (texto literal + slots nomeados).
+
+Os templates em ``backend/templates`` usam dois estilos de marcador, herdados da versão
+que fazia ``str.replace`` em sequência: ``{{ expressao }}`` e ``__NOME__``. Cada template é
+compilado uma única vez em uma lista de segmentos; a renderização é um único ``join``,
+em vez de copiar o documento inteiro (CSS + timbrado em base64) a cada substituição.
+
+Nomes dos slots:
+- ``{{ nome }}`` → ``nome``;
+- ``__NOME__`` → ``nome`` (minúsculo);
+- expressões legadas estilo Jinja (``{{ "{:,.0f}".format(...) }}``) → nome curto em
+  ``_EXPRESSION_SLOTS``. Expressão desconhecida é erro de compilação.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Mapping, Tuple
+
+TEMPLATES_ROOT = Path(__file__).resolve().parents[2] / "templates"
+
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*(.+?)\s*\}\}|__([A-Z][A-Z0-9_]*?)__")
+_IDENTIFIER_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+# Expressões "Jinja" dos templates (nunca avaliadas) → nome do slot.
+_EXPRESSION_SLOTS: Dict[str, str] = {
+    '"%.2f"|format(resumo.percentual_perda_anual)': "percentual_perda_anual",
+    '"{:,.0f}".format(resumo.total_perda_mensal).replace(\',\', \'.\')': "total_perda_mensal",
+    '"{:,.0f}".format(resumo.total_diferenca_anual).replace(\',\', \'.\')': "total_diferenca_anual",
+    '"{:,.0f}".format(resumo.total_recebido).replace(\',\', \'.\')': "total_recebido",
+    '"{:,.0f}".format(resumo.total_recebido * 12).replace(\',\', \'.\')': "recurso_atual_anual",
+    '"{:,.0f}".format((resumo.total_recebido * 12) + resumo.total_diferenca_anual).replace(\',\', \'.\')':
+        "recurso_potencial_anual",
+    '"{:,.0f}".format(resumo.total_recebido + resumo.total_perda_mensal).replace(\',\', \'.\')':
+        "recurso_potencial_mensal",
+}
+
+
+class TemplateError(Exception):
+    """Template inválido ou renderizado com slots faltando/desconhecidos."""
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """Template pré-compilado: ``literals`` tem sempre ``len(slots) + 1`` itens."""
+
+    name: str
+    literals: Tuple[str, ...]
+    slots: Tuple[str, ...]
+
+    @property
+    def slot_names(self) -> FrozenSet[str]:
+        return frozenset(self.slots)
+
+    def render(self, values: Mapping[str, str]) -> str:
+        """Renderiza em uma única passada. Todos os slots devem ser preenchidos, e só eles."""
+        names = self.slot_names
+        missing = names.difference(values)
+        if missing:
+            raise TemplateError(
+                f"Template {self.name}: slots sem valor: {', '.join(sorted(missing))}"
+            )
+        unknown = set(values).difference(names)
+        if unknown:
+            raise TemplateError(
+                f"Template {self.name}: valores para slots inexistentes: {', '.join(sorted(unknown))}"
+            )
+
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            parts.append(values[slot])
+            parts.append(literal)
+        return "".join(parts)
+
+
+def _slot_name(match: re.Match) -> str:
+    expression, marker = match.group(1), match.group(2)
+    if marker is not None:
+        return marker.lower()
+    if _IDENTIFIER_RE.match(expression):
+        return expression
+    if expression in _EXPRESSION_SLOTS:
+        return _EXPRESSION_SLOTS[expression]
+    raise TemplateError(f"Placeholder desconhecido: {{{{ {expression} }}}}")
+
+
+def compile_template(source: str, name: str = "<string>") -> CompiledTemplate:
+    """Divide o texto do template em literais e slots."""
+    literals = []
+    slots = []
+    pos = 0
+    for match in _PLACEHOLDER_RE.finditer(source):
+        try:
+            slot = _slot_name(match)
+        except TemplateError as exc:
+            raise TemplateError(f"Template {name}: {exc}") from None
+        literals.append(source[pos:match.start()])
+        slots.append(slot)
+        pos = match.end()
+    literals.append(source[pos:])
+    return CompiledTemplate(name=name, literals=tuple(literals), slots=tuple(slots))
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> CompiledTemplate:
+    """Lê e compila ``templates/<name>`` (uma vez por processo)."""
+    template_path = TEMPLATES_ROOT / name
+    if not template_path.exists():
+        raise FileNotFoundError(f"Template HTML não encontrado: {template_path}")
+    return compile_template(template_path.read_text(encoding="utf-8"), name=name)
+
+
+@lru_cache(maxsize=None)
+def load_inline_css() -> str:
+    """CSS dos relatórios com o timbrado embutido como data URI (uma vez por processo)."""
+    css_path = TEMPLATES_ROOT / "css" / "modern-cards.css"
+    css_content = ""
+    if css_path.exists():
+        css_content = css_path.read_text(encoding="utf-8")
+
+    img_path = TEMPLATES_ROOT / "images" / "Imagem Timbrado.png"
+    if img_path.exists():
+        img_base64 = base64.b64encode(img_path.read_bytes()).decode("utf-8")
+        css_content = css_content.replace(
+            "url('../images/Imagem Timbrado.png')",
+            f"url('data:image/png;base64,{img_base64}')"
+        )
+    return css_content
+
+
+@lru_cache(maxsize=None)
+def template_version() -> str:
+    """Hash dos arquivos de ``templates/`` (HTML, CSS, imagens); muda a cada alteração."""
+    digest = hashlib.sha256()
+    for path in sorted(p for p in TEMPLATES_ROOT.rglob("*") if p.is_file()):
+        digest.update(path.relative_to(TEMPLATES_ROOT).as_posix().encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
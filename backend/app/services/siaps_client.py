@@ -22,6 +22,7 @@ from typing import Any, Dict, List, Optional
 import httpx
 
 from app.core.config import settings
+from app.core.metrics import cache_lookup, upstream_transport
 from app.core.siaps_reference import quadrimestre_aplicavel
 from app.utils.logger import logger
 
@@ -161,12 +162,15 @@ class SiapsAPIClient:
         cache_path = self._cache_path(ibge6, quads)
         if not force_refresh:
             cached = self._ler_cache(cache_path)
+            cache_lookup("siaps", hit=cached is not None)
             if cached is not None:
                 logger.info("SIAPS cache hit: %s", cache_path)
                 return cached
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout, headers=_HEADERS) as client:
+            async with httpx.AsyncClient(
+                timeout=self.timeout, headers=_HEADERS, transport=upstream_transport("siaps")
+            ) as client:
                 disponiveis = await self._quadrimestres_validos(client)
                 ausentes = [q for q in quads if q not in disponiveis]
                 if ausentes:
@@ -1,13 +1,14 @@
 """
 Serviço para gerenciamento de usuários usando SQLAlchemy async
 """
-from typing import Optional, List
+from typing import Callable, Dict, Optional, List
 from datetime import datetime
 from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, password_hasher
+from app.core.token_claims import user_version, user_version_cache
 from app.models.schemas import User, UserCreate, UserUpdate
 from app.models.db_models import UserDB
 from app.utils.logger import logger
@@ -16,6 +17,14 @@ from app.utils.logger import logger
 # (mitiga enumeração de usuários por timing no login)
 _DUMMY_PASSWORD_HASH = get_password_hash("invalid-timing-equalizer")
 
+# Chamados com o id de cada usuário alterado (ex.: invalidar caches de User)
+_user_change_listeners: List[Callable[[str], None]] = []
+
+
+def on_user_changed(listener: Callable[[str], None]) -> None:
+    """Registra um callback para toda alteração de usuário feita por este processo."""
+    _user_change_listeners.append(listener)
+
 
 class UserService:
     """Serviço para operações de usuários"""
@@ -32,6 +41,11 @@ class UserService:
             return None
         return self._row_to_user(row)
 
+    async def get_user_versions(self) -> Dict[str, int]:
+        """Versão (``updated_at``) de todos os usuários, para ``user_version_cache``."""
+        result = await self.session.execute(select(UserDB.id, UserDB.updated_at))
+        return {user_id: user_version(updated_at) for user_id, updated_at in result.all()}
+
     async def get_user_by_email(self, email: str) -> Optional[User]:
         result = await self.session.execute(
             select(UserDB).where(UserDB.email == email.lower())
@@ -49,7 +63,7 @@ class UserService:
                 detail="Email já cadastrado"
             )
 
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         now = datetime.utcnow()
 
         row = UserDB(
@@ -66,7 +80,7 @@ class UserService:
         await self.session.commit()
         await self.session.refresh(row)
 
-        logger.info(f"Usuário criado com sucesso: {row.id}")
+        logger.info("Usuário criado com sucesso: %s", row.id)
         return self._row_to_user(row)
 
     async def update_user(self, user_id: str, user_data: UserUpdate) -> User:
@@ -101,9 +115,10 @@ class UserService:
         row.updated_at = datetime.utcnow()
 
         await self.session.commit()
+        self._usuario_alterado(row)
         await self.session.refresh(row)
 
-        logger.info(f"Usuário atualizado com sucesso: {user_id}")
+        logger.info("Usuário atualizado com sucesso: %s", user_id)
         return self._row_to_user(row)
 
     async def update_password(
@@ -122,17 +137,18 @@ class UserService:
                 detail="Usuário não encontrado"
             )
 
-        if not verify_password(current_password, row.hashed_password):
+        if not await password_hasher.verify(current_password, row.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Senha atual incorreta"
             )
 
-        row.hashed_password = get_password_hash(new_password)
+        row.hashed_password = await password_hasher.hash(new_password)
         row.updated_at = datetime.utcnow()
         await self.session.commit()
+        self._usuario_alterado(row)
 
-        logger.info(f"Senha atualizada com sucesso para usuário: {user_id}")
+        logger.info("Senha atualizada com sucesso para usuário: %s", user_id)
         return True
 
     async def authenticate_user(self, email: str, password: str) -> Optional[User]:
@@ -142,10 +158,10 @@ class UserService:
         row = result.scalar_one_or_none()
         if not row:
             # Verificação dummy em tempo ~constante (evita enumeração por timing)
-            verify_password(password, _DUMMY_PASSWORD_HASH)
+            await password_hasher.verify(password, _DUMMY_PASSWORD_HASH)
             return None
 
-        if not verify_password(password, row.hashed_password):
+        if not await password_hasher.verify(password, row.hashed_password):
             return None
 
         user = self._row_to_user(row)
@@ -172,10 +188,11 @@ class UserService:
         row.is_authorized = is_authorized
         row.updated_at = datetime.utcnow()
         await self.session.commit()
+        self._usuario_alterado(row)
         await self.session.refresh(row)
 
         action = "autorizado" if is_authorized else "revogado"
-        logger.info(f"Usuário {action}: {row.email}")
+        logger.info("Usuário %s: %s", action, row.email)
         return self._row_to_user(row)
 
     async def set_superuser(self, user_id: str, is_superuser: bool) -> User:
@@ -192,10 +209,11 @@ class UserService:
         row.is_superuser = is_superuser
         row.updated_at = datetime.utcnow()
         await self.session.commit()
+        self._usuario_alterado(row)
         await self.session.refresh(row)
 
         action = "promovido a superusuário" if is_superuser else "removido de superusuário"
-        logger.info(f"Usuário {action}: {row.email}")
+        logger.info("Usuário %s: %s", action, row.email)
         return self._row_to_user(row)
 
     async def list_pending_users(self) -> List[User]:
@@ -219,8 +237,9 @@ class UserService:
         row.is_active = False
         row.updated_at = datetime.utcnow()
         await self.session.commit()
+        self._usuario_alterado(row)
 
-        logger.info(f"Usuário desativado com sucesso: {user_id}")
+        logger.info("Usuário desativado com sucesso: %s", user_id)
         return True
 
     async def list_users(
@@ -248,6 +267,12 @@ class UserService:
         rows = result.scalars().all()
         return [self._row_to_user(r) for r in rows]
 
+    @staticmethod
+    def _usuario_alterado(row: UserDB) -> None:
+        user_version_cache.atualizar(row.id, row.updated_at)
+        for listener in _user_change_listeners:
+            listener(row.id)
+
     @staticmethod
     def _row_to_user(row: UserDB) -> User:
         return User(
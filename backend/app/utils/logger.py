@@ -1,14 +1,171 @@
 """
 Configuração de logging para a aplicação
+
+Os registros não são escritos na thread que loga: um ``QueueHandler`` põe o registro
+numa fila limitada e um ``QueueListener`` (thread própria) formata e escreve no stdout.
+Um stdout lento (container, coletor de logs) não trava o event loop; com a fila cheia
+os registros são descartados e a contagem é logada quando houver espaço.
+
+- ``LOG_FORMAT``: ``json`` (um objeto por linha) ou ``text`` (formato antigo);
+- ``LOG_LEVEL`` e ``LOG_MODULE_LEVELS`` (``"relatorio_pdf=WARNING,siaps_client=DEBUG"``,
+  pelo nome do arquivo que loga);
+- amostragem: cada linha de código que loga INFO/DEBUG emite até ``LOG_SAMPLING_BURST``
+  registros por janela de ``LOG_SAMPLING_WINDOW_SECONDS``; acima disso, 1 a cada
+  ``LOG_SAMPLING_RATE`` (o campo ``suprimidas`` informa quantos ficaram de fora).
+  WARNING e acima nunca são amostrados.
+
+Use formatação preguiçosa (``logger.info("x=%s", x)``): registros filtrados por nível ou
+amostragem nem chegam a montar a mensagem.
 """
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
-from typing import Optional
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, TextIO, Tuple
+
+from app.core.config import settings
+
+# Atributos padrão de LogRecord; o resto veio de ``extra=`` e vai para o JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha: ts, level, logger, module, func, line, msg e extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "func": record.funcName,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            dados["exc"] = record.exc_text
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith("_"):
+                dados[chave] = valor
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+def parse_module_levels(valor: str) -> Dict[str, int]:
+    """``"relatorio_pdf=WARNING, api_client=DEBUG"`` → ``{"relatorio_pdf": 30, "api_client": 10}``."""
+    niveis = {}
+    for item in (valor or "").split(","):
+        if "=" not in item:
+            continue
+        modulo, nivel = (parte.strip() for parte in item.split("=", 1))
+        niveis[modulo] = logging.getLevelName(nivel.upper())
+    return {modulo: nivel for modulo, nivel in niveis.items() if isinstance(nivel, int)}
+
+
+class ModuleLevelFilter(logging.Filter):
+    """Nível mínimo por módulo (nome do arquivo), com ``padrao`` para os demais."""
+
+    def __init__(self, padrao: int, por_modulo: Dict[str, int]):
+        super().__init__()
+        self.padrao = padrao
+        self.por_modulo = por_modulo
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.por_modulo.get(record.module, self.padrao)
+
+
+class LogSampler(logging.Filter):
+    """Amostragem por linha de código para registros abaixo de WARNING."""
+
+    def __init__(self, burst: int, janela: float, taxa: int, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.janela = janela
+        self.taxa = max(1, taxa)
+        self._clock = clock
+        # (arquivo, linha) → [início da janela, registros na janela, suprimidos desde o último]
+        self._contagem: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        agora = self._clock()
+        with self._lock:
+            estado = self._contagem.get((record.pathname, record.lineno))
+            if estado is None or agora - estado[0] >= self.janela:
+                suprimidos = estado[2] if estado else 0
+                estado = self._contagem[(record.pathname, record.lineno)] = [agora, 0, suprimidos]
+            estado[1] += 1
+            excedente = estado[1] - self.burst
+            if excedente > 0 and excedente % self.taxa != 0:
+                estado[2] += 1
+                return False
+            if estado[2]:
+                record.suprimidas = estado[2]
+                estado[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enfileira sem bloquear; só a mensagem é montada aqui, o resto na thread do listener."""
+
+    def __init__(self, fila: queue.Queue):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Ao contrário do QueueHandler padrão, não chama o formatter (JSON, datas): só
+        # fixa a mensagem e o traceback, que podem mudar depois que a chamada retorna.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.descartados:
+                aviso = logging.LogRecord(
+                    record.name, logging.WARNING, __file__, 0,
+                    "%d registro(s) de log descartado(s): fila cheia", (self.descartados,), None,
+                )
+                self.queue.put_nowait(aviso)
+                self.descartados = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """``stop`` idempotente e que espera vaga para o sentinela (a fila pode estar cheia)."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            super().stop()
+
 
 def setup_logger(
     name: str = "papprefeito",
     level: str = "INFO",
-    format_string: Optional[str] = None
+    format_string: Optional[str] = None,
+    log_format: str = "text",
+    module_levels: Optional[Dict[str, int]] = None,
+    sampler: Optional[LogSampler] = None,
+    queue_size: int = 10000,
+    stream: Optional[TextIO] = None,
 ) -> logging.Logger:
     """
     Configura e retorna um logger
@@ -16,10 +173,15 @@ def setup_logger(
     Args:
         name: Nome do logger
         level: Nível de log (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-        format_string: Formato personalizado das mensagens
+        format_string: Formato personalizado das mensagens (``log_format="text"``)
+        log_format: ``json`` ou ``text``
+        module_levels: Nível por módulo (sobrepõe ``level``)
+        sampler: Amostragem dos registros de alto volume
+        queue_size: Tamanho da fila entre a aplicação e a escrita
+        stream: Destino (padrão: stdout)
 
     Returns:
-        logging.Logger: Logger configurado
+        logging.Logger: Logger configurado (``logger.listener`` escreve os registros)
     """
     if format_string is None:
         format_string = (
@@ -28,21 +190,46 @@ def setup_logger(
         )
 
     # Configurar formatter
-    formatter = logging.Formatter(format_string)
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter(format_string)
 
-    # Configurar handler para console
-    console_handler = logging.StreamHandler(sys.stdout)
+    # Handler que de fato escreve, na thread do listener
+    console_handler = logging.StreamHandler(stream or sys.stdout)
     console_handler.setFormatter(formatter)
 
-    # Configurar logger
+    padrao = getattr(logging, level.upper())
+    module_levels = module_levels or {}
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    if module_levels:
+        queue_handler.addFilter(ModuleLevelFilter(padrao, module_levels))
+    if sampler is not None:
+        queue_handler.addFilter(sampler)
+
+    # Configurar logger (nível mais baixo entre o padrão e os por módulo; o filtro refina)
     logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, level.upper()))
-    logger.addHandler(console_handler)
+    if getattr(logger, "listener", None) is not None:
+        logger.listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(min([padrao, *module_levels.values()]))
+    logger.addHandler(queue_handler)
 
     # Evitar duplicação de logs
     logger.propagate = False
 
+    listener = _QueueListener(queue_handler.queue, console_handler)
+    listener.start()
+    atexit.register(listener.stop)  # esvazia a fila ao encerrar
+    logger.listener = listener
+
     return logger
 
 # Logger global da aplicação
-logger = setup_logger()
\ No newline at end of file
+logger = setup_logger(
+    level=settings.LOG_LEVEL,
+    log_format=settings.LOG_FORMAT,
+    module_levels=parse_module_levels(settings.LOG_MODULE_LEVELS),
+    sampler=LogSampler(
+        settings.LOG_SAMPLING_BURST, settings.LOG_SAMPLING_WINDOW_SECONDS, settings.LOG_SAMPLING_RATE
+    ) if settings.LOG_SAMPLING_ENABLED else None,
+    queue_size=settings.LOG_QUEUE_SIZE,
+)
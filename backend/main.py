@@ -6,12 +6,21 @@ from typing import List
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import uvicorn
 
 from app.api.router import api_router
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import close_db, init_db
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.core.rate_limit import login_rate_limiter
+from app.core.profiler import ProfilerMiddleware, profiler
+from app.core.security import password_hasher
+from app.core.server_timing import ServerTimingMiddleware
+from app.services.municipios import municipio_service
+from app.services.municipios_editados import municipio_editado_service
+from app.services.relatorio_jobs import relatorio_job_queue
+from app.services.relatorio_pdf import pdf_render_pool
 from app.utils.logger import logger
 
 
@@ -32,7 +41,19 @@ DEFAULT_CORS_ORIGINS = {
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    municipio_service.carregar_indice()
+    municipio_editado_service.init()
+    password_hasher.start()
+    pdf_render_pool.start()
+    relatorio_job_queue.start()
     yield
+    await relatorio_job_queue.stop()
+    profiler.parar()
+    pdf_render_pool.shutdown()
+    municipio_editado_service.close()
+    password_hasher.shutdown()
+    await login_rate_limiter.close()
+    await close_db()
 
 
 # Docs/OpenAPI expostos apenas fora de produção (DEBUG)
@@ -55,8 +76,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "X-Cache", "Location"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    registry.gauge(
+        "pdf_render_in_flight", "Renderizações de PDF em execução ou na fila.",
+        lambda: pdf_render_pool.in_flight,
+    )
+    registry.gauge(
+        "password_hash_in_flight", "Operações de bcrypt em execução ou na fila.",
+        lambda: password_hasher.in_flight,
+    )
+
+if settings.PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware, log_spans=settings.SERVER_TIMING_LOG_SPANS)
+
 # Incluir routers da API
 app.include_router(api_router, prefix="/api")
 
@@ -74,6 +113,13 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato texto do Prometheus"""
+    if not settings.METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
 # Exception handlers
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark de rajada de logins: bcrypt no event loop x no pool de hash
+
+Dispara N verificações de senha simultâneas e mede, ao mesmo tempo, o atraso de um
+"relógio" de 10 ms no event loop (o que as outras requisições do worker sentiriam).
+
+Uso:
+    python backend/scripts/bench_login_burst.py [--logins 20] [--workers 4]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Adicionar diretório raiz ao path
+root_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(root_dir / "backend"))
+
+from app.core.security import PasswordHasher, get_password_hash, verify_password  # noqa: E402
+
+TICK = 0.01
+
+
+async def _medir(nome: str, verificar, logins: int) -> None:
+    atrasos = []
+    parar = asyncio.Event()
+
+    async def relogio():
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            await asyncio.sleep(TICK)
+            atrasos.append(time.perf_counter() - inicio - TICK)
+
+    tarefa = asyncio.create_task(relogio())
+    await asyncio.sleep(TICK * 3)
+    inicio = time.perf_counter()
+    latencias = await asyncio.gather(*(verificar() for _ in range(logins)))
+    total = time.perf_counter() - inicio
+    parar.set()
+    await tarefa
+
+    print(
+        f"{nome:<14} total {total * 1000:8.0f} ms | login p50 {statistics.median(latencias) * 1000:7.0f} ms"
+        f" máx {max(latencias) * 1000:7.0f} ms | atraso do event loop máx {max(atrasos) * 1000:7.0f} ms"
+        f" p50 {statistics.median(atrasos) * 1000:5.1f} ms"
+    )
+
+
+async def main(logins: int, workers: int) -> None:
+    hashed = get_password_hash("Senha123")
+    hasher = PasswordHasher(workers=workers, max_queue=logins)
+
+    async def no_event_loop():
+        inicio = time.perf_counter()
+        verify_password("Senha123", hashed)
+        return time.perf_counter() - inicio
+
+    async def no_pool():
+        inicio = time.perf_counter()
+        await hasher.verify("Senha123", hashed)
+        return time.perf_counter() - inicio
+
+    print(f"{logins} logins simultâneos, pool com {workers} thread(s)")
+    await _medir("event loop", no_event_loop, logins)
+    await _medir("pool", no_pool, logins)
+    print(hasher.metrics())
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.workers))
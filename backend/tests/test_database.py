@@ -0,0 +1,60 @@
+"""Testes do perfil de PRAGMAs e do pool do SQLite."""
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+
+from app.core.database import check_sqlite_pragmas, create_sqlite_engine
+
+
+def test_perfil_aplicado_em_arquivo(tmp_path):
+    async def cenario():
+        engine = create_sqlite_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+        efetivas = await check_sqlite_pragmas(engine)
+        async with engine.connect() as conn:
+            conexao = await conn.get_raw_connection()
+        async with engine.connect() as conn:
+            reaproveitada = await conn.get_raw_connection()
+        await engine.dispose()
+        return engine, efetivas, conexao.driver_connection is reaproveitada.driver_connection
+
+    engine, efetivas, reaproveitou = asyncio.run(cenario())
+    assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+    assert reaproveitou
+    assert efetivas["journal_mode"] == "wal"
+    assert efetivas["synchronous"] == 1
+    assert efetivas["busy_timeout"] == 5000
+    assert efetivas["cache_size"] == -16384
+    assert efetivas["temp_store"] == 2
+
+
+def test_memoria_usa_static_pool():
+    async def cenario():
+        engine = create_sqlite_engine("sqlite+aiosqlite:///:memory:")
+        efetivas = await check_sqlite_pragmas(engine)
+        await engine.dispose()
+        return engine, efetivas
+
+    engine, efetivas = asyncio.run(cenario())
+    assert isinstance(engine.pool, StaticPool)
+    assert efetivas["journal_mode"] == "memory"
+
+
+def test_escritores_concorrentes_esperam_o_lock(tmp_path):
+    async def cenario():
+        engine = create_sqlite_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE t (n INTEGER)"))
+
+        async def gravar(inicio):
+            for n in range(inicio, inicio + 20):
+                async with engine.begin() as conn:
+                    await conn.execute(text("INSERT INTO t VALUES (:n)"), {"n": n})
+
+        await asyncio.gather(*(gravar(i * 20) for i in range(5)))
+        async with engine.connect() as conn:
+            total = (await conn.execute(text("SELECT count(*) FROM t"))).scalar()
+        await engine.dispose()
+        return total
+
+    assert asyncio.run(cenario()) == 100
@@ -0,0 +1,56 @@
+"""Testes dos agregados de perdas calculados no banco."""
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models.db_models import EdicaoDB  # noqa: F401
+from app.services.edicoes_service import EdicoesService
+
+
+async def _cenario(tmp_path, consultas):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'edicoes.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # Linha gravada pelo formato antigo (json.dumps em coluna Text)
+        await conn.execute(text(
+            "INSERT INTO edicoes (codigo_municipio, competencia, perda_recurso_mensal, created_at, updated_at) "
+            "VALUES ('290010', '202501', '[100.0, 0.5]', '2025-01-01 00:00:00', '2025-01-01 00:00:00')"
+        ))
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with sessions() as session:
+        service = EdicoesService(session)
+        await service.salvar_edicao("290020", "202501", [1.0, 2.0, 3.0])
+        await service.salvar_edicao("290020", "202502", [7.0])
+        await service.salvar_edicao("310010", "202501", [1000.0])
+        antigo = await service.get_edicao("290010", "202501")
+        resultados = [await service.agregar_perdas(**filtros) for filtros in consultas]
+    await engine.dispose()
+    return antigo, resultados
+
+
+def test_agrega_por_uf_e_competencia(tmp_path):
+    antigo, (ba_jan, ba, tudo, vazio) = asyncio.run(_cenario(tmp_path, [
+        {"uf": "ba", "competencia": "202501"},
+        {"uf": "BA"},
+        {},
+        {"uf": "SP"},
+    ]))
+
+    assert antigo["perda_recurso_mensal"] == [100.0, 0.5]
+
+    assert ba_jan["uf"] == "BA"
+    assert ba_jan["total_edicoes"] == 2
+    assert ba_jan["total_municipios"] == 2
+    assert ba_jan["perda_mensal"] == [101.0, 2.5, 3.0]
+    assert ba_jan["perda_total"] == 106.5
+
+    assert ba["total_edicoes"] == 3
+    assert ba["total_municipios"] == 2
+    assert ba["perda_mensal"] == [108.0, 2.5, 3.0]
+
+    assert tudo["perda_total"] == 1113.5
+    assert vazio["total_edicoes"] == 0
+    assert vazio["perda_mensal"] == []
+    assert vazio["perda_total"] == 0
@@ -0,0 +1,140 @@
+"""Testes do histórico de edições (diffs esparsos e reconstrução no tempo)."""
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models.db_models import EdicaoHistoricoDB
+from app.services.edicoes_historico import aplicar_alteracoes, calcular_alteracoes
+from app.services.edicoes_service import EdicoesService
+
+
+async def _sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'edicoes.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def test_diff_esparso():
+    assert calcular_alteracoes([1.0, 2.0, 3.0], [1.0, 5.0, 3.0, 4.0]) == {"1": 5.0, "3": 4.0}
+    assert calcular_alteracoes([1.0, 2.0], [1.0]) == {}
+    assert aplicar_alteracoes([1.0, 2.0, 3.0], 4, {"1": 5.0, "3": 4.0}) == [1.0, 5.0, 3.0, 4.0]
+    assert aplicar_alteracoes([1.0, 2.0], 1, {}) == [1.0]
+
+
+def test_versoes_ignoram_noop_e_reconstroem_no_tempo(tmp_path):
+    async def cenario():
+        engine, sessions = await _sessions(tmp_path)
+        async with sessions() as session:
+            service = EdicoesService(session)
+            await service.salvar_edicao("310010", "202501", [1.0, 2.0, 3.0], usuario_id="ana")
+            criada = await service.get_edicao("310010", "202501")
+            sem_mudanca = await service.salvar_edicao("310010", "202501", [1.0, 2.0, 3.0], usuario_id="bia")
+            inalterada = await service.get_edicao("310010", "202501")
+            await service.salvar_edicao("310010", "202501", [1.0, 9.0, 3.0], usuario_id="bia")
+            await service.deletar_edicao("310010", "202501", usuario_id="caio")
+            await service.salvar_edicao("310010", "202501", [4.0], usuario_id="ana")
+
+            atual = await service.historico_edicao("310010", "202501")
+            instantes = [datetime.fromisoformat(v["alterado_em"]) for v in atual["versoes"]]
+            nos_instantes = [
+                await service.historico_edicao("310010", "202501", em=instante)
+                for instante in instantes
+            ]
+            antes = await service.historico_edicao("310010", "202501", em=datetime(2000, 1, 1))
+        await engine.dispose()
+        return criada, sem_mudanca, inalterada, atual, nos_instantes, antes
+
+    criada, sem_mudanca, inalterada, atual, nos_instantes, antes = asyncio.run(cenario())
+
+    assert sem_mudanca["message"] == "Nenhuma alteração"
+    assert inalterada["updated_at"] == criada["updated_at"]
+    assert inalterada["usuario_id"] == "ana"
+
+    versoes = atual["versoes"]
+    assert [v["versao"] for v in versoes] == [1, 2, 3, 4]
+    assert versoes[0]["snapshot"] == [1.0, 2.0, 3.0]
+    assert versoes[1]["alteracoes"] == {"1": 9.0} and versoes[1]["snapshot"] is None
+    assert versoes[2]["excluida"] and versoes[2]["usuario_id"] == "caio"
+    assert versoes[3]["snapshot"] == [4.0]  # recriação recomeça de um snapshot
+
+    assert atual["perda_recurso_mensal"] == [4.0]
+    assert [h["perda_recurso_mensal"] for h in nos_instantes] == [
+        [1.0, 2.0, 3.0], [1.0, 9.0, 3.0], None, [4.0]
+    ]
+    assert [h["usuario_id"] for h in nos_instantes] == ["ana", "bia", "caio", "ana"]
+    assert antes is None
+
+
+def test_historico_limitado_e_edicao_legada(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EDICOES_HISTORICO_SNAPSHOT_A_CADA", 3)
+    monkeypatch.setattr(settings, "EDICOES_HISTORICO_MAX_VERSOES", 5)
+
+    async def cenario():
+        engine, sessions = await _sessions(tmp_path)
+        async with engine.begin() as conn:
+            # Gravada antes do histórico existir
+            await conn.execute(text(
+                "INSERT INTO edicoes (codigo_municipio, competencia, perda_recurso_mensal, "
+                "usuario_id, created_at, updated_at) VALUES "
+                "('310010', '202501', '[0.0, 0.0]', 'legado', '2024-01-01 00:00:00', '2024-01-01 00:00:00')"
+            ))
+        async with sessions() as session:
+            service = EdicoesService(session)
+            legada = await service.historico_edicao("310010", "202501")
+            contagens = []
+            for n in range(1, 31):
+                await service.salvar_edicao("310010", "202501", [float(n), 0.0])
+                contagens.append((await session.execute(
+                    select(func.count(EdicaoHistoricoDB.id))
+                )).scalar())
+            atual = await service.historico_edicao("310010", "202501")
+            no_inicio = await service.historico_edicao("310010", "202501", em=datetime(2024, 6, 1))
+        await engine.dispose()
+        return legada, contagens, atual, no_inicio
+
+    legada, contagens, atual, no_inicio = asyncio.run(cenario())
+    assert legada["versao"] == 0 and legada["perda_recurso_mensal"] == [0.0, 0.0]
+    assert legada["versoes"] == []
+
+    assert max(contagens) <= 5 + 3
+    assert atual["versao"] == 31
+    assert atual["perda_recurso_mensal"] == [30.0, 0.0]
+    assert atual["usuario_id"] == "legado"
+    # A linha de base (2024) já foi descartada
+    assert no_inicio is None
+
+
+def test_lote_registra_versoes_so_do_que_mudou(tmp_path):
+    async def itens(linhas):
+        for linha in linhas:
+            yield linha
+
+    async def cenario():
+        engine, sessions = await _sessions(tmp_path)
+        async with sessions() as session:
+            service = EdicoesService(session)
+            primeiro = await service.importar_lote(itens([
+                {"codigo_municipio": "310010", "competencia": "202501", "perda_recurso_mensal": [1.0]},
+                {"codigo_municipio": "310020", "competencia": "202501", "perda_recurso_mensal": [2.0]},
+            ]), usuario_id="ana")
+            segundo = await service.importar_lote(itens([
+                {"codigo_municipio": "310010", "competencia": "202501", "perda_recurso_mensal": [1.0]},
+                {"codigo_municipio": "310020", "competencia": "202501", "perda_recurso_mensal": [2.0, 3.0]},
+            ]), usuario_id="bia")
+            historico = await service.historico_edicao("310020", "202501")
+            inalterada = await service.historico_edicao("310010", "202501")
+        await engine.dispose()
+        return primeiro, segundo, historico, inalterada
+
+    primeiro, segundo, historico, inalterada = asyncio.run(cenario())
+    assert (primeiro["total"], primeiro["alteradas"]) == (2, 2)
+    assert (segundo["total"], segundo["alteradas"]) == (2, 1)
+    assert [v["versao"] for v in inalterada["versoes"]] == [1]
+    assert historico["versoes"][1]["alteracoes"] == {"1": 3.0}
+    assert historico["versoes"][1]["usuario_id"] == "bia"
+    assert historico["perda_recurso_mensal"] == [2.0, 3.0]
@@ -0,0 +1,119 @@
+"""Testes da importação/exportação em lote de edições."""
+import asyncio
+import csv
+import io
+import json
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api.endpoints import edicoes
+from app.core.database import Base
+from app.core.dependencies import get_current_authorized_user, get_edicoes_service
+from app.models.db_models import EdicaoDB  # noqa: F401
+from app.models.schemas import User
+from app.services.edicoes_service import EdicoesService
+
+
+async def _app(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'edicoes.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def service():
+        async with sessions() as session:
+            yield EdicoesService(session)
+
+    app = FastAPI()
+    app.include_router(edicoes.router)
+    app.dependency_overrides[get_edicoes_service] = service
+    app.dependency_overrides[get_current_authorized_user] = lambda: User(
+        id="u1", email="consultor@example.com", nome="Consultor", is_authorized=True
+    )
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t")
+    return client, engine
+
+
+def test_importa_ndjson_e_exporta(tmp_path):
+    linhas = [
+        {"codigo_municipio": str(310000 + n), "competencia": "202501", "perda_recurso_mensal": [n, 1.5]}
+        for n in range(1200)
+    ]
+    linhas.append({"codigo_municipio": "310000", "competencia": "202501",
+                   "perda_recurso_mensal": [9], "usuario_id": "outro"})
+    corpo = "\n".join(json.dumps(linha) for linha in linhas) + "\n"
+
+    async def cenario():
+        client, engine = await _app(tmp_path)
+        async with client:
+            r = await client.post(
+                "/edicoes/lote", content=corpo, headers={"Content-Type": "application/x-ndjson"}
+            )
+            assert r.status_code == 200, r.text
+            assert r.json()["total"] == 1201
+
+            exportado = await client.get("/edicoes/export")
+            docs = [json.loads(linha) for linha in exportado.text.splitlines()]
+
+            csv_resp = await client.get("/edicoes/export", params={"formato": "csv"})
+        await engine.dispose()
+        return docs, csv_resp.text
+
+    docs, csv_text = asyncio.run(cenario())
+    assert len(docs) == 1200
+    primeiro = next(d for d in docs if d["codigo_municipio"] == "310000")
+    assert primeiro["perda_recurso_mensal"] == [9.0]
+    assert primeiro["usuario_id"] == "outro"
+    assert next(d for d in docs if d["codigo_municipio"] == "310001")["usuario_id"] == "u1"
+
+    rows = list(csv.DictReader(io.StringIO(csv_text)))
+    assert len(rows) == 1200
+    assert json.loads(rows[1]["perda_recurso_mensal"]) == [1.0, 1.5]
+
+
+def test_importa_csv_com_ponto_e_virgula(tmp_path):
+    corpo = (
+        "codigo_municipio;competencia;perda_recurso_mensal\r\n"
+        "310010;202501;0|1500.5\r\n"
+        '310020;202501;"[1.0, 2.0]"\r\n'
+    )
+
+    async def cenario():
+        client, engine = await _app(tmp_path)
+        async with client:
+            r = await client.post("/edicoes/lote", content=corpo, headers={"Content-Type": "text/csv"})
+            doc = (await client.get("/edicoes/310010/202501")).json()
+        await engine.dispose()
+        return r, doc
+
+    r, doc = asyncio.run(cenario())
+    assert r.status_code == 200, r.text
+    assert r.json()["total"] == 2
+    assert doc["perda_recurso_mensal"] == [0.0, 1500.5]
+
+
+def test_linha_invalida_cancela_lote_inteiro(tmp_path):
+    corpo = (
+        json.dumps({"codigo_municipio": "310010", "competencia": "202501", "perda_recurso_mensal": [1]})
+        + "\n"
+        + json.dumps({"codigo_municipio": "310020", "competencia": "2025", "perda_recurso_mensal": [1]})
+    )
+
+    async def cenario():
+        client, engine = await _app(tmp_path)
+        async with client:
+            r = await client.post(
+                "/edicoes/lote", content=corpo, headers={"Content-Type": "application/x-ndjson"}
+            )
+            listagem = (await client.get("/edicoes")).json()
+            r_tipo = await client.post("/edicoes/lote", content="{}", headers={"Content-Type": "text/plain"})
+        await engine.dispose()
+        return r, listagem, r_tipo
+
+    r, listagem, r_tipo = asyncio.run(cenario())
+    assert r.status_code == 400
+    assert "Linha 2" in r.json()["detail"]
+    assert listagem["total"] == 0
+    assert r_tipo.status_code == 415
@@ -0,0 +1,116 @@
+"""Testes da paginação por cursor da listagem de edições."""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api.endpoints import edicoes
+from app.core.database import Base
+from app.core.dependencies import get_current_authorized_user, get_edicoes_service
+from app.models.db_models import EdicaoDB
+from app.models.schemas import User
+from app.services import edicoes_service
+from app.services.edicoes_service import EdicoesService
+
+
+async def _engine(tmp_path, total=25):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'edicoes.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    base = datetime(2025, 1, 1)
+    async with sessions() as session:
+        # Pares de linhas com o mesmo updated_at: o id desempata a ordem
+        session.add_all([
+            EdicaoDB(
+                codigo_municipio=str(310000 + n % 3),
+                competencia=f"2025{n:02d}",
+                perda_recurso_mensal=[],
+                updated_at=base + timedelta(minutes=n // 2),
+            )
+            for n in range(total)
+        ])
+        await session.commit()
+    return engine, sessions
+
+
+def test_cursor_percorre_tudo_sem_repetir(tmp_path):
+    async def cenario():
+        engine, sessions = await _engine(tmp_path)
+        ids, cursor = [], None
+        async with sessions() as session:
+            service = EdicoesService(session)
+            esperado = (await service.listar_edicoes(limit=100))["documents"]
+            while True:
+                pagina = await service.listar_edicoes(limit=7, after=cursor)
+                ids += [doc["id"] for doc in pagina["documents"]]
+                cursor = pagina["next_cursor"]
+                if cursor is None:
+                    break
+            assert pagina["total"] == 25
+
+            filtrado = await service.listar_edicoes(
+                codigo_municipio="310000", limit=100, after="9999-01-01T00:00:00,0"
+            )
+        await engine.dispose()
+        return ids, [doc["id"] for doc in esperado], filtrado
+
+    ids, esperado, filtrado = asyncio.run(cenario())
+    assert ids == esperado
+    assert len(set(ids)) == 25
+    assert filtrado["total"] == 9
+    assert {doc["codigo_municipio"] for doc in filtrado["documents"]} == {"310000"}
+
+
+def test_total_cacheado_e_invalidado_por_escritas(tmp_path):
+    async def cenario():
+        engine, sessions = await _engine(tmp_path, total=3)
+        inicio = "9999-01-01T00:00:00,0"
+        async with sessions() as session:
+            service = EdicoesService(session)
+            assert (await service.listar_edicoes(after=inicio))["total"] == 3
+
+            # Escrita de fora deste processo: só aparece quando o cache expira
+            await session.execute(text("DELETE FROM edicoes WHERE competencia IN ('202500', '202501')"))
+            await session.commit()
+            assert (await service.listar_edicoes(after=inicio))["total"] == 3
+            assert (await service.listar_edicoes(after=inicio, incluir_total=False))["total"] is None
+
+            await service.salvar_edicao("310099", "202501", [1.0])
+            assert (await service.listar_edicoes(after=inicio))["total"] == 2
+        await engine.dispose()
+
+    edicoes_service._invalidar_totais()
+    asyncio.run(cenario())
+
+
+def test_endpoint_cursor_invalido(tmp_path):
+    async def cenario():
+        engine, sessions = await _engine(tmp_path, total=3)
+
+        async def service():
+            async with sessions() as session:
+                yield EdicoesService(session)
+
+        app = FastAPI()
+        app.include_router(edicoes.router)
+        app.dependency_overrides[get_edicoes_service] = service
+        app.dependency_overrides[get_current_authorized_user] = lambda: User(
+            id="u1", email="consultor@example.com", nome="Consultor", is_authorized=True
+        )
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            primeira = (await client.get("/edicoes", params={"limit": 2})).json()
+            segunda = (await client.get("/edicoes", params={"limit": 2, "after": primeira["next_cursor"]})).json()
+            invalido = await client.get("/edicoes", params={"after": "ontem"})
+        await engine.dispose()
+        return primeira, segunda, invalido
+
+    primeira, segunda, invalido = asyncio.run(cenario())
+    assert primeira["total"] == 3 and len(primeira["documents"]) == 2
+    assert [doc["competencia"] for doc in segunda["documents"]] == ["202500"]
+    assert segunda["next_cursor"] is None
+    assert invalido.status_code == 400
@@ -0,0 +1,75 @@
+"""Testes do cache HTTP (ETag/Cache-Control) dos endpoints de referência."""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.endpoints import financiamento, municipios
+from app.core.http_cache import ReferenceResponseCache, reference_cache
+from app.services.municipios import municipio_service
+
+
+def _get(*requisicoes):
+    async def cenario():
+        app = FastAPI()
+        app.include_router(municipios.router, prefix="/municipios")
+        app.include_router(financiamento.router, prefix="/financiamento")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return [await client.get(url, headers=headers or {}) for url, headers in requisicoes]
+
+    return asyncio.run(cenario())
+
+
+def test_304_sem_chamar_o_servico(monkeypatch):
+    reference_cache.clear()
+    primeira, = _get(("/municipios/municipios/to", None))
+    etag = primeira.headers["etag"]
+    assert primeira.status_code == 200
+    assert primeira.headers["cache-control"] == "private, max-age=86400"
+    assert {"codigo_ibge": "170770", "nome": "FILADÉLFIA", "uf": "TO", "populacao": None} in primeira.json()
+
+    def falha(*args, **kwargs):
+        raise AssertionError("serviço não deveria ser chamado")
+
+    monkeypatch.setattr(municipio_service, "get_municipios_por_uf", falha)
+    monkeypatch.setattr(municipio_service, "validate_uf", falha)
+    nao_modificado, de_novo, outra_versao = _get(
+        ("/municipios/municipios/TO", {"If-None-Match": etag}),
+        ("/municipios/municipios/TO", {"If-None-Match": f'"x", W/{etag}'}),
+        ("/municipios/municipios/TO", {"If-None-Match": '"antigo"'}),
+    )
+    assert nao_modificado.status_code == 304 and nao_modificado.content == b""
+    assert nao_modificado.headers["etag"] == etag
+    assert de_novo.status_code == 304
+    assert outra_versao.status_code == 200 and outra_versao.content == primeira.content
+
+
+def test_erros_nao_sao_cacheados():
+    reference_cache.clear()
+    invalida, ufs = _get(("/municipios/municipios/XX", None), ("/municipios/ufs", None))
+    assert invalida.status_code == 400 and "etag" not in invalida.headers
+    assert reference_cache.get("municipios:XX") is None
+    assert len(ufs.json()) == 27 and ufs.headers["etag"]
+
+
+def test_competencia_mantem_etag_enquanto_nao_muda():
+    agora = [0.0]
+    cache = ReferenceResponseCache(clock=lambda: agora[0])
+    primeira = cache.put("competencia:latest", {"competencia": "202509", "timestamp": "t1"}, ttl=60, versao="202509")
+    agora[0] = 61
+    assert cache.get("competencia:latest") is None
+    renovada = cache.put("competencia:latest", {"competencia": "202509", "timestamp": "t2"}, ttl=60, versao="202509")
+    assert renovada.etag == primeira.etag and renovada.body == primeira.body
+    assert cache.get("competencia:latest") is renovada
+    nova = cache.put("competencia:latest", {"competencia": "202510", "timestamp": "t3"}, ttl=60, versao="202510")
+    assert nova.etag != primeira.etag
+
+
+def test_endpoint_competencia():
+    reference_cache.clear()
+    primeira, = _get(("/financiamento/competencia/latest", None))
+    segunda, = _get(("/financiamento/competencia/latest", {"If-None-Match": primeira.headers["etag"]}))
+    assert primeira.status_code == 200 and len(primeira.json()["competencia"]) == 6
+    assert primeira.headers["cache-control"] == "private, max-age=3600"
+    assert segunda.status_code == 304
@@ -0,0 +1,99 @@
+"""Testes da serialização JSON rápida e do repasse do corpo da API de financiamento."""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.endpoints import financiamento
+from app.core import json_response
+from app.core.config import settings
+from app.core.json_response import FastJSONResponse, RawJSONResponse, dumps
+from app.services import api_client
+from app.services.api_client import RespostaFinanciamento, saude_api_client
+
+PAYLOAD = {
+    "resumosPlanosOrcamentarios": [{"dsPlanoOrcamentario": "Atenção Primária", "vlEfetivoRepasse": 1234.5}],
+    "pagamentos": [{"coMunicipioIbge": "355030", "qtEquipes": 3, "ativo": True, "obs": None}],
+}
+
+
+@pytest.mark.parametrize("com_orjson", [True, False])
+def test_dumps_igual_ao_json_response_padrao(monkeypatch, com_orjson):
+    if not com_orjson:
+        monkeypatch.setattr(json_response, "orjson", None)
+    esperado = json.dumps(PAYLOAD, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    assert dumps(PAYLOAD) == esperado
+    assert FastJSONResponse(PAYLOAD).body == esperado
+    assert json_response.loads(esperado) == PAYLOAD
+
+
+def test_raw_json_response_repassa_bytes():
+    corpo = b'{ "pagamentos" : [] }'
+    resposta = RawJSONResponse(corpo)
+    assert resposta.body == corpo
+    assert resposta.media_type == "application/json"
+    assert RawJSONResponse({"a": 1}).body == b'{"a":1}'
+
+
+def _consultar_upstream(monkeypatch, tmp_path, corpo: bytes, content_type: str):
+    def handler(request):
+        return httpx.Response(200, content=corpo, headers={"content-type": content_type})
+
+    monkeypatch.setattr(api_client, "upstream_transport", lambda nome: httpx.MockTransport(handler))
+    monkeypatch.setattr(settings, "DATA_CACHE_FILE", str(tmp_path / "cache.json"))
+    return asyncio.run(saude_api_client.consultar_financiamento_bruto("355030", "202509"))
+
+
+def test_cliente_guarda_corpo_utf8(monkeypatch, tmp_path):
+    corpo = json.dumps(PAYLOAD, ensure_ascii=False, indent=2).encode("utf-8")
+    resposta = _consultar_upstream(monkeypatch, tmp_path, corpo, "application/json")
+
+    assert resposta.dados == PAYLOAD
+    assert resposta.conteudo == corpo
+    assert (tmp_path / "cache.json").read_bytes() == corpo
+
+
+def test_cliente_sem_repasse_para_outra_codificacao(monkeypatch, tmp_path):
+    corpo = json.dumps(PAYLOAD, ensure_ascii=False).encode("latin-1")
+    resposta = _consultar_upstream(monkeypatch, tmp_path, corpo, "application/json; charset=iso-8859-1")
+
+    assert resposta.dados == PAYLOAD
+    assert resposta.conteudo is None
+    assert json.loads((tmp_path / "cache.json").read_text(encoding="utf-8")) == PAYLOAD
+
+
+def _get_dados(monkeypatch, resposta):
+    async def consultar(codigo_ibge, competencia):
+        return resposta
+
+    monkeypatch.setattr(financiamento.saude_api_client, "consultar_financiamento_bruto", consultar)
+
+    async def cenario():
+        app = FastAPI()
+        app.include_router(financiamento.router, prefix="/financiamento")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await client.get("/financiamento/dados/355030/202509")
+
+    return asyncio.run(cenario())
+
+
+def test_endpoint_dados_repassa_corpo_original(monkeypatch):
+    corpo = json.dumps(PAYLOAD, ensure_ascii=False, indent=2).encode("utf-8")
+    resposta = _get_dados(monkeypatch, RespostaFinanciamento(PAYLOAD, corpo))
+
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"] == "application/json"
+    assert resposta.content == corpo
+
+
+def test_endpoint_dados_serializa_sem_corpo_original(monkeypatch):
+    resposta = _get_dados(monkeypatch, RespostaFinanciamento(PAYLOAD, None))
+    assert resposta.status_code == 200
+    assert resposta.content == dumps(PAYLOAD)
+
+    nao_encontrado = _get_dados(monkeypatch, None)
+    assert nao_encontrado.status_code == 404
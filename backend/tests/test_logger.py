@@ -0,0 +1,133 @@
+"""Testes do logging assíncrono (fila), JSON, nível por módulo e amostragem."""
+import io
+import json
+import logging
+import sys
+import threading
+import time
+
+from app.utils.logger import (
+    JsonFormatter,
+    LogSampler,
+    ModuleLevelFilter,
+    parse_module_levels,
+    setup_logger,
+)
+
+
+def _registro(nivel=logging.INFO, msg="mensagem %s", args=("x",), lineno=10, module="mod", exc_info=None):
+    return logging.LogRecord("teste", nivel, f"/app/{module}.py", lineno, msg, args, exc_info)
+
+
+def test_json_formatter_inclui_extras_e_excecao():
+    try:
+        raise ValueError("falhou")
+    except ValueError:
+        record = _registro(exc_info=sys.exc_info())
+    record.codigo_ibge = "355030"
+
+    dados = json.loads(JsonFormatter().format(record))
+
+    assert dados["level"] == "INFO"
+    assert dados["msg"] == "mensagem x"
+    assert dados["module"] == "mod"
+    assert dados["line"] == 10
+    assert dados["codigo_ibge"] == "355030"
+    assert "ValueError: falhou" in dados["exc"]
+
+
+def test_parse_module_levels_ignora_invalidos():
+    niveis = parse_module_levels("relatorio_pdf=WARNING, api_client=debug, quebrado, x=NAOEXISTE")
+    assert niveis == {"relatorio_pdf": logging.WARNING, "api_client": logging.DEBUG}
+
+
+def test_filtro_por_modulo():
+    filtro = ModuleLevelFilter(logging.INFO, {"ruidoso": logging.WARNING, "detalhado": logging.DEBUG})
+
+    assert not filtro.filter(_registro(logging.INFO, module="ruidoso"))
+    assert filtro.filter(_registro(logging.WARNING, module="ruidoso"))
+    assert filtro.filter(_registro(logging.DEBUG, module="detalhado"))
+    assert not filtro.filter(_registro(logging.DEBUG, module="outro"))
+    assert filtro.filter(_registro(logging.INFO, module="outro"))
+
+
+def test_amostragem_burst_depois_um_a_cada_n():
+    agora = [0.0]
+    sampler = LogSampler(burst=3, janela=60, taxa=5, clock=lambda: agora[0])
+
+    aceitos = [r for r in (_registro() for _ in range(13)) if sampler.filter(r)]
+
+    # 3 do burst + excedentes 5 e 10 (registros 8 e 13)
+    assert len(aceitos) == 5
+    assert getattr(aceitos[2], "suprimidas", 0) == 0
+    assert aceitos[3].suprimidas == 4
+    assert aceitos[4].suprimidas == 4
+
+    # Nova janela: burst de novo, levando os suprimidos pendentes
+    for _ in range(2):
+        sampler.filter(_registro())
+    agora[0] = 61.0
+    record = _registro()
+    assert sampler.filter(record)
+    assert record.suprimidas == 2
+
+
+def test_amostragem_por_linha_e_nunca_para_warning():
+    sampler = LogSampler(burst=1, janela=60, taxa=1000, clock=lambda: 0.0)
+
+    assert sampler.filter(_registro(lineno=1))
+    assert not sampler.filter(_registro(lineno=1))
+    assert sampler.filter(_registro(lineno=2))
+    assert all(sampler.filter(_registro(logging.WARNING, lineno=1)) for _ in range(10))
+
+
+class _StreamLento(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.liberado = threading.Event()
+
+    def write(self, texto):
+        self.liberado.wait(5)
+        return super().write(texto)
+
+
+def test_logger_nao_bloqueia_e_conta_descartes():
+    stream = _StreamLento()
+    logger = setup_logger("teste-fila", level="INFO", log_format="json", queue_size=2, stream=stream)
+    try:
+        # O listener fica preso no 1º registro; a fila (2) enche e o resto é descartado,
+        # sem que as chamadas esperem pelo stream
+        for i in range(10):
+            logger.info("registro %d", i)
+        assert logger.handlers[0].descartados > 0
+
+        stream.liberado.set()
+        while not logger.handlers[0].queue.empty():
+            time.sleep(0.001)
+        logger.warning("depois")
+        logger.listener.stop()
+        linhas = [json.loads(linha) for linha in stream.getvalue().splitlines()]
+    finally:
+        stream.liberado.set()
+        logger.listener.stop()
+
+    mensagens = [linha["msg"] for linha in linhas]
+    assert mensagens[0] == "registro 0"
+    assert any("descartado(s): fila cheia" in m for m in mensagens)
+    assert mensagens[-1] == "depois"
+    assert len(mensagens) < 12
+
+
+def test_mensagem_fixada_na_chamada():
+    stream = io.StringIO()
+    logger = setup_logger("teste-args", level="DEBUG", log_format="json", stream=stream)
+    dados = {"valor": 1}
+    try:
+        logger.debug("dados=%s", dados, extra={"codigo_ibge": "355030"})
+        dados["valor"] = 2  # mudança depois da chamada não aparece no log
+    finally:
+        logger.listener.stop()
+
+    linha = json.loads(stream.getvalue())
+    assert linha["msg"] == "dados={'valor': 1}"
+    assert linha["codigo_ibge"] == "355030"
@@ -0,0 +1,99 @@
+"""Testes do registro de métricas e da instrumentação."""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.metrics import (
+    MetricsMiddleware,
+    MetricsRegistry,
+    cache_requests,
+    db_query_duration,
+    http_request_duration,
+    registry,
+    upstream_request_duration,
+    upstream_transport,
+)
+
+
+def test_formato_texto_prometheus():
+    reg = MetricsRegistry(prefix="t")
+    contador = reg.counter("eventos", "Eventos.", ("tipo",))
+    histograma = reg.histogram("duracao_seconds", "Duração.", ("rota",), buckets=(0.1, 1.0))
+    reg.gauge("fila", "Fila.", lambda: 3)
+
+    contador.inc(tipo='a"b')
+    contador.inc(2, tipo='a"b')
+    for valor in (0.05, 0.5, 5):
+        histograma.observe(valor, rota="/x/{id}")
+
+    linhas = reg.render().splitlines()
+    assert "# TYPE t_eventos_total counter" in linhas
+    assert 't_eventos_total{tipo="a\\"b"} 3' in linhas
+    assert "# TYPE t_duracao_seconds histogram" in linhas
+    assert 't_duracao_seconds_bucket{rota="/x/{id}",le="0.1"} 1' in linhas
+    assert 't_duracao_seconds_bucket{rota="/x/{id}",le="1"} 2' in linhas
+    assert 't_duracao_seconds_bucket{rota="/x/{id}",le="+Inf"} 3' in linhas
+    assert 't_duracao_seconds_sum{rota="/x/{id}"} 5.55' in linhas
+    assert 't_duracao_seconds_count{rota="/x/{id}"} 3' in linhas
+    assert "t_fila 3" in linhas
+
+
+def test_middleware_usa_template_da_rota():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/itens/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    async def cenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            for item_id in (1, 2, 3):
+                await client.get(f"/itens/{item_id}")
+            await client.get("/itens/abc")
+            await client.get("/nao-existe/123")
+
+    antes_404 = http_request_duration.count(method="GET", route="unmatched", status="404")
+    asyncio.run(cenario())
+    assert http_request_duration.count(method="GET", route="/itens/{item_id}", status="200") >= 3
+    assert http_request_duration.count(method="GET", route="/itens/{item_id}", status="422") >= 1
+    assert http_request_duration.count(method="GET", route="unmatched", status="404") == antes_404 + 1
+
+
+def test_transporte_de_upstream_registra_status_e_erros():
+    def responder(request):
+        if request.url.path == "/falha":
+            raise httpx.ConnectError("recusada", request=request)
+        return httpx.Response(503 if request.url.path == "/ocupado" else 200)
+
+    async def cenario():
+        transport = upstream_transport("teste", httpx.MockTransport(responder))
+        async with httpx.AsyncClient(transport=transport, base_url="http://upstream") as client:
+            await client.get("/ok")
+            await client.get("/ocupado")
+            try:
+                await client.get("/falha")
+            except httpx.ConnectError:
+                pass
+
+    asyncio.run(cenario())
+    for status in ("200", "503", "error"):
+        assert upstream_request_duration.count(upstream="teste", method="GET", status=status) >= 1
+
+
+def test_consultas_e_cache_de_editados(tmp_path):
+    from app.services.municipios_editados import MunicipioEditadoService
+
+    antes = db_query_duration.count(database="editados", statement="SELECT")
+    service = MunicipioEditadoService(str(tmp_path / "editados.db"), json_file=str(tmp_path / "nenhum.json"))
+    service.init()
+    service.get_editado("310620", "202501")
+    service.get_editado("310620", "202501")
+    service.close()
+
+    assert db_query_duration.count(database="editados", statement="SELECT") > antes
+    assert cache_requests.value(cache="editados", result="hit") >= 1
+    assert cache_requests.value(cache="editados", result="miss") >= 1
+    assert "papprefeito_cache_requests_total" in registry.render()
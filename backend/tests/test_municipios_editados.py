@@ -0,0 +1,142 @@
+"""Testes do armazenamento SQLite dos dados editados de municípios."""
+import json
+import threading
+
+from app.models.schemas import MunicipioEditadoCreate, MunicipioEditadoUpdate
+from app.services.municipios_editados import MunicipioEditadoService
+
+
+def _service(tmp_path, json_file="legado.json"):
+    return MunicipioEditadoService(
+        db_path=str(tmp_path / "editados.db"),
+        json_file=str(tmp_path / json_file),
+    )
+
+
+def _create(codigo="310010", competencia="202501", perdas=(1.0, 2.0), **kwargs):
+    return MunicipioEditadoCreate(
+        codigo_ibge=codigo, competencia=competencia, perda_recurso_mensal=list(perdas), **kwargs
+    )
+
+
+def test_migra_json_legado_uma_vez(tmp_path):
+    legado = tmp_path / "legado.json"
+    legado.write_text(json.dumps({
+        "310010_202501": {
+            "perda_recurso_mensal": [10.0, 0.0],
+            "perda_vinculo_mensal": [4.0, 0.0],
+            "data_edicao": "2025-02-01T10:00:00",
+        },
+        "semsublinhado": {},
+    }), encoding="utf-8")
+
+    service = _service(tmp_path)
+    editado = service.get_editado("310010", "202501")
+
+    assert editado.perda_recurso_mensal == [10.0, 0.0]
+    assert editado.perda_vinculo_mensal == [4.0, 0.0]
+    assert editado.perda_qualidade_mensal is None
+    assert editado.data_edicao.isoformat() == "2025-02-01T10:00:00"
+    assert not legado.exists()
+    assert (tmp_path / "legado.json.migrado").exists()
+    assert len(service.get_all_editados()) == 1
+    service.close()
+
+    # Reabrir não duplica nem perde nada
+    reaberto = _service(tmp_path)
+    assert len(reaberto.get_all_editados()) == 1
+    reaberto.close()
+
+
+def test_create_update_upsert_delete(tmp_path):
+    service = _service(tmp_path)
+
+    assert service.create_editado(_create(perda_qualidade_mensal=[0.5, 0.5])) is not None
+    assert service.create_editado(_create(perdas=(9.0,))) is None  # já existe
+
+    atualizado = service.update_editado(
+        "310010", "202501", MunicipioEditadoUpdate(perda_recurso_mensal=[3.0, 4.0])
+    )
+    assert atualizado.perda_recurso_mensal == [3.0, 4.0]
+    assert atualizado.perda_qualidade_mensal == [0.5, 0.5]  # preservado
+    assert service.update_editado(
+        "999999", "202501", MunicipioEditadoUpdate(perda_recurso_mensal=[1.0])
+    ) is None
+
+    service.upsert_editado(_create(perdas=(7.0,)))
+    editado = service.get_editado("310010", "202501")
+    assert editado.perda_recurso_mensal == [7.0]
+    assert editado.perda_qualidade_mensal is None
+
+    assert service.delete_editado("310010", "202501") is True
+    assert service.delete_editado("310010", "202501") is False
+    assert service.get_editado("310010", "202501") is None
+    service.close()
+
+
+def test_escritores_concorrentes_nao_perdem_atualizacoes(tmp_path):
+    # Duas instâncias = duas conexões (como dois processos) no mesmo banco
+    services = [_service(tmp_path), _service(tmp_path)]
+
+    def gravar(service, inicio):
+        for n in range(inicio, inicio + 25):
+            service.upsert_editado(_create(codigo=str(310000 + n)))
+
+    threads = [
+        threading.Thread(target=gravar, args=(service, i * 25))
+        for i, service in enumerate(services)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(services[0].get_all_editados()) == 50
+    for service in services:
+        service.close()
+
+
+def test_get_editado_usa_cache_e_escritas_atualizam(tmp_path):
+    service = _service(tmp_path)
+    assert service.get_editado("310010", "202501") is None  # "sem edição" também é cacheado
+
+    criado = service.create_editado(_create())
+    assert service.get_editado("310010", "202501") is criado
+
+    service.update_editado("310010", "202501", MunicipioEditadoUpdate(perda_recurso_mensal=[5.0]))
+    primeiro = service.get_editado("310010", "202501")
+    assert primeiro.perda_recurso_mensal == [5.0]
+    assert service.get_editado("310010", "202501") is primeiro  # sem nova leitura do banco
+
+    service.delete_editado("310010", "202501")
+    assert service.get_editado("310010", "202501") is None
+    service.close()
+
+
+def test_cache_descartado_quando_outro_processo_grava(tmp_path):
+    leitor = _service(tmp_path)
+    escritor = _service(tmp_path)
+
+    assert leitor.get_editado("310010", "202501") is None
+    escritor.upsert_editado(_create(perdas=(8.0,)))
+    assert leitor.get_editado("310010", "202501").perda_recurso_mensal == [8.0]
+
+    escritor.upsert_editado(_create(perdas=(9.0,)))
+    assert leitor.get_editado("310010", "202501").perda_recurso_mensal == [9.0]
+
+    escritor.delete_editado("310010", "202501")
+    assert leitor.get_editado("310010", "202501") is None
+    leitor.close()
+    escritor.close()
+
+
+def test_cache_limitado(tmp_path):
+    service = MunicipioEditadoService(
+        db_path=str(tmp_path / "editados.db"),
+        json_file=str(tmp_path / "legado.json"),
+        cache_max_entries=2,
+    )
+    for n in range(5):
+        service.get_editado(str(310000 + n), "202501")
+    assert len(service._cache) == 2
+    service.close()
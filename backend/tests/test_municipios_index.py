@@ -0,0 +1,86 @@
+"""Testes do índice nacional de municípios."""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.endpoints import municipios
+from app.services.municipios import municipio_service, normalizar_nome
+
+
+def test_indice_nacional():
+    index = municipio_service.index
+    assert len(index.ufs) == 27
+    assert len(index.por_codigo) > 5500
+    assert municipio_service.get_municipio_por_codigo("291085").uf == "BA"
+    # Código com dígito verificador também é aceito
+    assert municipio_service.get_municipio_por_codigo("2910859").codigo_ibge == "291085"
+    assert municipio_service.get_municipio_por_codigo("999999") is None
+
+
+def test_municipios_da_uf_ordenados_sem_acento():
+    nomes = [m.nome for m in municipio_service.get_municipios_por_uf("ba")]
+    assert nomes == sorted(nomes, key=normalizar_nome)
+    assert municipio_service.get_municipios_por_uf("XX") == []
+
+
+def test_busca_por_nome_ignora_acentos_e_desambigua_uf():
+    encontrados = municipio_service.buscar_por_nome("filadelfia")
+    assert {m.uf for m in encontrados} == {"BA", "TO"}
+    assert [m.uf for m in municipio_service.buscar_por_nome("  Filadélfia ", "to")] == ["TO"]
+    assert municipio_service.get_codigo_ibge("Filadelfia", "TO") == "170770"
+    assert municipio_service.get_codigo_ibge("Filadelfia", "SP") is None
+
+
+def test_endpoint_busca_reversa():
+    async def cenario():
+        app = FastAPI()
+        app.include_router(municipios.router)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return (
+                await client.get("/municipio/codigo/170770"),
+                await client.get("/municipio/codigo/999999"),
+            )
+
+    encontrado, ausente = asyncio.run(cenario())
+    assert encontrado.status_code == 200
+    assert encontrado.json()["uf"] == "TO"
+    assert ausente.status_code == 404
+
+
+def test_busca_ordena_exato_prefixo_e_aproximado():
+    santana = municipio_service.buscar("santana", limit=5)
+    assert [m.rotulo for m in santana[:2]] == ["SANTANA - AP", "SANTANA - BA"]
+    assert {m.correspondencia for m in santana[:2]} == {"exata"}
+    assert all(m.correspondencia == "prefixo" for m in santana[2:])
+
+    assert municipio_service.buscar("jose dos campos")[0].codigo_ibge == "354990"
+    aproximado = municipio_service.buscar("Sao Pualo")[0]
+    assert (aproximado.nome, aproximado.correspondencia) == ("SÃO PAULO", "aproximada")
+
+
+def test_busca_desambigua_homonimos_pela_uf():
+    assert [m.uf for m in municipio_service.buscar("Filadelfia")] == ["BA", "TO"]
+    for termo in ("Filadélfia/TO", "filadelfia - to", "Filadelfia, TO"):
+        assert [m.codigo_ibge for m in municipio_service.buscar(termo)] == ["170770"]
+    assert [m.uf for m in municipio_service.buscar("Filadelfia", uf_sigla="ba")] == ["BA"]
+
+
+def test_endpoint_busca():
+    async def cenario():
+        app = FastAPI()
+        app.include_router(municipios.router)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return (
+                await client.get("/busca", params={"q": "santana", "limit": 3}),
+                await client.get("/busca", params={"q": "santana", "uf": "XX"}),
+                await client.get("/busca", params={"q": "s"}),
+            )
+
+    ok, uf_invalida, curto = asyncio.run(cenario())
+    assert ok.status_code == 200 and len(ok.json()) == 3
+    assert ok.json()[0]["rotulo"] == "SANTANA - AP"
+    assert uf_invalida.status_code == 400
+    assert curto.status_code == 422
@@ -0,0 +1,107 @@
+"""Testes do hash de senhas fora do event loop."""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.security import PasswordHasher, get_password_hash
+
+
+def test_hash_e_verificacao_no_pool():
+    hasher = PasswordHasher(workers=2, max_queue=2)
+
+    async def cenario():
+        hashed = await hasher.hash("Senha123")
+        return hashed, await asyncio.gather(
+            hasher.verify("Senha123", hashed),
+            hasher.verify("errada", hashed),
+        )
+
+    hashed, (ok, errada) = asyncio.run(cenario())
+    hasher.shutdown()
+    assert hashed.startswith("$2b$12$")
+    assert ok is True and errada is False
+
+    metrics = hasher.metrics()
+    assert metrics["operations"]["hash"]["count"] == 1
+    assert metrics["operations"]["verify"]["count"] == 2
+    assert metrics["operations"]["verify"]["avg_ms"] > 0
+    assert metrics["in_flight"] == 0
+
+
+def test_event_loop_segue_livre_durante_o_hash():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    hashed = get_password_hash("Senha123")
+
+    async def cenario():
+        ticks = 0
+
+        async def relogio():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tarefa = asyncio.create_task(relogio())
+        await hasher.verify("Senha123", hashed)
+        tarefa.cancel()
+        return ticks
+
+    assert asyncio.run(cenario()) >= 5  # bcrypt 12 rounds leva centenas de ms
+    hasher.shutdown()
+
+
+def test_fila_cheia_responde_503(monkeypatch):
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    liberar = threading.Event()
+    avisos = []
+    monkeypatch.setattr(security.logger, "warning", lambda msg, *args: avisos.append(msg % args))
+
+    async def cenario():
+        ocupadas = [asyncio.create_task(hasher._run("verify", liberar.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert hasher.queue_depth == 1
+        with pytest.raises(HTTPException) as exc:
+            await hasher.verify("x", "y")
+        liberar.set()
+        await asyncio.gather(*ocupadas)
+        return exc.value
+
+    exc = asyncio.run(cenario())
+    hasher.shutdown()
+    assert exc.status_code == 503
+    assert int(exc.headers["Retry-After"]) >= 1
+    assert hasher.metrics()["rejected"] == 1
+    assert hasher.metrics()["max_queue_depth"] == 1
+    assert len(avisos) == 1 and "fila cheia" in avisos[0]
+
+
+def test_cancelamento_nao_libera_vaga_do_bcrypt_em_andamento():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    liberar = threading.Event()
+
+    async def cenario():
+        tarefa = asyncio.create_task(hasher._run("verify", liberar.wait, 5))
+        await asyncio.sleep(0.05)
+        tarefa.cancel()
+        await asyncio.gather(tarefa, return_exceptions=True)
+
+        # A thread continua ocupada: a próxima chamada ainda é recusada
+        assert hasher.in_flight == 1
+        with pytest.raises(HTTPException) as exc_info:
+            await hasher._run("verify", len, "x")
+        assert exc_info.value.status_code == 503
+
+        liberar.set()
+        for _ in range(100):
+            if hasher.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await hasher._run("verify", len, "x") == 1
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        hasher.shutdown()
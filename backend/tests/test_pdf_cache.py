@@ -0,0 +1,83 @@
+"""Testes do cache de PDFs endereçado por conteúdo."""
+import threading
+
+from app.core.http_cache import etag_matches
+from app.services.pdf_cache import PdfCache, cache_key, etag_for
+
+
+def test_cache_key_independe_da_ordem_das_chaves():
+    a = cache_key(municipio="260040", perdas=[1.0, 2.0], resumos=[{"a": 1, "b": 2}])
+    b = cache_key(resumos=[{"b": 2, "a": 1}], perdas=[1.0, 2.0], municipio="260040")
+
+    assert a == b
+    assert a != cache_key(municipio="260040", perdas=[1.0, 2.5], resumos=[{"a": 1, "b": 2}])
+
+
+def test_get_put_roundtrip(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=1000)
+    key = cache_key(x=1)
+
+    assert cache.get(key) is None
+    cache.put(key, b"%PDF-conteudo")
+    assert cache.get(key) == b"%PDF-conteudo"
+    assert cache.total_bytes == len(b"%PDF-conteudo")
+
+
+def test_despejo_lru_respeita_limite(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=250)
+    k1, k2, k3 = (cache_key(n=n) for n in range(3))
+
+    cache.put(k1, b"1" * 100)
+    cache.put(k2, b"2" * 100)
+    cache.get(k1)  # k1 passa a ser o mais recente
+    cache.put(k3, b"3" * 100)
+
+    assert cache.get(k2) is None
+    assert cache.get(k1) is not None
+    assert cache.get(k3) is not None
+    assert cache.total_bytes <= 250
+
+
+def test_indice_reconstruido_do_disco(tmp_path):
+    PdfCache(str(tmp_path), max_bytes=1000).put(cache_key(n=1), b"x" * 10)
+
+    novo = PdfCache(str(tmp_path), max_bytes=1000)
+    assert len(novo) == 1
+    assert novo.total_bytes == 10
+
+
+def test_cache_desabilitado_nao_grava(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=1000, enabled=False)
+    cache.put("ab" * 32, b"x")
+
+    assert cache.get("ab" * 32) is None
+    assert not any(tmp_path.iterdir())
+
+
+def test_etag_matches():
+    etag = etag_for("abc")
+
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"zzz", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"zzz"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_acesso_concorrente_de_threads_mantem_indice_consistente(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=1000)
+    chaves = [cache_key(n=n) for n in range(20)]
+
+    def trabalho(deslocamento):
+        for i in range(60):
+            key = chaves[(i + deslocamento) % len(chaves)]
+            if cache.get(key) is None:
+                cache.put(key, b"x" * 100)
+
+    threads = [threading.Thread(target=trabalho, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.total_bytes == sum(cache._index.values()) <= 1000
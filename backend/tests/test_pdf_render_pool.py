@@ -0,0 +1,92 @@
+"""Testes do pool de renderização de PDF (fila limitada fora do event loop)."""
+import asyncio
+import threading
+
+import pytest
+
+from app.services.pdf_render_pool import PdfRenderPool, PdfRenderPoolSaturated
+
+
+def test_run_em_processo_devolve_resultado():
+    pool = PdfRenderPool(workers=1, max_queue=0, use_processes=True)
+    try:
+        assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+    finally:
+        pool.shutdown()
+
+
+def test_fila_cheia_levanta_saturated_com_retry_after():
+    pool = PdfRenderPool(workers=1, max_queue=1, use_processes=False)
+    liberar = threading.Event()
+
+    async def cenario():
+        ocupados = [asyncio.create_task(pool.run(liberar.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert pool.in_flight == 2
+        assert pool.queue_depth == 1
+
+        with pytest.raises(PdfRenderPoolSaturated) as exc_info:
+            await pool.run(liberar.wait, 5)
+        assert exc_info.value.retry_after >= 1
+
+        liberar.set()
+        await asyncio.gather(*ocupados)
+        assert pool.in_flight == 0
+        # Com vaga de novo, a chamada é aceita
+        assert await pool.run(len, "abc") == 3
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        pool.shutdown()
+
+
+def test_erro_da_funcao_propaga_e_libera_vaga():
+    pool = PdfRenderPool(workers=1, max_queue=0, use_processes=False)
+
+    async def cenario():
+        with pytest.raises(ValueError):
+            await pool.run(int, "não é número")
+        assert pool.in_flight == 0
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        pool.shutdown()
+
+
+def test_cancelar_quem_espera_nao_libera_vaga_do_trabalho_em_andamento():
+    pool = PdfRenderPool(workers=1, max_queue=1, use_processes=False)
+    liberar = threading.Event()
+
+    async def cenario():
+        rodando = asyncio.create_task(pool.run(liberar.wait, 5))
+        na_fila = asyncio.create_task(pool.run(liberar.wait, 5))
+        await asyncio.sleep(0.05)
+        assert pool.in_flight == 2
+
+        # Cancelado ainda na fila: sai do executor e devolve a vaga
+        na_fila.cancel()
+        # Já em execução: o worker segue ocupado até terminar
+        rodando.cancel()
+        await asyncio.gather(rodando, na_fila, return_exceptions=True)
+        assert pool.in_flight == 1
+
+        # Só a vaga da fila está livre
+        fila = asyncio.create_task(pool.run(len, "a"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(PdfRenderPoolSaturated):
+            await pool.run(len, "abc")
+
+        liberar.set()
+        assert await fila == 1
+        for _ in range(100):
+            if pool.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.in_flight == 0
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        pool.shutdown()
@@ -0,0 +1,105 @@
+"""Testes do profiler sob demanda."""
+import asyncio
+import marshal
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.endpoints import profiler as profiler_endpoints
+from app.core.dependencies import get_current_active_user
+from app.core.profiler import ProfilerMiddleware, SessaoPerfil, profiler
+from app.models.schemas import User
+
+
+def funcao_quente(segundos):
+    fim = time.perf_counter() + segundos
+    total = 0
+    while time.perf_counter() < fim:
+        total += 1
+    return total
+
+
+def test_sessao_por_tempo():
+    async def cenario():
+        sessao = SessaoPerfil(segundos=0.3, intervalo_ms=2)
+        sessao.iniciar(sessao.concluir)
+        funcao_quente(0.1)
+        await asyncio.sleep(0.3)
+        return sessao
+
+    sessao = asyncio.run(cenario())
+    assert sessao.concluida
+    assert sessao.status()["amostras"] > 10
+    assert "funcao_quente (test_profiler.py" in sessao.resultado["collapsed"]
+    assert "funcao_quente" in sessao.resultado["pstats"]
+    assert any(chave[2] == "funcao_quente" for chave in marshal.loads(sessao.resultado["prof"]))
+
+
+def _app(superusuario=True):
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware)
+    app.include_router(profiler_endpoints.router, prefix="/admin/profiler")
+    app.dependency_overrides[get_current_active_user] = lambda: User(
+        id="adm", email="adm@example.com", nome="Adm", is_superuser=superusuario
+    )
+
+    @app.get("/lento/{n}")
+    async def lento(n: int):
+        return {"total": funcao_quente(0.05)}
+
+    @app.get("/rapido")
+    async def rapido():
+        return {}
+
+    return app
+
+
+def test_sessao_pelas_proximas_requisicoes():
+    profiler.sessao = None
+
+    async def cenario():
+        transport = httpx.ASGITransport(app=_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            sem_sessao = await client.get("/admin/profiler")
+            iniciada = await client.post(
+                "/admin/profiler/iniciar", json={"requisicoes": 2, "rota": "/lento", "intervalo_ms": 2}
+            )
+            repetida = await client.post("/admin/profiler/iniciar", json={"segundos": 1})
+            incompleto = await client.get("/admin/profiler/resultado/pstats")
+            await client.get("/rapido")
+            await client.get("/lento/1")
+            parcial = (await client.get("/admin/profiler")).json()
+            await client.get("/lento/2")
+            return (
+                sem_sessao, iniciada, repetida, incompleto, parcial,
+                (await client.get("/admin/profiler")).json(),
+                await client.get("/admin/profiler/resultado/collapsed"),
+                await client.get("/admin/profiler/resultado/pstats"),
+                await client.get("/admin/profiler/resultado/prof"),
+            )
+
+    sem_sessao, iniciada, repetida, incompleto, parcial, final, collapsed, stats, prof = asyncio.run(cenario())
+    assert sem_sessao.status_code == 404
+    assert iniciada.status_code == 202 and iniciada.json()["modo"] == "requisicoes"
+    assert repetida.status_code == 409
+    assert incompleto.status_code == 409
+    assert parcial["em_andamento"] and parcial["requisicoes_concluidas"] == 1
+    assert not final["em_andamento"] and final["requisicoes_concluidas"] == 2
+    assert "funcao_quente" in collapsed.text
+    assert "attachment" in collapsed.headers["content-disposition"]
+    assert "funcao_quente" in stats.text
+    assert prof.headers["content-type"] == "application/octet-stream"
+    profiler.sessao = None
+
+
+def test_validacao_e_permissao():
+    async def cenario(app, corpo):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await client.post("/admin/profiler/iniciar", json=corpo)
+
+    assert asyncio.run(cenario(_app(superusuario=False), {"segundos": 1})).status_code == 403
+    assert asyncio.run(cenario(_app(), {"segundos": 1, "requisicoes": 2, "rota": "/x"})).status_code == 422
+    assert asyncio.run(cenario(_app(), {"requisicoes": 2})).status_code == 422
+    assert profiler.sessao is None
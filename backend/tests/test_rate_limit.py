@@ -0,0 +1,228 @@
+"""Testes do limite de tentativas de login."""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.endpoints import auth
+from app.core.dependencies import get_user_service
+from app.core import rate_limit
+from app.core.rate_limit import (
+    LoginRateLimiter,
+    MemoryWindowStore,
+    RedisWindowStore,
+    parse_trusted_proxies,
+    resolver_ip_cliente,
+)
+from app.models.schemas import User
+
+
+class FakeRedis:
+    """Subconjunto do Redis usado por ``RedisWindowStore``.
+
+    Cada comando cede o event loop antes de executar (como uma ida e volta na rede);
+    o ``EVAL`` do script de ``hit`` roda de uma vez, atômico como no Redis.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    async def eval(self, script, numkeys, key, now, window, limit, member, ttl):
+        assert script == rate_limit._HIT_SCRIPT and numkeys == 1
+        await asyncio.sleep(0)
+        now, window = float(now), float(window)
+        zset = self.data.setdefault(key, {})
+        for antigo in [m for m, score in zset.items() if score <= now - window]:
+            del zset[antigo]
+        if len(zset) >= int(limit):
+            return repr(min(zset.values()) + window - now).encode()
+        zset[member] = now
+        return b"0"
+
+    async def zpopmax(self, key):
+        await asyncio.sleep(0)
+        zset = self.data.get(key, {})
+        if zset:
+            del zset[max(zset, key=zset.get)]
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.mark.parametrize("backend", ["memoria", "redis"])
+def test_janela_deslizante(backend):
+    relogio = Relogio()
+    if backend == "memoria":
+        store = MemoryWindowStore(clock=relogio)
+    else:
+        store = RedisWindowStore(FakeRedis(), clock=relogio)
+
+    async def cenario():
+        resultados = []
+        for _ in range(3):
+            resultados.append(await store.hit("k", limit=3, window=60))
+            relogio.agora += 10
+        resultados.append(await store.hit("k", limit=3, window=60))  # 4ª em 30 s
+        relogio.agora = 1060.0  # a 1ª saiu da janela
+        resultados.append(await store.hit("k", limit=3, window=60))
+        await store.reset("k")
+        resultados.append(await store.hit("k", limit=3, window=60))
+        return resultados
+
+    resultados = asyncio.run(cenario())
+    assert resultados[:3] == [0.0, 0.0, 0.0]
+    assert resultados[3] == pytest.approx(30.0)
+    assert resultados[4:] == [0.0, 0.0]
+
+
+def test_memoria_descarta_chaves_antigas():
+    relogio = Relogio()
+    store = MemoryWindowStore(clock=relogio, max_keys=2)
+
+    async def cenario():
+        await store.hit("a", 1, 10)
+        await store.hit("b", 1, 10)
+        relogio.agora += 11
+        await store.hit("c", 1, 10)
+
+    asyncio.run(cenario())
+    assert set(store._hits) == {"c"}
+
+
+def test_redis_indisponivel_libera_o_login():
+    class RedisFora:
+        async def eval(self, *args):
+            raise ConnectionError("recusada")
+
+    limiter = LoginRateLimiter(RedisWindowStore(RedisFora()), ip_limit=1, email_limit=1)
+    asyncio.run(limiter.check("10.0.0.1", "a@example.com"))
+
+
+def test_login_limitado_antes_do_bcrypt(monkeypatch):
+    limiter = LoginRateLimiter(MemoryWindowStore(), ip_limit=10, ip_window=60, email_limit=2, email_window=60)
+    monkeypatch.setattr(auth, "login_rate_limiter", limiter)
+
+    class UserServiceFalso:
+        chamadas = 0
+
+        async def authenticate_user(self, email, password):
+            UserServiceFalso.chamadas += 1
+            return None
+
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/auth")
+    app.dependency_overrides[get_user_service] = UserServiceFalso
+
+    async def cenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            corpo = {"email": "Alvo@example.com", "password": "x"}
+            respostas = [await client.post("/auth/login", json=corpo) for _ in range(3)]
+            outro = await client.post("/auth/login", json={"email": "outro@example.com", "password": "x"})
+        return respostas, outro
+
+    respostas, outro = asyncio.run(cenario())
+    assert [r.status_code for r in respostas] == [401, 401, 429]
+    assert int(respostas[2].headers["Retry-After"]) >= 1
+    assert UserServiceFalso.chamadas == 3  # 2 do alvo + 1 do outro email
+    assert outro.status_code == 401
+
+
+def test_ip_do_cliente_so_via_proxy_confiavel():
+    proxies = parse_trusted_proxies("127.0.0.1, 172.16.0.0/12, invalido")
+
+    assert resolver_ip_cliente("172.18.0.5", "203.0.113.7", proxies) == "203.0.113.7"
+    # Cadeia de proxies: o último endereço não confiável é o cliente (o resto é forjável)
+    assert resolver_ip_cliente("127.0.0.1", "1.2.3.4, 203.0.113.7, 172.18.0.5", proxies) == "203.0.113.7"
+    # Conexão direta de fora: X-Forwarded-For ignorado
+    assert resolver_ip_cliente("198.51.100.9", "203.0.113.7", proxies) == "198.51.100.9"
+    assert resolver_ip_cliente("127.0.0.1", None, proxies) == "127.0.0.1"
+
+
+def _app_login(monkeypatch, limiter, usuario=None):
+    monkeypatch.setattr(auth, "login_rate_limiter", limiter)
+
+    class UserServiceFalso:
+        async def authenticate_user(self, email, password):
+            return usuario
+
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/auth")
+    app.dependency_overrides[get_user_service] = UserServiceFalso
+    return app
+
+
+def _logins(app, tentativas):
+    async def cenario():
+        # Todas as conexões chegam do mesmo proxy (127.0.0.1, confiável por padrão)
+        transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 40000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return [
+                (await client.post(
+                    "/auth/login",
+                    json={"email": email, "password": "x"},
+                    headers={"X-Forwarded-For": ip},
+                )).status_code
+                for ip, email in tentativas
+            ]
+
+    return asyncio.run(cenario())
+
+
+def test_clientes_atras_do_mesmo_proxy_tem_cotas_separadas(monkeypatch):
+    limiter = LoginRateLimiter(MemoryWindowStore(), ip_limit=2, ip_window=60, email_limit=100, email_window=60)
+    app = _app_login(monkeypatch, limiter)
+
+    status = _logins(app, [
+        ("203.0.113.1", "a1@example.com"),
+        ("203.0.113.1", "a2@example.com"),
+        ("203.0.113.1", "a3@example.com"),
+        ("203.0.113.2", "b1@example.com"),
+        ("203.0.113.2", "b2@example.com"),
+    ])
+
+    assert status == [401, 401, 429, 401, 401]
+
+
+def test_login_bem_sucedido_nao_gasta_cota_do_ip(monkeypatch):
+    limiter = LoginRateLimiter(MemoryWindowStore(), ip_limit=2, ip_window=60, email_limit=100, email_window=60)
+    usuario = User(id="u1", email="u@example.com", nome="U", is_active=True, is_authorized=True)
+    app = _app_login(monkeypatch, limiter, usuario)
+
+    status = _logins(app, [("203.0.113.1", f"u{i}@example.com") for i in range(5)])
+
+    assert status == [200] * 5
+
+
+def test_redis_undo_devolve_a_tentativa_mais_recente():
+    relogio = Relogio()
+    store = RedisWindowStore(FakeRedis(), clock=relogio)
+
+    async def cenario():
+        await store.hit("k", limit=2, window=60)
+        relogio.agora += 1
+        await store.hit("k", limit=2, window=60)
+        await store.undo("k")
+        return await store.hit("k", limit=2, window=60), await store.hit("k", limit=2, window=60)
+
+    assert asyncio.run(cenario()) == (0.0, pytest.approx(59.0))
+
+
+def test_redis_rajada_concorrente_respeita_o_limite():
+    store = RedisWindowStore(FakeRedis(), clock=Relogio())
+
+    async def cenario():
+        # As duas tentativas se intercalam no event loop; só uma pode passar
+        return await asyncio.gather(*(store.hit("k", limit=1, window=60) for _ in range(2)))
+
+    resultados = asyncio.run(cenario())
+    assert sorted(resultados) == [0.0, pytest.approx(60.0)]
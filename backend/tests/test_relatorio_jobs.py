@@ -0,0 +1,180 @@
+"""Testes da fila de jobs de relatório (status, novas tentativas e expiração)."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.pdf_render_pool import PdfRenderPoolSaturated
+from app.services.relatorio_jobs import (
+    STATUS_CONCLUIDO,
+    STATUS_FALHOU,
+    FalhaDefinitiva,
+    FilaRelatoriosCheia,
+    RelatorioJobQueue,
+)
+
+
+def _fila(tmp_path, gerar, **kwargs):
+    opcoes = dict(concurrency=1, max_pending=10, max_attempts=3, ttl=timedelta(minutes=5))
+    opcoes.update(kwargs)
+    return RelatorioJobQueue(directory=str(tmp_path), gerar=gerar, **opcoes)
+
+
+async def _aguardar(fila, job_id, timeout=5.0):
+    async def loop():
+        while not fila.get(job_id).finalizado:
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(loop(), timeout)
+    return fila.get(job_id)
+
+
+def test_job_concluido_grava_arquivo(tmp_path):
+    async def gerar(job):
+        job.avancar(40, "Renderizando PDF")
+        return b"%PDF-1.7 teste"
+
+    async def cenario():
+        fila = _fila(tmp_path, gerar)
+        fila.start()
+        try:
+            job = fila.submit("detalhado", "350010", "202501", usuario_id="u1")
+            job = await _aguardar(fila, job.id)
+        finally:
+            await fila.stop()
+        return job
+
+    job = asyncio.run(cenario())
+    assert job.status == STATUS_CONCLUIDO
+    assert job.progresso == 100
+    assert job.tentativas == 1
+    assert job.arquivo.read_bytes() == b"%PDF-1.7 teste"
+    assert job.tamanho_bytes == len(b"%PDF-1.7 teste")
+    assert job.nome_arquivo == "relatorio_detalhado_350010_202501.pdf"
+
+
+def test_falha_transitoria_e_repetida(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.relatorio_jobs._RETRY_BACKOFF_BASE", 0)
+    chamadas = []
+
+    async def gerar(job):
+        chamadas.append(job.tentativas)
+        if len(chamadas) == 1:
+            raise ConnectionError("API fora do ar")
+        if len(chamadas) == 2:
+            raise PdfRenderPoolSaturated(retry_after=0)
+        return b"%PDF"
+
+    async def cenario():
+        fila = _fila(tmp_path, gerar)
+        fila.start()
+        try:
+            return await _aguardar(fila, fila.submit("padrao", "350010", "202501").id)
+        finally:
+            await fila.stop()
+
+    job = asyncio.run(cenario())
+    assert job.status == STATUS_CONCLUIDO
+    assert chamadas == [1, 2, 3]
+
+
+def test_falha_definitiva_nao_e_repetida(tmp_path):
+    chamadas = []
+
+    async def gerar(job):
+        chamadas.append(job.tentativas)
+        raise FalhaDefinitiva("Sem dados de financiamento")
+
+    async def cenario():
+        fila = _fila(tmp_path, gerar)
+        fila.start()
+        try:
+            return await _aguardar(fila, fila.submit("padrao", "350010", "202501").id)
+        finally:
+            await fila.stop()
+
+    job = asyncio.run(cenario())
+    assert job.status == STATUS_FALHOU
+    assert job.erro == "Sem dados de financiamento"
+    assert chamadas == [1]
+
+
+def test_desiste_apos_max_tentativas(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.relatorio_jobs._RETRY_BACKOFF_BASE", 0)
+
+    async def gerar(job):
+        raise RuntimeError("boom")
+
+    async def cenario():
+        fila = _fila(tmp_path, gerar, max_attempts=2)
+        fila.start()
+        try:
+            return await _aguardar(fila, fila.submit("padrao", "350010", "202501").id)
+        finally:
+            await fila.stop()
+
+    job = asyncio.run(cenario())
+    assert job.status == STATUS_FALHOU
+    assert job.tentativas == 2
+    assert "boom" in job.erro
+
+
+def test_fila_cheia_recusa_novos_jobs(tmp_path):
+    async def gerar(job):
+        return b"%PDF"
+
+    async def cenario():
+        # Sem start(): submit sobe os workers, mas nenhum roda antes do primeiro await
+        fila = _fila(tmp_path, gerar, max_pending=2)
+        try:
+            fila.submit("padrao", "350010", "202501")
+            fila.submit("padrao", "350010", "202502")
+            with pytest.raises(FilaRelatoriosCheia):
+                fila.submit("padrao", "350010", "202503")
+        finally:
+            await fila.stop()
+
+    asyncio.run(cenario())
+
+
+def test_job_expirado_some_junto_com_arquivo(tmp_path):
+    async def gerar(job):
+        return b"%PDF"
+
+    async def cenario():
+        fila = _fila(tmp_path, gerar)
+        fila.start()
+        try:
+            return fila, await _aguardar(fila, fila.submit("padrao", "350010", "202501").id)
+        finally:
+            await fila.stop()
+
+    fila, job = asyncio.run(cenario())
+    assert job.arquivo.exists()
+
+    job.concluido_em = datetime.utcnow() - timedelta(minutes=10)
+    assert asyncio.run(fila.limpar_expirados()) == 1
+    assert fila.get(job.id) is None
+    assert not job.arquivo.exists()
+
+
+def test_job_expirado_consultado_no_endpoint_apaga_arquivo(tmp_path):
+    async def gerar(job):
+        return b"%PDF"
+
+    async def cenario():
+        fila = _fila(tmp_path, gerar)
+        fila.start()
+        try:
+            job = await _aguardar(fila, fila.submit("padrao", "350010", "202501").id)
+            job.concluido_em = datetime.utcnow() - timedelta(minutes=10)
+            assert fila.get(job.id) is None
+            for _ in range(100):  # remoção do arquivo roda numa thread
+                if not job.arquivo.exists():
+                    break
+                await asyncio.sleep(0.01)
+            return job
+        finally:
+            await fila.stop()
+
+    job = asyncio.run(cenario())
+    assert not job.arquivo.exists()
@@ -0,0 +1,78 @@
+"""Testes do lote de relatórios transmitido como ZIP."""
+import asyncio
+import io
+import json
+import zipfile
+
+from app.services.pdf_render_pool import PdfRenderPoolSaturated
+from app.services.relatorio_jobs import FalhaDefinitiva
+from app.services.relatorio_lote import MANIFESTO, ItemLote, gerar_lote_zip
+
+
+def _coletar(gerador):
+    async def consumir():
+        return [parte async for parte in gerador]
+    return asyncio.run(consumir())
+
+
+def test_zip_com_pdfs_e_manifesto_de_falhas():
+    saturado = {"260040": True}
+
+    async def gerar(job):
+        if job.codigo_ibge == "999999":
+            raise FalhaDefinitiva("Sem dados de financiamento")
+        if saturado.pop(job.codigo_ibge, False):
+            raise PdfRenderPoolSaturated(retry_after=0)
+        return f"%PDF {job.codigo_ibge}".encode()
+
+    itens = [ItemLote("260040", "Abreu e Lima", "PE"), ItemLote("999999"), ItemLote("260005")]
+    partes = _coletar(gerar_lote_zip(itens, "202501", gerar=gerar, concurrency=2))
+
+    # Uma parte por PDF gerado + o fechamento com o manifesto
+    assert len(partes) == 3
+    with zipfile.ZipFile(io.BytesIO(b"".join(partes))) as zf:
+        assert zf.testzip() is None
+        nomes = zf.namelist()
+        assert nomes[-1] == MANIFESTO
+        assert sorted(nomes[:-1]) == ["relatorio_260005_202501.pdf", "relatorio_260040_202501.pdf"]
+        assert zf.read("relatorio_260040_202501.pdf") == b"%PDF 260040"
+        manifesto = json.loads(zf.read(MANIFESTO))
+
+    assert manifesto["total"] == 3
+    assert {g["codigo_ibge"] for g in manifesto["gerados"]} == {"260040", "260005"}
+    assert manifesto["falhas"] == [
+        {"codigo_ibge": "999999", "municipio": None, "erro": "Sem dados de financiamento"}
+    ]
+
+
+def test_concorrencia_limitada():
+    ativos = {"agora": 0, "max": 0}
+
+    async def gerar(job):
+        ativos["agora"] += 1
+        ativos["max"] = max(ativos["max"], ativos["agora"])
+        await asyncio.sleep(0.01)
+        ativos["agora"] -= 1
+        return b"%PDF"
+
+    itens = [ItemLote(str(260000 + n)) for n in range(8)]
+    _coletar(gerar_lote_zip(itens, "202501", gerar=gerar, concurrency=3))
+    assert ativos["max"] == 3
+
+
+def test_pool_sempre_saturado_vira_falha_no_manifesto():
+    tentativas = []
+
+    async def gerar(job):
+        tentativas.append(job.codigo_ibge)
+        raise PdfRenderPoolSaturated(retry_after=1)
+
+    partes = _coletar(gerar_lote_zip([ItemLote("260040")], "202501", gerar=gerar, max_espera=0))
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(partes))) as zf:
+        assert zf.namelist() == [MANIFESTO]
+        manifesto = json.loads(zf.read(MANIFESTO))
+    assert manifesto["gerados"] == []
+    assert manifesto["falhas"][0]["codigo_ibge"] == "260040"
+    assert "saturado" in manifesto["falhas"][0]["erro"]
+    assert tentativas == ["260040"]
@@ -1,6 +1,11 @@
 """Testes para utilitários de geração de relatório em PDF."""
-from app.models.schemas import ResumoFinanceiro
-from app.services.relatorio_pdf import compute_financial_summary, create_pdf_report
+from app.models.schemas import ResumoFinanceiro, ResumoMunicipioRegional
+from app.services.relatorio_pdf import (
+    compute_financial_summary,
+    compute_regional_summary,
+    create_pdf_report,
+    create_regional_pdf_report,
+)
 
 
 def test_compute_financial_summary_basic():
@@ -50,3 +55,43 @@ def test_create_pdf_report_returns_pdf_bytes():
     assert isinstance(pdf_bytes, (bytes, bytearray))
     assert pdf_bytes.startswith(b'%PDF')
     assert len(pdf_bytes) > 1000
+
+
+def _municipio_regional(codigo, nome, recebido, perda):
+    return ResumoMunicipioRegional(
+        codigo_ibge=codigo,
+        municipio_nome=nome,
+        uf='MG',
+        resumo=compute_financial_summary([{"vlEfetivoRepasse": recebido}], [perda]),
+    )
+
+
+def test_compute_regional_summary_recalcula_percentual():
+    municipios = [
+        _municipio_regional('310010', 'A', 1000.0, 100.0),
+        _municipio_regional('310020', 'B', 3000.0, 100.0),
+    ]
+
+    total = compute_regional_summary(municipios)
+
+    assert total.total_recebido == 4000.0
+    assert total.total_perda_mensal == 200.0
+    assert total.total_diferenca_anual == 2400.0
+    assert total.percentual_perda_anual == 5.0
+
+
+def test_create_regional_pdf_report_returns_pdf_bytes():
+    municipios = [
+        _municipio_regional(f'3100{n}0', f'Cidade {n}', 1000.0 * n, 10.0 * n)
+        for n in range(1, 6)
+    ]
+
+    pdf_bytes = create_regional_pdf_report(
+        regiao_nome='CIR Teste',
+        competencia='202401',
+        municipios=municipios,
+        sem_dados=['Cidade Sem Dados/MG'],
+    )
+
+    assert pdf_bytes.startswith(b'%PDF')
+    assert len(pdf_bytes) > 1000
@@ -0,0 +1,72 @@
+"""Testes do motor de templates compilados dos relatórios."""
+import pytest
+
+from app.services.relatorio_template import (
+    TemplateError,
+    compile_template,
+    load_inline_css,
+    load_template,
+)
+
+
+def test_compile_separa_literais_e_slots():
+    tpl = compile_template("<h1>{{ municipio_nome }}/{{ uf }}</h1><p>__PERDA_BADGE__</p>")
+
+    assert tpl.slots == ("municipio_nome", "uf", "perda_badge")
+    assert tpl.literals == ("<h1>", "/", "</h1><p>", "</p>")
+
+
+def test_render_substitui_todas_as_ocorrencias():
+    tpl = compile_template("{{ uf }}-{{ uf }}-__ESF_CONTENT__")
+
+    assert tpl.render({"uf": "PE", "esf_content": "<b>x</b>"}) == "PE-PE-<b>x</b>"
+
+
+def test_render_nao_reprocessa_valores_inseridos():
+    # Valor contendo marcador não é substituído de novo (replace sequencial fazia isso).
+    tpl = compile_template("{{ municipio_nome }} {{ uf }}")
+
+    assert tpl.render({"municipio_nome": "{{ uf }}", "uf": "MG"}) == "{{ uf }} MG"
+
+
+def test_expressao_legada_mapeia_para_nome_curto():
+    tpl = compile_template(
+        '<span>{{ "{:,.0f}".format(resumo.total_recebido * 12).replace(\',\', \'.\') }}</span>'
+    )
+
+    assert tpl.slots == ("recurso_atual_anual",)
+
+
+def test_expressao_desconhecida_falha_na_compilacao():
+    with pytest.raises(TemplateError):
+        compile_template("{{ resumo.total_recebido / 2 }}")
+
+
+def test_render_falha_com_slot_sem_valor():
+    tpl = compile_template("{{ municipio_nome }} {{ uf }}")
+
+    with pytest.raises(TemplateError, match="uf"):
+        tpl.render({"municipio_nome": "Cidade"})
+
+
+def test_render_falha_com_valor_para_slot_inexistente():
+    tpl = compile_template("{{ uf }}")
+
+    with pytest.raises(TemplateError, match="img_base64"):
+        tpl.render({"uf": "BA", "img_base64": ""})
+
+
+@pytest.mark.parametrize("nome", ["relatorio_base.html", "relatorio_detalhado.html"])
+def test_templates_do_projeto_compilam(nome):
+    tpl = load_template(nome)
+
+    assert "css_content" in tpl.slot_names
+    assert "municipio_nome" in tpl.slot_names
+    assert load_template(nome) is tpl
+
+
+def test_css_inline_embute_timbrado():
+    css = load_inline_css()
+
+    assert "url('../images/Imagem Timbrado.png')" not in css
+    assert "data:image/png;base64," in css
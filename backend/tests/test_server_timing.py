@@ -0,0 +1,90 @@
+"""Testes do header Server-Timing."""
+import asyncio
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.api.endpoints import siaps
+from app.core.config import settings
+from app.core.dependencies import get_current_authorized_user, get_user_service, user_cache
+from app.core.security import create_access_token
+from app.core.server_timing import RequestTiming, ServerTimingMiddleware, _atual, fase, registrar_fase
+from app.models.schemas import User
+
+
+def test_fases_aninhadas_e_tarefas_concorrentes():
+    async def filho(nome):
+        with fase(nome):
+            await asyncio.sleep(0)
+
+    async def cenario():
+        timing = RequestTiming()
+        token = _atual.set(timing)
+        try:
+            with fase("dados", "Montagem"):
+                await asyncio.gather(filho("a"), filho("b"))
+                registrar_fase("pdf", 0.25)
+            with fase("depois"):
+                pass
+        finally:
+            _atual.reset(token)
+        return timing
+
+    timing = asyncio.run(cenario())
+    assert [s.nome for s in timing.fases] == ["dados", "depois"]
+    assert sorted(s.nome for s in timing.fases[0].filhos) == ["a", "b", "pdf"]
+    assert [s.nome for s in timing.todas()][:1] == ["dados"]
+
+    # Fora de uma requisição, fase() não faz nada
+    with fase("solta"):
+        pass
+
+
+def test_gap_com_fases_e_auth(monkeypatch):
+    user = User(id="st1", email="st@example.com", nome="ST", is_active=True, is_authorized=True)
+    user_cache.clear()
+    user_cache.put(user)
+
+    async def financiamento(codigo_ibge, competencia):
+        await asyncio.sleep(0.01)
+        return {"resumosPlanosOrcamentarios": []}
+
+    async def classificacao(*args, **kwargs):
+        return {"registros": []}
+
+    monkeypatch.setattr(siaps.saude_api_client, "consultar_financiamento", financiamento)
+    monkeypatch.setattr(siaps.siaps_api_client, "consultar_para_competencia", classificacao)
+    monkeypatch.setattr(siaps, "calcular_gaps", lambda envelope, dados: {
+        "estrato": 1, "perda_por_recurso_vigente": [], "perda_por_recurso_potencial": [],
+        "total_vigente": 0.0, "total_potencial": 0.0, "detalhe": [],
+    })
+
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+    app.include_router(siaps.router, dependencies=[Depends(get_current_authorized_user)])
+    app.dependency_overrides[get_user_service] = lambda: None
+
+    @app.get("/sem-fases")
+    async def sem_fases():
+        return {}
+
+    async def cenario():
+        token = create_access_token(subject=user.id, secret_key=settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return (
+                await client.get("/gap/310620/202501", headers={"Authorization": f"Bearer {token}"}),
+                await client.get("/sem-fases"),
+            )
+
+    try:
+        gap, sem_fases = asyncio.run(cenario())
+    finally:
+        user_cache.clear()
+
+    assert gap.status_code == 200
+    fases = {parte.split(";")[0]: parte for parte in gap.headers["server-timing"].split(", ")}
+    assert list(fases) == ["auth", "fin", "siaps", "gap", "total"]
+    assert 'desc="Autenticacao"' in fases["auth"]
+    assert float(fases["fin"].split("dur=")[1].split(";")[0]) >= 10
+    assert "server-timing" not in sem_fases.headers
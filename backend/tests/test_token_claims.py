@@ -0,0 +1,169 @@
+"""Testes dos caminhos de autenticação sem consulta ao banco (token stateless e cache de User)."""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core.database import Base, get_session
+from app.core.dependencies import get_current_authorized_user, user_cache
+from app.core.security import create_access_token
+from app.core.token_claims import token_claims, user_version, user_version_cache
+from app.models.db_models import UserDB
+from app.models.schemas import User
+from app.services.user_service import UserService
+
+
+def _token(user: User) -> str:
+    return create_access_token(
+        subject=user.id,
+        secret_key=settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+        extra_claims=token_claims(user),
+    )
+
+
+async def _cenario(tmp_path, passos):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    consultas = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *a: consultas.append(a[2]))
+
+    async with sessions() as session:
+        session.add(UserDB(
+            id="u1", email="ana@example.com", nome="Ana", hashed_password="x",
+            is_active=True, is_authorized=True, updated_at=datetime(2025, 1, 1, 12, 0, 0, 123456),
+        ))
+        await session.commit()
+        user = await UserService(session).get_user_by_id("u1")
+
+    async def sessao():
+        async with sessions() as session:
+            yield session
+
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(current_user: User = Depends(get_current_authorized_user)):
+        return current_user
+
+    app.dependency_overrides[get_session] = sessao
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        headers = {"Authorization": f"Bearer {_token(user)}"}
+
+        async def get():
+            consultas.clear()
+            resposta = await client.get("/me", headers=headers)
+            return resposta.status_code, len(consultas)
+
+        resultados = [await passo(get, sessions) for passo in passos]
+    await engine.dispose()
+    return resultados
+
+
+def test_modo_stateless_dispensa_banco_e_respeita_revogacao(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", True)
+    monkeypatch.setattr(user_version_cache, "refresh_seconds", 3600)
+    user_version_cache.invalidar()
+
+    async def requisicao(get, sessions):
+        return await get()
+
+    async def revogar(get, sessions):
+        async with sessions() as session:
+            await UserService(session).authorize_user("u1", False)
+        return await get()
+
+    resultados = asyncio.run(_cenario(tmp_path, [requisicao, requisicao, requisicao, revogar]))
+    assert resultados[0] == (200, 1)  # carrega o mapa de versões
+    assert resultados[1] == (200, 0)
+    assert resultados[2] == (200, 0)
+    assert resultados[3][0] == 403  # revogado neste processo: vale na hora
+
+
+def test_alteracao_de_outro_processo_vale_apos_o_intervalo(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", True)
+    monkeypatch.setattr(user_version_cache, "refresh_seconds", 0)
+
+    async def requisicao(get, sessions):
+        return await get()
+
+    async def desativar_por_fora(get, sessions):
+        async with sessions() as session:
+            await session.execute(text(
+                "UPDATE users SET is_active = 0, updated_at = '2025-02-01 00:00:00.000000'"
+            ))
+            await session.commit()
+        return await get()
+
+    resultados = asyncio.run(_cenario(tmp_path, [requisicao, desativar_por_fora]))
+    assert resultados[0][0] == 200
+    assert resultados[1][0] == 403
+
+
+def test_modo_desligado_consulta_o_banco(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", False)
+    monkeypatch.setattr(user_cache, "ttl_seconds", 0)
+    user_cache.clear()
+
+    async def requisicao(get, sessions):
+        return await get()
+
+    resultados = asyncio.run(_cenario(tmp_path, [requisicao, requisicao]))
+    assert resultados == [(200, 1), (200, 1)]
+
+
+def test_versao_em_microssegundos():
+    base = datetime(2025, 1, 1)
+    assert user_version(None) == 0
+    assert user_version(base + timedelta(microseconds=1)) == user_version(base) + 1
+
+
+def test_cache_de_user_e_invalidado_pelo_user_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", False)
+    monkeypatch.setattr(user_cache, "ttl_seconds", 3600)
+    user_cache.clear()
+
+    async def requisicao(get, sessions):
+        return await get()
+
+    async def alterar_por_fora(get, sessions):
+        # Outro processo: só vale quando a entrada expirar
+        async with sessions() as session:
+            await session.execute(text("UPDATE users SET is_authorized = 0"))
+            await session.commit()
+        return await get()
+
+    async def revogar(get, sessions):
+        async with sessions() as session:
+            await UserService(session).authorize_user("u1", False)
+        return await get()
+
+    resultados = asyncio.run(_cenario(tmp_path, [requisicao, requisicao, alterar_por_fora, revogar]))
+    assert resultados[0] == (200, 1)
+    assert resultados[1] == (200, 0)
+    assert resultados[2][0] == 200
+    assert resultados[3][0] == 403
+    user_cache.clear()
+
+
+def test_cache_de_user_limitado_e_com_ttl(monkeypatch):
+    from app.core.dependencies import UserCache
+
+    relogio = [0.0]
+    monkeypatch.setattr("app.core.dependencies.time.monotonic", lambda: relogio[0])
+    cache = UserCache(ttl_seconds=10, max_entries=2)
+    users = [User(id=f"u{n}", email=f"u{n}@example.com", nome="U") for n in range(3)]
+    for user in users:
+        cache.put(user)
+    assert cache.get("u0") is None  # mais antigo saiu
+    assert cache.get("u2") is users[2]
+
+    relogio[0] = 10.0
+    assert cache.get("u2") is None
@@ -8,6 +8,7 @@ import { useAuthStore } from '../stores/authStore';
 import type {
   UF,
   Municipio,
+  MunicipioBuscaItem,
   DadosFinanciamento,
   MunicipioEditado,
   MunicipioEditadoCreate,
@@ -95,6 +96,16 @@ class ApiClient {
     return response.data;
   }
 
+  /**
+   * Autocomplete de municípios em todo o país (aceita "Nome/UF")
+   */
+  async buscarMunicipios(q: string, limit = 10, uf?: string): Promise<MunicipioBuscaItem[]> {
+    const response = await this.client.get<MunicipioBuscaItem[]>('/municipios/busca', {
+      params: { q, limit, uf },
+    });
+    return response.data;
+  }
+
   /**
    * Busca município pelo código IBGE
    */
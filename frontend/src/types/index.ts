@@ -16,6 +16,11 @@ export interface Municipio {
   populacao?: number;
 }
 
+export interface MunicipioBuscaItem extends Municipio {
+  rotulo: string;
+  correspondencia: 'exata' | 'prefixo' | 'palavra' | 'aproximada';
+}
+
 // Tipos de financiamento
 export interface FinanciamentoParams {
   codigo_ibge: string;